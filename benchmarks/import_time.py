@@ -0,0 +1,60 @@
+"""Import-time and backend-resolution benchmark.
+
+```shell
+$ python benchmarks/import_time.py
+```
+"""
+
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPETS = {
+    "import leicht": "import leicht",
+    "from leicht import Assistant": "from leicht import Assistant",
+    "from leicht.llms import Groq": "from leicht.llms import Groq",
+}
+
+
+def cold(stmt: str, runs: int = 5) -> float:
+    """Best wall time of a statement in a fresh interpreter, in ms."""
+    code = (
+        "import time; t = time.perf_counter(); "
+        + stmt
+        + "; print((time.perf_counter() - t) * 1000)"
+    )
+    times = []
+
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        times.append(float(out.stdout.strip()))
+
+    return min(times)
+
+
+def main():
+    for name, stmt in SNIPPETS.items():
+        print(f"{name:<32} {cold(stmt):8.2f} ms (cold)")
+
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("GROQ_API_KEY", "gsk_bench")
+
+    from leicht.llms._pipeline import get_llm, resolve_llm
+
+    resolve_llm("groq")  # first resolution imports the module
+    n = 10_000
+    per_call = timeit.timeit(lambda: get_llm("groq"), number=n) / n * 1e6
+    print(f"{'get_llm(groq)':<32} {per_call:8.2f} µs (warm, per call)")
+
+
+if __name__ == "__main__":
+    main()
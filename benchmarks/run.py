@@ -0,0 +1,257 @@
+"""End-to-end benchmark suite, fully offline.
+
+Starts the stub server (``stub_server.py``) in a subprocess, points every
+backend at it, and drives ``Assistant.run`` through a matrix of scenarios:
+with and without tools and conditionals, at several history lengths and
+concurrency levels.
+
+Reports, per scenario:
+
+- ``turns/s``: throughput;
+- ``p50``/``p95``: turn latency;
+- ``ttft``: time to the first streamed chunk (p50);
+- ``overhead``: framework time per turn, i.e. the mean turn latency against an
+  instant backend (the stub with no simulated delay), at concurrency 1;
+- ``peak``: peak Python memory during a few traced turns.
+
+```shell
+$ python benchmarks/run.py --latency 0.02 --tokens-per-sec 2000 --turns 50
+$ python benchmarks/run.py --quick --json results.json  # CI
+```
+"""
+
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def start_stub(args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    proc = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(HERE, "stub_server.py"),
+            "--port",
+            str(args.port),
+            "--latency",
+            str(args.latency),
+            "--tokens-per-sec",
+            str(args.tokens_per_sec),
+            "--completion-tokens",
+            str(args.completion_tokens),
+            "--error-rate",
+            str(args.error_rate),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert proc.stdout
+    line = proc.stdout.readline()  # "stub listening on http://..."
+    return proc, line.rsplit(" ", 1)[-1].strip()
+
+
+def configure(url: str) -> None:
+    """Points leicht at the stub. Must run before leicht is imported."""
+    os.environ["GROQ_API_KEY"] = "gsk_stub"
+    os.environ["GROQ_BASE_URL"] = url + "/openai/v1"
+    os.environ["LEICHT_HF_BASE_URL"] = url + "/hf"
+    os.environ["LEICHT_PROMPT_BASE_URL"] = url + "/prompts"
+    os.environ["LEICHT_PROMPT_CACHE"] = tempfile.mkdtemp(prefix="leicht-bench-")
+
+
+def make_assistant(tools: bool, conditionals: bool):
+    from leicht import Assistant
+    from leicht.conditional import Conditional
+    from leicht.tools import tool
+
+    @tool
+    def weather(location: str):
+        """Gets the current weather.
+
+        Args:
+            location (str): The location.
+        """
+        return {"location": location, "weather": "sunny", "celsius": 21}
+
+    return Assistant(
+        "You are a helpful assistant.",
+        llm="groq",
+        tools=[weather] if tools else None,
+        conditionals=[
+            Conditional("CHECK is this polite? {text}", "{text}"),
+            Conditional("CHECK is this on topic? {text}", "{text}"),
+        ]
+        if conditionals
+        else None,
+    )
+
+
+def history(length: int) -> List[Dict[str, str]]:
+    turns: List[Dict[str, str]] = []
+    for i in range(length):
+        turns.append({"role": "user", "content": f"question {i} " + "lorem " * 30})
+        turns.append({"role": "assistant", "content": f"answer {i} " + "ipsum " * 60})
+    return turns
+
+
+def one_turn(
+    assistant, base: list, text: str, stream: bool
+) -> Tuple[float, Optional[float]]:
+    assistant.messages = list(base)
+    start = time.perf_counter()
+    res = assistant.run(text, stream=stream, temperature=0)
+    ttft = None
+
+    if stream:
+        for _ in res:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+    else:
+        res["choices"]  # decode
+
+    return time.perf_counter() - start, ttft
+
+
+def scenario(
+    url: str,
+    *,
+    tools: bool,
+    conditionals: bool,
+    history_length: int,
+    concurrency: int,
+    stream: bool,
+    turns: int,
+) -> Dict[str, Any]:
+    import httpx
+
+    text = "what's the weather in berlin?" if tools else "tell me a story"
+    assistants = [make_assistant(tools, conditionals) for _ in range(concurrency)]
+    base = [assistants[0].messages[0], *history(history_length)]
+
+    for a in assistants:  # warm connections and prompt cache
+        one_turn(a, base, text, stream)
+
+    httpx.post(url + "/stats/reset")
+    start = time.perf_counter()
+
+    def worker(i: int):
+        return [
+            one_turn(assistants[i], base, text, stream)
+            for _ in range(turns // concurrency)
+        ]
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(itertools.chain(*executor.map(worker, range(concurrency))))
+
+    wall = time.perf_counter() - start
+
+    overhead = None
+    if concurrency == 1:
+        config = httpx.get(url + "/config").json()
+        httpx.post(url + "/config", json={"latency": 0, "tokens_per_sec": 0})
+        overhead = (
+            sum(one_turn(assistants[0], base, text, stream)[0] for _ in range(turns))
+            / turns
+        )
+        httpx.post(url + "/config", json=config)
+
+    latencies = sorted(r[0] for r in results)
+    ttfts = sorted(r[1] for r in results if r[1] is not None)
+
+    tracemalloc.start()
+    for _ in range(3):
+        one_turn(assistants[0], base, text, stream)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "tools": tools,
+        "conditionals": conditionals,
+        "history": history_length,
+        "concurrency": concurrency,
+        "stream": stream,
+        "turns": len(results),
+        "turns_per_sec": len(results) / wall,
+        "p50": _q(latencies, 0.5),
+        "p95": _q(latencies, 0.95),
+        "ttft": _q(ttfts, 0.5) if ttfts else None,
+        "overhead": overhead,
+        "peak_bytes": peak,
+    }
+
+
+def _q(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _ms(v: Optional[float]) -> str:
+    return f"{v * 1000:8.2f}" if v is not None else f"{'-':>8}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="leicht end-to-end benchmarks")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--tokens-per-sec", type=float, default=5000)
+    parser.add_argument("--completion-tokens", type=int, default=32)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 10, 100])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--quick", action="store_true", help="small matrix for CI")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.turns, args.history, args.concurrency = 8, [0, 10], [1, 4]
+
+    proc, url = start_stub(args)
+    try:
+        configure(url)
+        results = []
+
+        print(
+            f"{'tools':>5} {'conds':>5} {'hist':>4} {'conc':>4} {'strm':>4} "
+            f"{'turns/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'ttft ms':>8} "
+            f"{'ovh ms':>8} {'peak KiB':>9}"
+        )
+        for tools, conds, hist, conc, stream in itertools.product(
+            (False, True), (False, True), args.history, args.concurrency, (False, True)
+        ):
+            r = scenario(
+                url,
+                tools=tools,
+                conditionals=conds,
+                history_length=hist,
+                concurrency=conc,
+                stream=stream,
+                turns=max(args.turns, conc),
+            )
+            results.append(r)
+            print(
+                f"{tools!s:>5} {conds!s:>5} {hist:>4} {conc:>4} {stream!s:>4} "
+                f"{r['turns_per_sec']:8.1f} {_ms(r['p50'])} {_ms(r['p95'])} "
+                f"{_ms(r['ttft'])} {_ms(r['overhead'])} {r['peak_bytes'] / 1024:9.1f}",
+                flush=True,
+            )
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
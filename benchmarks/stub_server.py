@@ -0,0 +1,302 @@
+"""A local stub of every endpoint leicht talks to.
+
+Serves OpenAI-compatible ``/chat/completions`` (streaming and non-streaming)
+under any prefix, so it stands in for Groq (``/openai/v1``), the HF Space and
+g4f alike, plus prompt fetching (``/prompts/<name>.md``).
+
+Replies are canned, after a simulated delay of ``latency`` plus the completion
+at ``tokens_per_sec``:
+
+- detection prompts (``functions-v2``, ``functions-groq``) get a call to the
+  first tool when the text mentions ``weather``, ``null`` otherwise;
+- conditional prompts (anything with ``CHECK``) get ``true``;
+- anything else gets ``completion_tokens`` words.
+
+``GET /stats`` reports requests served and the seconds spent simulating,
+``POST /stats/reset`` resets them. ``POST /config`` changes the simulation
+settings (``latency``, ``tokens_per_sec``, ...) at runtime.
+
+```shell
+$ python benchmarks/stub_server.py --port 8765 --latency 0.05 --tokens-per-sec 500
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+PROMPTS = {
+    "functions-v2": (
+        "DETECT\nTools:\n{tools}\n\nMost commonly used: {most_commonly_used}\n"
+        "TEXT:\n{messages}\nEND\nReply with a function call, or null."
+    ),
+    "functions-groq": (
+        "DETECT\nTools:\n{tools}\n\nMost commonly used: {most_commonly_used}\n"
+        "TEXT:\n{text}\nEND\nReply with a function call, or null."
+    ),
+    "basic": "You are a helpful assistant.",
+}
+
+
+class StubConfig:
+    __slots__ = ("latency", "tokens_per_sec", "completion_tokens", "error_rate")
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        tokens_per_sec: float = 0.0,
+        completion_tokens: int = 32,
+        error_rate: float = 0.0,
+    ):
+        self.latency = latency
+        self.tokens_per_sec = tokens_per_sec
+        self.completion_tokens = completion_tokens
+        self.error_rate = error_rate
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, config: StubConfig):
+        super().__init__(address, StubHandler)
+        self.config = config
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.busy = 0.0
+
+    @property
+    def url(self) -> str:
+        return "http://%s:%d" % self.server_address[:2]
+
+    def handle_error(self, request, client_address) -> None:
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # clients hang up
+            super().handle_error(request, client_address)
+
+    def account(self, seconds: float) -> None:
+        with self.lock:
+            self.requests += 1
+            self.busy += seconds
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubServer
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def log_message(self, format: str, *args: Any) -> None: ...
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.server.lock:
+                return self._json(
+                    200, {"requests": self.server.requests, "busy": self.server.busy}
+                )
+
+        if self.path == "/config":
+            config = self.server.config
+            return self._json(200, {k: getattr(config, k) for k in config.__slots__})
+
+        m = re.match(r"^/prompts/(.+)\.md$", self.path)
+        if m and m.group(1) in PROMPTS:
+            return self._send(200, PROMPTS[m.group(1)].encode("utf-8"), "text/plain")
+
+        self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        if self.path == "/stats/reset":
+            with self.server.lock:
+                self.server.requests = 0
+                self.server.busy = 0.0
+            return self._json(200, {})
+
+        if self.path == "/config":
+            for k, v in json.loads(body).items():
+                setattr(self.server.config, k, v)
+            return self._json(200, {})
+
+        if not self.path.split("?")[0].endswith("/chat/completions"):
+            return self._json(404, {"error": "not found"})
+
+        config = self.server.config
+        if config.error_rate and random.random() < config.error_rate:
+            self.server.account(0.0)
+            return self._json(429, {"error": {"message": "rate limited (stub)"}})
+
+        payload = json.loads(body)
+        content = reply_for(payload["messages"][-1]["content"], config)
+        tokens = content.split(" ")
+
+        if payload.get("stream"):
+            return self._stream(payload, tokens)
+
+        delay = config.latency + _generation_time(len(tokens), config)
+        time.sleep(delay)
+        self.server.account(delay)
+        self._json(200, completion(payload, content, len(tokens), delay, config))
+
+    def _stream(self, payload: Dict[str, Any], tokens: list):
+        config = self.server.config
+        start = time.perf_counter()
+        time.sleep(config.latency)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        per_token = 1 / config.tokens_per_sec if config.tokens_per_sec else 0.0
+        for i, token in enumerate(tokens):
+            if per_token:
+                time.sleep(per_token)
+
+            chunk: Dict[str, Any] = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": payload.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "delta": {"content": token if i == 0 else " " + token},
+                        "finish_reason": None,
+                    }
+                ],
+            }
+            if i == len(tokens) - 1:
+                chunk["choices"][0]["finish_reason"] = "stop"
+                chunk["x_groq"] = {
+                    "id": "stub",
+                    "usage": _usage(len(tokens), time.perf_counter() - start, config),
+                }
+            self._chunk(b"data: " + json.dumps(chunk).encode("utf-8") + b"\n\n")
+
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+        self.server.account(time.perf_counter() - start)
+
+    def _chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _json(self, status: int, data: Any):
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json")
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def reply_for(prompt: str, config: StubConfig) -> str:
+    if prompt.startswith("DETECT"):
+        tool = re.search(r"^Most commonly used: ((?!\d)\w+)\(", prompt, re.M)
+        text = prompt.rsplit("TEXT:\n", 1)[-1].rsplit("\nEND", 1)[0]
+        last = [line for line in text.splitlines() if line.startswith("user:")]
+
+        if tool and "weather" in (last[-1] if last else text).lower():
+            return '%s("Berlin")' % tool.group(1)
+        return "null"
+
+    if "CHECK" in prompt:
+        return "true"
+
+    return " ".join("token" for _ in range(config.completion_tokens))
+
+
+def completion(
+    payload: Dict[str, Any],
+    content: str,
+    tokens: int,
+    elapsed: float,
+    config: StubConfig,
+) -> Dict[str, Any]:
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "stub"),
+        "system_fingerprint": "stub",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": {
+            "prompt_tokens": sum(len(m["content"]) // 4 for m in payload["messages"]),
+            "completion_tokens": tokens,
+            "total_tokens": tokens,
+        },
+        "x_groq": {"id": "stub", "usage": _usage(tokens, elapsed, config)},
+    }
+
+
+def _generation_time(tokens: int, config: StubConfig) -> float:
+    return tokens / config.tokens_per_sec if config.tokens_per_sec else 0.0
+
+
+def _usage(tokens: int, elapsed: float, config: StubConfig) -> Dict[str, Any]:
+    return {
+        "queue_time": 0.0,
+        "prompt_tokens": 0,
+        "prompt_time": config.latency,
+        "completion_tokens": tokens,
+        "completion_time": max(elapsed - config.latency, 1e-6),
+        "total_tokens": tokens,
+        "total_time": elapsed,
+    }
+
+
+def serve(
+    port: int = 0, config: Optional[StubConfig] = None, host: str = "127.0.0.1"
+) -> StubServer:
+    """Starts the stub in a background thread. ``port=0`` picks a free port."""
+    server = StubServer((host, port), config or StubConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0)
+    parser.add_argument("--completion-tokens", type=int, default=32)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubServer(
+        (args.host, args.port),
+        StubConfig(
+            latency=args.latency,
+            tokens_per_sec=args.tokens_per_sec,
+            completion_tokens=args.completion_tokens,
+            error_rate=args.error_rate,
+        ),
+    )
+    print(f"stub listening on {server.url}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
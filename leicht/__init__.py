@@ -1,4 +1,38 @@
-from .assistant import Assistant
-from .prompts import get_prompt, update_all as update_prompts
+from typing import TYPE_CHECKING, Any
 
-__all__ = ("Assistant", "get_prompt", "update_prompts")
+if TYPE_CHECKING:
+    from .assistant import Assistant, Pipeline, pipeline
+    from .prompts import get_prompt, update_all as update_prompts
+    from ._warmup import warmup
+
+# imported on first access, so `import leicht` stays cheap
+_lazy = {
+    "Assistant": (".assistant", "Assistant"),
+    "Pipeline": (".assistant", "Pipeline"),
+    "pipeline": (".assistant", "pipeline"),
+    "get_prompt": (".prompts", "get_prompt"),
+    "update_prompts": (".prompts", "update_all"),
+    "warmup": ("._warmup", "warmup"),
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from importlib import import_module
+
+    module, attr = _lazy[name]
+    value = getattr(import_module(module, __name__), attr)
+    globals()[name] = value
+    return value
+
+
+__all__ = (
+    "Assistant",
+    "Pipeline",
+    "pipeline",
+    "get_prompt",
+    "update_prompts",
+    "warmup",
+)
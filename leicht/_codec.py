@@ -0,0 +1,45 @@
+"""JSON codec.
+
+Uses ``orjson`` or ``msgspec`` when installed, otherwise the standard library.
+"""
+
+import json
+from typing import Any, Callable, Union
+
+dumps: Callable[[Any], bytes]
+loads: Callable[[Union[bytes, str]], Any]
+canonical: Callable[[Any], bytes]  # sorted keys, so equal objects give equal bytes
+
+try:
+    import orjson
+
+    name = "orjson"
+    dumps = orjson.dumps
+    loads = orjson.loads
+
+    def canonical(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+
+except ImportError:
+    try:
+        import msgspec
+
+        name = "msgspec"
+        dumps = msgspec.json.Encoder().encode
+        loads = msgspec.json.Decoder().decode
+        canonical = msgspec.json.Encoder(order="sorted").encode
+
+    except ImportError:
+        name = "json"
+        _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        _sorted_encoder = json.JSONEncoder(
+            ensure_ascii=False, separators=(",", ":"), sort_keys=True
+        )
+
+        def dumps(obj: Any) -> bytes:
+            return _encoder.encode(obj).encode("utf-8")
+
+        def canonical(obj: Any) -> bytes:
+            return _sorted_encoder.encode(obj).encode("utf-8")
+
+        loads = json.loads
@@ -0,0 +1,20 @@
+"""Environment loading."""
+
+_loaded = False
+
+
+def load_env() -> None:
+    """Loads ``.env`` with ``python-dotenv``, if installed. Only the first call
+    does anything."""
+    global _loaded
+
+    if _loaded:
+        return
+
+    _loaded = True
+    try:
+        import dotenv
+    except ImportError:
+        return
+
+    dotenv.load_dotenv()
@@ -0,0 +1,43 @@
+"""Shared HTTP connection pool."""
+
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+_client: Optional[httpx.Client] = None
+_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    """Gets the process-wide pooled client.
+
+    Every backend shares it, so keep-alive connections (and their TLS sessions)
+    are reused across calls instead of being renegotiated each time.
+    """
+    global _client
+
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=100, max_keepalive_connections=20
+                    )
+                )
+
+    return _client
+
+
+def preconnect(url: str) -> None:
+    """Opens a pooled connection to the origin of ``url``.
+
+    The response status doesn't matter; only the connection is kept.
+    """
+    parts = urlsplit(url)
+
+    try:
+        get_client().head(f"{parts.scheme}://{parts.netloc}/", timeout=10)
+    except httpx.HTTPError:
+        ...  # the real request will surface the error
@@ -0,0 +1,276 @@
+"""Incremental JSON parsing, for streamed JSON mode responses."""
+
+from typing import Any, List, Optional, Tuple, Union
+
+from ._codec import loads
+
+Path = Tuple[Union[str, int], ...]
+
+_WHITESPACE = " \t\r\n"
+_SCALAR_END = ",}]" + _WHITESPACE
+_MISSING = object()
+
+
+class _Frame:
+    __slots__ = ("container", "path", "key", "expect")
+    container: Union[dict, list]
+    path: Path
+    key: Optional[str]
+    expect: str  # "first", "key", "colon", "value" or "comma"
+
+    def __init__(self, container: Union[dict, list], path: Path):
+        self.container = container
+        self.path = path
+        self.key = None
+        self.expect = "first"
+
+
+class JSONStream:
+    """Parses a JSON document as it arrives, building it up in place.
+
+    :meth:`feed` returns each field or array element that completed in the
+    text fed, up to ``depth`` levels deep, as ``(path, value)``: for
+    ``{"items": [1, 2]}``, ``depth=2`` gives ``(("items", 0), 1)``,
+    ``(("items", 1), 2)``, then ``(("items",), [1, 2])``.
+
+    :meth:`partial` gets the document so far, including the text of a string
+    still arriving.
+
+    Args:
+        depth (int): Max depth of the completed values to report.
+    """
+
+    __slots__ = (
+        "depth",
+        "_buf",
+        "_pos",
+        "_stack",
+        "_root",
+        "_kind",
+        "_start",
+        "_is_key",
+        "_pending",
+        "_events",
+    )
+    depth: int
+    _buf: str
+    _pos: int
+    _stack: List[_Frame]
+    _root: Any
+    _kind: Optional[str]  # token being read: "string", "scalar", or None
+    _start: int  # where it started
+    _is_key: bool  # whether the string is an object key
+    _pending: bool  # whether a partial string was put in its container
+    _events: List[Tuple[Path, Any]]
+
+    def __init__(self, depth: int = 1):
+        self.depth = depth
+        self._buf = ""
+        self._pos = 0
+        self._stack = []
+        self._root = _MISSING
+        self._kind = None
+        self._start = 0
+        self._is_key = False
+        self._pending = False
+        self._events = []
+
+    def feed(self, text: str) -> List[Tuple[Path, Any]]:
+        """Parses more text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            list[tuple[Path, Any]]: Values completed, as ``(path, value)``.
+        """
+        self._buf += text
+        buf = self._buf
+        n = len(buf)
+        i = self._pos
+        stack = self._stack
+
+        while i < n:
+            kind = self._kind
+
+            if kind == "string":
+                # find the closing quote: one not preceded by an odd number of
+                # backslashes
+                q = buf.find('"', i)
+                while q != -1:
+                    b = q - 1
+                    while buf[b] == "\\":
+                        b -= 1
+                    if (q - 1 - b) % 2 == 0:
+                        break
+                    q = buf.find('"', q + 1)
+
+                if q == -1:
+                    i = n
+                    break
+
+                value = loads(buf[self._start : q + 1])
+                self._kind = None
+                i = q + 1
+
+                if self._is_key:
+                    stack[-1].key = value
+                    stack[-1].expect = "colon"
+                else:
+                    self._complete(value)
+                continue
+
+            if kind == "scalar":
+                if buf[i] not in _SCALAR_END:
+                    i += 1
+                    continue
+
+                self._kind = None
+                self._complete(self._scalar(buf[self._start : i]))
+                continue  # the delimiter is handled below
+
+            c = buf[i]
+            if c in _WHITESPACE:
+                i += 1
+                continue
+
+            frame = stack[-1] if stack else None
+            expect = frame.expect if frame is not None else "value"
+            is_dict = frame is not None and isinstance(frame.container, dict)
+
+            if frame is None and self._root is not _MISSING:
+                raise ValueError(f"Extra data at {i}: {buf[i : i + 20]!r}")
+
+            if c in "}]" and expect in ("first", "comma"):
+                if (c == "}") != is_dict:
+                    raise ValueError(f"Unexpected {c!r} at {i}")
+
+                stack.pop()
+                self._emit(frame.path, frame.container)  # type: ignore
+                i += 1
+
+            elif c == "," and expect == "comma":
+                frame.expect = "key" if is_dict else "value"  # type: ignore
+                i += 1
+
+            elif c == ":" and expect == "colon":
+                frame.expect = "value"  # type: ignore
+                i += 1
+
+            elif is_dict and expect in ("first", "key"):
+                if c != '"':
+                    raise ValueError(f"Expected a key at {i}, got {c!r}")
+
+                self._kind, self._start, self._is_key = "string", i, True
+                i += 1
+
+            elif expect in ("value", "first"):
+                if frame is not None:
+                    frame.expect = "comma"
+
+                if c in "{[":
+                    container: Union[dict, list] = {} if c == "{" else []
+                    path = self._attach(container)
+                    stack.append(_Frame(container, path))
+                elif c == '"':
+                    self._kind, self._start, self._is_key = "string", i, False
+                elif c in "-0123456789tfn":
+                    self._kind, self._start = "scalar", i
+                else:
+                    raise ValueError(f"Unexpected {c!r} at {i}")
+                i += 1
+
+            else:
+                raise ValueError(f"Unexpected {c!r} at {i}")
+
+        self._pos = i
+        events, self._events = self._events, []
+        return events
+
+    def partial(self) -> Any:
+        """Gets the document so far: containers hold what has completed, plus
+        a string still arriving. ``None`` before anything has. The object is
+        updated in place as more text is fed."""
+        if self._kind == "string" and not self._is_key and self._stack:
+            text = self._buf[self._start + 1 : self._pos]
+
+            # drop an escape sequence cut in half
+            cut = text.rfind("\\")
+            size = 6 if text[cut + 1 : cut + 2] == "u" else 2
+            if cut != -1 and len(text) - cut < size:
+                b = cut
+                while b > 0 and text[b - 1] == "\\":
+                    b -= 1
+                if (cut - b) % 2 == 0:
+                    text = text[:cut]
+
+            try:
+                value = loads('"' + text + '"')
+            except Exception:
+                value = None
+
+            if value is not None:
+                self._put(value)
+                self._pending = True
+
+        return None if self._root is _MISSING else self._root
+
+    def close(self) -> Any:
+        """Ends the document.
+
+        Returns:
+            Any: The document.
+
+        Raises:
+            ValueError: If the document is incomplete.
+        """
+        if self._kind == "scalar":
+            self._kind = None
+            self._complete(self._scalar(self._buf[self._start :]))
+
+        if self._kind is not None or self._stack or self._root is _MISSING:
+            raise ValueError(
+                f"Incomplete JSON document ({len(self._buf)} characters): "
+                f"{self._buf[-40:]!r}"
+            )
+
+        return self._root
+
+    def _scalar(self, token: str) -> Any:
+        try:
+            return loads(token)
+        except Exception:
+            raise ValueError(f"Invalid JSON value: {token!r}") from None
+
+    def _attach(self, value: Any) -> Path:
+        # puts a value in its container; returns its path
+        if not self._stack:
+            self._root = value
+            return ()
+
+        frame = self._stack[-1]
+        if isinstance(frame.container, dict):
+            frame.container[frame.key] = value
+            return (*frame.path, frame.key)  # type: ignore
+
+        frame.container.append(value)
+        return (*frame.path, len(frame.container) - 1)
+
+    def _put(self, value: Any) -> Path:
+        # like _attach, but replaces a partial string put there before
+        if self._pending and self._stack:
+            frame = self._stack[-1]
+            if isinstance(frame.container, list):
+                frame.container[-1] = value
+                return (*frame.path, len(frame.container) - 1)
+
+        return self._attach(value)
+
+    def _complete(self, value: Any) -> None:
+        path = self._put(value)
+        self._pending = False
+        self._emit(path, value)
+
+    def _emit(self, path: Path, value: Any) -> None:
+        if 0 < len(path) <= self.depth:
+            self._events.append((path, value))
@@ -0,0 +1,118 @@
+"""Warm-up.
+
+Pays the first-request costs (prompt downloads, imports, TLS handshakes,
+starting tool worker processes) ahead of time, in parallel.
+"""
+
+import importlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from ._env import load_env
+from ._http import preconnect
+from .conditional import AnyConditional, Conditional, ConditionalCascade
+from .llms.base import BaseLLM
+from .prompts import get_prompt
+from .tools.base import BaseTool, ProcessTool
+from .utils import prompt_alike
+
+
+def warmup(
+    *,
+    prompts: Iterable[str] = (),
+    urls: Iterable[str] = (),
+    tools: Iterable[BaseTool] = (),
+    max_workers: int = 8,
+) -> Dict[str, float]:
+    """Warms up leicht.
+
+    ```python
+    leicht.warmup(prompts=["functions-v2"], urls=["https://api.groq.com"])
+    ```
+
+    Args:
+        prompts (Iterable[str]): Prompt names to preload into the cache.
+        urls (Iterable[str]): URLs whose origins get a pooled connection.
+        tools (Iterable[BaseTool]): Tools. If any runs in a worker process
+            (``@tool(executor="process")``), a worker is started.
+        max_workers (int): Max threads.
+
+    Returns:
+        dict[str, float]: Seconds each stage took, plus ``"total"``.
+    """
+    origins = {u.split("://", 1)[-1].split("/", 1)[0]: u for u in urls}
+    jobs: List[Tuple[str, Callable[[], object]]] = [
+        ("modules", _load_modules),
+        *(("prompts", _bind(get_prompt, p)) for p in dict.fromkeys(prompts)),
+        *(("connections", _bind(preconnect, u)) for u in origins.values()),
+    ]
+    if any(isinstance(t, ProcessTool) for t in tools):
+        jobs.append(("tools", _start_worker))
+
+    start = time.perf_counter()
+    spans: Dict[str, Tuple[float, float]] = {}
+    lock = threading.Lock()
+
+    def timed(stage: str, fn: Callable[[], object]):
+        began = time.perf_counter()
+        fn()
+        ended = time.perf_counter()
+
+        with lock:
+            # a stage runs from its first job's start to its slowest job's end
+            first, last = spans.get(stage, (began, ended))
+            spans[stage] = (min(first, began), max(last, ended))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(timed, stage, fn) for stage, fn in jobs]
+        for future in futures:
+            future.result()
+
+    stages = {stage: last - first for stage, (first, last) in spans.items()}
+    stages["total"] = time.perf_counter() - start
+    return stages
+
+
+def plan_for(
+    llm: BaseLLM, conditionals: Iterable[AnyConditional] = ()
+) -> Tuple[List[str], List[str]]:
+    """Collects the prompts and URLs an LLM and its conditionals need."""
+    plan = llm.warmup_plan()
+    prompts, urls = list(plan["prompts"]), list(plan["urls"])
+
+    from .llms.hf import BASE_URL as HF_BASE_URL
+
+    for con in _llm_conditionals(conditionals):
+        if prompt_alike(con._prompt):
+            prompts.append(con._prompt)
+        urls.append(HF_BASE_URL)
+
+    return prompts, urls
+
+
+def _llm_conditionals(conditionals: Iterable[AnyConditional]) -> Iterator[Conditional]:
+    for con in conditionals:
+        if isinstance(con, ConditionalCascade):
+            yield from _llm_conditionals(c for tier in con.tiers for c in tier)
+        elif isinstance(con, Conditional):
+            yield con
+
+
+def _load_modules():
+    from .llms._pipeline import load_plugins
+
+    load_env()
+    load_plugins()
+    importlib.import_module("leicht.llms.hf")
+
+
+def _start_worker():
+    from .tools._process import get_process_pool
+
+    get_process_pool().start()
+
+
+def _bind(fn: Callable, arg) -> Callable[[], object]:
+    return lambda: fn(arg)
@@ -1,4 +1,18 @@
-from typing import List, Mapping, Optional, Union, overload
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+from ._codec import dumps
 
 from .llms.base import BaseLLM as AnyLLM
 from .llms._pipeline import get_llm
@@ -6,9 +20,23 @@ from .prompts import get_prompt
 from .types import Message, LLMType
 from .utils import clamp, msgs_to_text
 from .tools.base import BaseTool
-from .logger import logger
+from .tools._index import ToolIndex
+from .logger import event
+from .metrics import span
 from .utils import prompt_alike
-from .conditional import Conditional, ConditionalCheckError
+from .conditional import AnyConditional, check_all
+from .cache import SemanticCache
+from .history import History
+from .deadline import (
+    Deadline,
+    DeadlineExceeded,
+    current as current_deadline,
+    degrades,
+    skipped,
+    stage,
+    using,
+)
+from ._warmup import plan_for, warmup
 
 
 class Assistant:
@@ -19,13 +47,34 @@ class Assistant:
             be set as system prompt. If given a prompt specification from
             `preprompted-data`, loads the prompt.
         llm (LLMType): The LLM. Defaults to OpenAI (shortcut: ``"openai"``).
+        tools (list[BaseTool], optional): Tools the LLM can call.
+        conditionals (list[AnyConditional], optional): Checks every inquiry must
+            pass. Rule conditionals run first; LLM ones run concurrently.
+        batch_conditionals (bool): Check all conditionals in a single LLM
+            request instead of one request each.
+        semantic_cache (SemanticCache, optional): Answers inquiries similar to
+            earlier ones, in the same context, from the cache. Turns that call
+            tools are never cached, as their answers depend on the tool results.
+        tool_index (ToolIndex, optional): Offers each turn only the tools
+            relevant to its inquiry, for large tool sets.
     """
 
-    __slots__ = ("llm", "messages", "tools", "conditionals")
+    __slots__ = (
+        "llm",
+        "_history",
+        "tools",
+        "conditionals",
+        "batch_conditionals",
+        "semantic_cache",
+        "tool_index",
+    )
     llm: AnyLLM
-    messages: List[Message]
+    _history: History
     tools: Mapping[str, BaseTool]
-    conditionals: List[Conditional]
+    conditionals: List[AnyConditional]
+    batch_conditionals: bool
+    semantic_cache: Optional[SemanticCache]
+    tool_index: Optional[ToolIndex]
 
     def __init__(
         self,
@@ -33,35 +82,94 @@ class Assistant:
         *,
         llm: LLMType,
         tools: Optional[List[BaseTool]] = None,
-        conditionals: Optional[List[Conditional]] = None,
+        conditionals: Optional[List[AnyConditional]] = None,
+        batch_conditionals: bool = False,
+        semantic_cache: Optional[SemanticCache] = None,
+        tool_index: Optional[ToolIndex] = None,
         **llm_kwargs,
     ):
-        if prompt_alike(description):
-            # Is a prompt name specification
-            try:
-                description = get_prompt(description)
-            except:  # noqa: E722
-                ...  # Use the description
-
-        tools = tools or []
-        self.tools = {tool.name: tool for tool in tools}
-        self.llm = get_llm(llm, tools=[tool.prompt for tool in tools], **llm_kwargs)
-        self.messages = [
-            {
-                "role": "system",
-                "content": description
-                + (
-                    (
-                        "You can:\n"
-                        + "\n".join(((tool.caps or tool.description) for tool in tools))
-                        + "\n(all return real-time info)"
-                    )
-                    if tools
-                    else ""
-                ),
-            }
-        ]
+        self.llm, self.tools, system = _compile(
+            description, llm, tools, llm_kwargs, tool_index
+        )
+        self._history = History([system])
         self.conditionals = conditionals or []
+        self.batch_conditionals = batch_conditionals
+        self.semantic_cache = semantic_cache
+        self.tool_index = tool_index
+
+    @property
+    def messages(self) -> History:
+        """The conversation, as a :class:`History`: a mutable sequence of
+        messages that compares equal to the same list. For ``json.dumps``, use
+        ``assistant.messages.to_list()``. Setting it to a list of messages
+        replaces it."""
+        return self._history
+
+    @messages.setter
+    def messages(self, messages: Union[History, List[Message]]) -> None:
+        if messages is self._history:  # `assistant.messages += [...]`
+            return
+
+        self._history = (
+            messages.fork() if isinstance(messages, History) else History(messages)
+        )
+
+    def fork(self) -> "Assistant":
+        """Creates a copy of this assistant to branch the conversation off. O(1):
+        the conversation so far is shared, not copied."""
+        fork = Assistant.__new__(Assistant)
+        fork.llm = self.llm
+        fork._history = self._history.fork()
+        fork.tools = self.tools
+        fork.conditionals = self.conditionals
+        fork.batch_conditionals = self.batch_conditionals
+        fork.semantic_cache = self.semantic_cache
+        fork.tool_index = self.tool_index
+        return fork
+
+    def run_forks(
+        self,
+        inquiries: Sequence[Union[str, List[Message], Tuple[Any, Dict[str, Any]]]],
+        *,
+        max_workers: Optional[int] = None,
+        **params,
+    ) -> List[Tuple["Assistant", Any]]:
+        """Runs each inquiry on its own fork, in parallel.
+
+        ```python
+        results = assistant.run_forks(
+            ["Make it shorter.", ("Make it funnier.", {"temperature": 1.2})],
+            temperature=0.7,
+        )
+        for fork, res in results:
+            ...
+        ```
+
+        Args:
+            inquiries (Sequence): Inquiries, or ``(inquiry, params)`` pairs to
+                override ``params`` for that fork.
+            max_workers (int, optional): Max forks running at once.
+            **params: Parameters for :meth:`run`.
+
+        Returns:
+            list[tuple[Assistant, Any]]: Each fork and its response, in order.
+        """
+
+        def run(inquiry) -> Tuple["Assistant", Any]:
+            overrides: Dict[str, Any] = {}
+            if isinstance(inquiry, tuple):
+                inquiry, overrides = inquiry
+
+            fork = self.fork()
+            return fork, fork.run(inquiry, **{**params, **overrides})
+
+        if not inquiries:
+            return []
+
+        with ThreadPoolExecutor(
+            max_workers or len(inquiries), thread_name_prefix="leicht-fork"
+        ) as executor:
+            return list(executor.map(run, inquiries))
 
     @overload
     def run(
@@ -74,6 +182,8 @@ class Assistant:
         stream: bool = False,
         stop: Optional[str] = None,
         seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[Deadline] = None,
     ): ...
 
     @overload
@@ -87,6 +197,8 @@ class Assistant:
         stream: bool = False,
         stop: Optional[str] = None,
         seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[Deadline] = None,
     ): ...
 
     def run(
@@ -99,19 +211,346 @@ class Assistant:
         stream: bool = False,
         stop: Optional[str] = None,
         seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[Deadline] = None,
     ):
-        """Run the assistant instance."""
-        logger.info("Assistant(): running")
+        """Run the assistant instance.
 
-        if self.conditionals:
-            logger.info("Assistant(): checking conditionals...")
-            for con in self.conditionals:
-                logger.info(f"Assistant(): check - {con!r}")
+        Args:
+            inquiry (str | list[Message]): The inquiry, or messages ending with
+                one.
+            timeout (float, optional): Time budget of the turn, in seconds. See
+                :mod:`leicht.deadline`.
+            deadline (Deadline, optional): A deadline with its degrade policy,
+                instead of ``timeout``.
+        """
+        return _turn(
+            self,
+            self._history,
+            inquiry,
+            {
+                "max_tokens": max_tokens,
+                "seed": seed,
+                "stop": stop,
+                "stream": stream,
+                "temperature": temperature,
+                "top_p": top_p,
+            },
+            _deadline_for(timeout, deadline),
+        )
+
+    def pipeline(
+        self,
+        inquiry: Union[List[Message], str],
+        *,
+        max_tokens: int = 4096,
+        temperature: float = 1.0,
+        top_p: float = 1.0,
+        stream: bool = False,
+        stop: Optional[str] = None,
+        seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[Deadline] = None,
+    ):
+        """Runs a one-off turn: the conversation so far is sent as context, but
+        neither the inquiry nor anything else is saved to it."""
+        return _turn(
+            self,
+            self._history.fork(),
+            inquiry,
+            {
+                "max_tokens": max_tokens,
+                "seed": seed,
+                "stop": stop,
+                "stream": stream,
+                "temperature": temperature,
+                "top_p": top_p,
+            },
+            _deadline_for(timeout, deadline),
+        )
+
+    def warmup(self) -> Dict[str, float]:
+        """Warms up everything this assistant needs for its first run: prompts
+        for the tools and conditionals, backend connections and tool prompts.
+
+        Returns:
+            dict[str, float]: Seconds each stage took, plus ``"total"``.
+        """
+        prompts, urls = plan_for(self.llm, self.conditionals)
+        return warmup(prompts=prompts, urls=urls, tools=self.tools.values())
+
+    def __repr__(self) -> str:
+        description = self.messages[0]["content"]
+        return f"Assistant(description={clamp(description)!r}, tools={self.tools}, conditionals={self.conditionals})"
 
-                if not con.check(msgs_to_text(inquiry)):
-                    raise ConditionalCheckError(
-                        f"Rejected due to conditional check: {con!r}"
-                    )
+
+class Pipeline:
+    """A compiled, immutable assistant template for one-off turns.
+
+    The description, tools, conditionals and LLM are resolved once. Each call
+    sends the system prompt and the inquiry only, and saves nothing, so a
+    pipeline can be called from many threads at once.
+
+    ```python
+    from leicht import pipeline
+
+    who = pipeline("basic", "groq")
+    who("Who's this?")
+    ```
+
+    Args:
+        description (str): Description of the assistant. See
+            :class:`Assistant`.
+        llm (LLMType): The LLM.
+        tools (list[BaseTool], optional): Tools the LLM can call.
+        conditionals (list[AnyConditional], optional): Checks every inquiry must
+            pass.
+        batch_conditionals (bool): Check all conditionals in a single LLM
+            request.
+        semantic_cache (SemanticCache, optional): Answers inquiries similar to
+            earlier ones from the cache.
+        tool_index (ToolIndex, optional): Offers each turn only the tools
+            relevant to its inquiry.
+    """
+
+    __slots__ = (
+        "llm",
+        "system",
+        "tools",
+        "conditionals",
+        "batch_conditionals",
+        "semantic_cache",
+        "tool_index",
+    )
+    llm: AnyLLM
+    system: Message
+    tools: Mapping[str, BaseTool]
+    conditionals: Tuple[AnyConditional, ...]
+    batch_conditionals: bool
+    semantic_cache: Optional[SemanticCache]
+    tool_index: Optional[ToolIndex]
+
+    def __init__(
+        self,
+        description: str,
+        *,
+        llm: LLMType,
+        tools: Optional[List[BaseTool]] = None,
+        conditionals: Optional[List[AnyConditional]] = None,
+        batch_conditionals: bool = False,
+        semantic_cache: Optional[SemanticCache] = None,
+        tool_index: Optional[ToolIndex] = None,
+        **llm_kwargs,
+    ):
+        llm, tools_map, system = _compile(
+            description, llm, tools, llm_kwargs, tool_index
+        )
+
+        init = object.__setattr__
+        init(self, "llm", llm)
+        init(self, "system", system)
+        init(self, "tools", MappingProxyType(tools_map))
+        init(self, "conditionals", tuple(conditionals or ()))
+        init(self, "batch_conditionals", batch_conditionals)
+        init(self, "semantic_cache", semantic_cache)
+        init(self, "tool_index", tool_index)
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def run(
+        self,
+        inquiry: Union[List[Message], str],
+        *,
+        max_tokens: int = 4096,
+        temperature: float = 1.0,
+        top_p: float = 1.0,
+        stream: bool = False,
+        stop: Optional[str] = None,
+        seed: Optional[int] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[Deadline] = None,
+    ):
+        """Runs a one-off turn.
+
+        Args:
+            inquiry (str | list[Message]): The inquiry, or messages ending with
+                one.
+            timeout (float, optional): Time budget of the turn, in seconds.
+            deadline (Deadline, optional): A deadline with its degrade policy,
+                instead of ``timeout``.
+        """
+        return _turn(
+            self,
+            [self.system],
+            inquiry,
+            {
+                "max_tokens": max_tokens,
+                "seed": seed,
+                "stop": stop,
+                "stream": stream,
+                "temperature": temperature,
+                "top_p": top_p,
+            },
+            _deadline_for(timeout, deadline),
+        )
+
+    __call__ = run
+
+    def assistant(self) -> Assistant:
+        """Creates an assistant from this template, with an empty conversation.
+        Nothing is resolved again."""
+        assistant = Assistant.__new__(Assistant)
+        assistant.llm = self.llm
+        assistant.tools = dict(self.tools)
+        assistant._history = History([self.system])
+        assistant.conditionals = list(self.conditionals)
+        assistant.batch_conditionals = self.batch_conditionals
+        assistant.semantic_cache = self.semantic_cache
+        assistant.tool_index = self.tool_index
+        return assistant
+
+    def warmup(self) -> Dict[str, float]:
+        """See :meth:`Assistant.warmup`."""
+        prompts, urls = plan_for(self.llm, self.conditionals)
+        return warmup(prompts=prompts, urls=urls, tools=self.tools.values())
+
+    def __repr__(self) -> str:
+        description = self.system["content"]
+        return f"Pipeline(description={clamp(description)!r}, tools={dict(self.tools)}, conditionals={list(self.conditionals)})"
+
+
+def pipeline(description: str, llm: LLMType = "openai", **kwargs) -> Pipeline:
+    """Compiles a :class:`Pipeline`, for one-off turns.
+
+    Args:
+        description (str): Description of the assistant.
+        llm (LLMType): The LLM.
+        **kwargs: See :class:`Pipeline`.
+    """
+    return Pipeline(description, llm=llm, **kwargs)
+
+
+def _compile(
+    description: str,
+    llm: LLMType,
+    tools: Optional[List[BaseTool]],
+    llm_kwargs: dict,
+    tool_index: Optional[ToolIndex] = None,
+) -> Tuple[AnyLLM, Dict[str, BaseTool], Message]:
+    if prompt_alike(description):
+        # Is a prompt name specification
+        try:
+            description = get_prompt(description)
+        except:  # noqa: E722
+            ...  # Use the description
+
+    tools = tools or []
+    llm = get_llm(llm, tools=[tool.prompt for tool in tools], **llm_kwargs)
+
+    if tool_index is not None:
+        # each turn lists the tools it's offered instead
+        tool_index.fit(tools)
+        system: Message = {"role": "system", "content": description}
+    else:
+        system = {"role": "system", "content": description + _capabilities(tools)}
+
+    return llm, {tool.name: tool for tool in tools}, system
+
+
+def _capabilities(tools: Sequence[BaseTool]) -> str:
+    if not tools:
+        return ""
+
+    return (
+        "You can:\n"
+        + "\n".join(((tool.caps or tool.description) for tool in tools))
+        + "\n(all return real-time info)"
+    )
+
+
+def _offer(messages: List[Message], tools: Sequence[BaseTool]) -> List[Message]:
+    # the messages to send, with the tools offered this turn in the system prompt
+    if not tools:
+        return messages
+
+    if messages and messages[0]["role"] == "system":
+        system = messages[0]
+        return [
+            {**system, "content": system["content"] + _capabilities(tools)},
+            *messages[1:],
+        ]
+
+    return [{"role": "system", "content": _capabilities(tools)}, *messages]
+
+
+def _as_list(messages: Union[History, List[Message]]) -> List[Message]:
+    return messages.to_list() if isinstance(messages, History) else messages
+
+
+def _replay(raw: bytes, stream: bool, json_mode: bool):
+    from .llms.openai import OpenAIResponse, Replay
+
+    return OpenAIResponse(
+        {},
+        stream=stream,
+        pipe=Replay(raw) if stream else None,
+        json_mode=json_mode,
+        raw=None if stream else raw,
+    )
+
+
+def _remember(cache: SemanticCache, text: str, scope: int, res, stream: bool) -> None:
+    if isinstance(res, dict):
+        cache.put(text, scope, dumps(res))
+    elif not stream:
+        cache.put(text, scope, dumps(res.data))
+    elif hasattr(res, "add_done_callback"):
+        # only complete streams are cached
+        res.add_done_callback(lambda data: cache.put(text, scope, dumps(data)))
+
+
+def _deadline_for(
+    timeout: Optional[float], deadline: Optional[Deadline]
+) -> Optional[Deadline]:
+    if deadline is not None or timeout is None:
+        return deadline
+
+    # within an outer deadline: keep its policy, and the earlier end
+    outer = current_deadline()
+    if outer is not None and outer.remaining() <= timeout:
+        return None
+
+    return Deadline(timeout, degrade=outer.degrade if outer is not None else ())
+
+
+def _turn(
+    owner: Union["Assistant", "Pipeline"],
+    messages: Union[History, List[Message]],
+    inquiry: Union[List[Message], str],
+    payload: dict,
+    deadline: Optional[Deadline] = None,
+):
+    # one turn: `messages` gets the inquiry and tool results appended
+    stream = payload["stream"]
+
+    with span("run", stream=stream), using(deadline):
+        event("assistant.run", stream=stream)
+
+        if owner.conditionals:
+            event("assistant.conditionals", count=len(owner.conditionals))
+            with span("conditionals", count=len(owner.conditionals)):
+                try:
+                    with stage("conditionals"):
+                        check_all(
+                            owner.conditionals,
+                            msgs_to_text(inquiry),
+                            batch=owner.batch_conditionals,
+                        )
+                except DeadlineExceeded:
+                    if not degrades("skip_conditionals"):
+                        raise
+                    skipped("conditionals")
 
         if isinstance(inquiry, list):
             if not inquiry:
@@ -133,61 +572,74 @@ class Assistant:
                     + "  should be 'user'.\x1b[0m\n"
                 )
 
-            self.messages += inquiry
+            messages += inquiry
         else:
             # Message(role="user", content=inquiry)
-            self.messages.append({"role": "user", "content": inquiry})
-
-        logger.info("Assistant(): inferring if functions are needed")
-        payload = {
-            "max_tokens": max_tokens,
-            "seed": seed,
-            "stop": stop,
-            "stream": stream,
-            "temperature": temperature,
-            "top_p": top_p,
-        }
-        res = self.llm(
-            {
-                **payload,
-                "messages": self.messages,
-            }
-        )
+            messages.append({"role": "user", "content": inquiry})
+
+        cache = owner.semantic_cache
+        if cache is not None:
+            text = messages[-1]["content"]
+            scope = cache.scope(
+                messages[:-1],
+                {k: v for k, v in payload.items() if k != "stream"},
+            )
+            cached = cache.get(text, scope)
+
+            if cached is not None:
+                event("assistant.done", functions=False, cached=True)
+                json_mode = bool(getattr(owner.llm, "_json_mode", False))
+                return _replay(cached, stream, json_mode)
+
+        index = owner.tool_index
+        offered: Optional[List[BaseTool]] = None
+        options: Dict[str, Any] = {}
+        if index is not None and owner.tools:
+            offered = index.select(messages[-1]["content"])
+            options["tools"] = [tool.prompt for tool in offered]
+
+        def request() -> List[Message]:
+            sent = _as_list(messages)
+            return sent if offered is None else _offer(sent, offered)
+
+        event("assistant.detect", llm=owner.llm)
+        res = owner.llm({**payload, "messages": request()}, **options)
+
+        # only a plain dict can be a function call response; reading a
+        # streaming response here would consume the stream
+        functions = res.get("functions") if isinstance(res, dict) else None
+        if index is not None and offered is not None:
+            index.observe(offered, [func[0] for func in functions or ()])
 
-        functions = res.copy().get("functions")
         if functions:
-            logger.info(f"Assistant(): detected function calling from {self.llm!r}")
+            event("assistant.functions", functions=functions)
 
             for func in functions:
                 # func[0] = name (str)
                 # func[1] = arguments (unparsed, str)
-                if func[0] in self.tools:
-                    logger.info(f"Assistant(): running function {func[0]}({func[1]})")
+                if func[0] in owner.tools:
+                    event("assistant.tool", name=func[0], args=func[1])
 
                     # parse arguments and run
-                    args, kwargs = BaseTool.parse_args_from_text(func[1])
-                    res = self.tools[func[0]].__call__(*args, **kwargs)
+                    with span("tool", name=func[0]), stage("tool"):
+                        args, kwargs = BaseTool.parse_args_from_text(func[1])
+                        res = owner.tools[func[0]].__call__(*args, **kwargs)
 
-                    self.messages.append(
+                    messages.append(
                         {
                             "role": "system",
                             "content": f"I executed {func[0]}({func[1]}), results:\n{res}.\nReply the user.",
                         }
                     )
 
-            logger.info("Assistant(): successfully ran all functions!")
-            logger.info("Assistant(): asking for general response...")
-            r = self.llm({**payload, "messages": self.messages}, notools=True)
-            logger.info("Assistant(): `run` instance complete")
+            event("assistant.generate", messages=len(messages))
+            r = owner.llm({**payload, "messages": request()}, notools=True)
+            event("assistant.done", functions=True)
             return r
 
         else:
-            logger.info("Assistant(): `run` instance complete (no funcs)")
-            return res
-
-    def __repr__(self) -> str:
-        description = self.messages[0]["content"]
-        return f"Assistant(description={clamp(description)!r}, tools={self.tools}, conditionals={self.conditionals})"
+            if cache is not None:
+                _remember(cache, text, scope, res, stream)
 
-
-def pipeline(description: str, llm: LLMType = "openai"): ...
+            event("assistant.done", functions=False)
+            return res
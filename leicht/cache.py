@@ -0,0 +1,552 @@
+"""Local caches."""
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from ._codec import canonical
+from .logger import event
+from .prompts import save_file
+
+if TYPE_CHECKING:
+    import numpy as np
+
+V = TypeVar("V")
+
+
+class CacheStats:
+    """Hit/miss counters."""
+
+    __slots__ = ("hits", "misses")
+    hits: int
+    misses: int
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __repr__(self) -> str:
+        return f"CacheStats(hits={self.hits}, misses={self.misses}, hit_rate={self.hit_rate:.2%})"
+
+
+class LRUCache(Generic[V]):
+    """A thread-safe, size-bounded LRU cache with optional TTL and persistence.
+
+    Args:
+        maxsize (int): Max entries. The least recently used ones are evicted.
+        ttl (float, optional): Seconds an entry stays valid.
+        path (str, optional): JSON file to load from, and to save to on
+            :meth:`save` and at exit. Keys and values must be JSON-serializable.
+    """
+
+    __slots__ = ("maxsize", "ttl", "path", "stats", "_data", "_lock")
+    maxsize: int
+    ttl: Optional[float]
+    path: Optional[str]
+    stats: CacheStats
+    _data: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]"
+    _lock: threading.Lock
+
+    def __init__(
+        self, maxsize: int = 1024, *, ttl: Optional[float] = None, path: Optional[str] = None
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.stats = CacheStats()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def get(
+        self,
+        key: Hashable,
+        default: Optional[V] = None,
+        *,
+        stats: Optional[CacheStats] = None,
+    ) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+
+            if entry is None or (entry[1] is not None and entry[1] < time.time()):
+                if entry is not None:
+                    del self._data[key]  # expired
+                self.stats.misses += 1
+                if stats is not None:  # the caller's own counters
+                    stats.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            if stats is not None:
+                stats.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: V) -> None:
+        expires = time.time() + self.ttl if self.ttl is not None else None
+
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def load(self) -> None:
+        """Loads entries from ``path``, skipping expired ones."""
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        with open(self.path, "rb") as f:
+            entries = json.loads(f.read())
+
+        now = time.time()
+        with self._lock:
+            for key, value, expires in entries[-self.maxsize :]:
+                if expires is None or expires >= now:
+                    self._data[key] = (value, expires)
+
+    def save(self) -> None:
+        """Saves entries to ``path``, least recently used first."""
+        if not self.path:
+            return
+
+        with self._lock:
+            entries = [[k, v, e] for k, (v, e) in self._data.items()]
+
+        save_file(self.path, json.dumps(entries).encode("utf-8"))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(size={len(self)}/{self.maxsize}, {self.stats!r})"
+
+
+class CompletionCache:
+    """An exact-match completion cache, stored in SQLite.
+
+    Keys are a canonical hash of the endpoint, model and the full payload
+    (except ``stream``: a streamed request can be replayed from a non-streamed
+    entry, and vice versa). Values are raw response bodies.
+
+    By default only deterministic requests are cached: ``temperature=0`` or a
+    fixed ``seed``. The HF helper calls (conditionals, function call detection)
+    sample at ``temperature=0.9``, so they're only cached with
+    ``deterministic_only=False``.
+
+    ```python
+    from leicht.cache import CompletionCache, set_completion_cache
+
+    set_completion_cache(CompletionCache(".leicht-cache.sqlite3", max_entries=50_000))
+    ```
+
+    Args:
+        path (str): Database path. Not ``":memory:"``: each thread would get a
+            database of its own. Use a temporary file instead.
+        max_entries (int): Max entries. The least recently used are evicted.
+        max_bytes (int, optional): Max total size of stored bodies.
+        ttl (float, optional): Seconds an entry stays valid.
+        deterministic_only (bool): Only cache deterministic requests.
+    """
+
+    __slots__ = (
+        "path",
+        "max_entries",
+        "max_bytes",
+        "ttl",
+        "deterministic_only",
+        "stats",
+        "_local",
+    )
+    path: str
+    max_entries: int
+    max_bytes: Optional[int]
+    ttl: Optional[float]
+    deterministic_only: bool
+    stats: CacheStats
+    _local: threading.local
+
+    def __init__(
+        self,
+        path: str = ".leicht-cache.sqlite3",
+        *,
+        max_entries: int = 10_000,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[float] = None,
+        deterministic_only: bool = True,
+    ):
+        if path == ":memory:" or path.startswith("file::memory:"):
+            raise ValueError(
+                "\n\nCompletionCache connects once per thread, so an in-memory "
+                "database would not be shared. From:\n"
+                "  CompletionCache(\x1b[38;2;152;195;121m':memory:'\x1b[0m)\n"
+                "                  \x1b[1;31m^^^^^^^^^^  use a (temporary) file\x1b[0m\n"
+            )
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.deterministic_only = deterministic_only
+        self.stats = CacheStats()
+        self._local = threading.local()
+
+    def accepts(self, payload: Dict[str, Any]) -> bool:
+        """Can this payload be cached?"""
+        return not self.deterministic_only or (
+            payload.get("temperature") == 0 or payload.get("seed") is not None
+        )
+
+    def key(self, url: str, payload: Dict[str, Any]) -> str:
+        """Makes the cache key for a request."""
+        body = {k: v for k, v in payload.items() if k != "stream"}
+        return hashlib.sha256(url.encode("utf-8") + b"\0" + canonical(body)).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        db = self._db()
+        row = db.execute(
+            "SELECT value, created FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None or (self.ttl is not None and row[1] < time.time() - self.ttl):
+            self.stats.misses += 1
+            event("cache.miss", key=key)
+            return None
+
+        with db:
+            db.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        self.stats.hits += 1
+        event("cache.hit", key=key)
+        return row[0]
+
+    def put(self, key: str, value: bytes) -> None:
+        db = self._db()
+        now = time.time()
+
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, value, now, now, len(value)),
+            )
+            if self.ttl is not None:
+                db.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+
+            count, size = db.execute(
+                "SELECT count(*), total(size) FROM entries"
+            ).fetchone()
+
+            # evict the least recently used
+            while count > self.max_entries or (
+                self.max_bytes is not None and size > self.max_bytes and count > 1
+            ):
+                db.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                    (max(count - self.max_entries, 1),),
+                )
+                count, size = db.execute(
+                    "SELECT count(*), total(size) FROM entries"
+                ).fetchone()
+
+    def clear(self) -> None:
+        db = self._db()
+        with db:
+            db.execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        return self._db().execute("SELECT count(*) FROM entries").fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"CompletionCache({self.path!r}, {self.stats!r})"
+
+    def _db(self) -> sqlite3.Connection:
+        db: Optional[sqlite3.Connection] = getattr(self._local, "db", None)
+
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")  # readers don't block writers
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB, created REAL, accessed REAL, size INTEGER)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            # for the TTL sweep on every put
+            db.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+            self._local.db = db
+
+        return db
+
+
+class SemanticCache:
+    """A near-duplicate response cache, in memory.
+
+    Queries are embedded locally as hashed character n-grams, so paraphrases
+    like "what's the capital of France" and "What is the capital of france?"
+    land close together. Lookups are one matrix-vector product over all
+    entries.
+
+    N-grams can't tell "delete my account" from "do not delete my account", or
+    "book 2 tickets" from "book 3 tickets": they score 0.84 and 0.79. So a hit
+    also needs the same numbers and as many negations as the query, unless
+    ``guard`` is off. Keep ``threshold`` high all the same: a near-duplicate
+    that means something else gets the other's answer.
+
+    Entries are grouped by *scope*, a hash of everything but the query that
+    goes into the answer (system prompt, history, sampling parameters). A
+    lookup only matches entries of the same scope.
+
+    Requires ``numpy``.
+
+    ```python
+    from leicht import Assistant
+    from leicht.cache import SemanticCache
+
+    assistant = Assistant("basic", llm="groq", semantic_cache=SemanticCache())
+    ```
+
+    Args:
+        threshold (float): Minimum cosine similarity for a hit, from ``0.0``
+            to ``1.0``.
+        guard (bool): Require the same numbers and negations for a hit.
+        max_entries (int): Max entries. The least recently used are evicted.
+        ttl (float, optional): Seconds an entry stays valid.
+        ngram (int): Character n-gram size.
+        dim (int): Embedding size. N-grams are hashed into this many buckets.
+    """
+
+    __slots__ = (
+        "threshold",
+        "guard",
+        "max_entries",
+        "ttl",
+        "ngram",
+        "dim",
+        "stats",
+        "_np",
+        "_vectors",
+        "_scopes",
+        "_live",
+        "_created",
+        "_used",
+        "_values",
+        "_guards",
+        "_lock",
+    )
+    threshold: float
+    guard: bool
+    max_entries: int
+    ttl: Optional[float]
+    ngram: int
+    dim: int
+    stats: CacheStats
+    _np: Any
+    _vectors: "np.ndarray"  # (max_entries, dim), rows are unit vectors
+    _scopes: "np.ndarray"
+    _live: "np.ndarray"
+    _created: "np.ndarray"
+    _used: "np.ndarray"
+    _values: List[Optional[bytes]]
+    _guards: List[Any]  # the numbers and negations of each entry's query
+    _lock: threading.Lock
+
+    _WORD = re.compile(r"\w+")
+    _NEGATION = re.compile(
+        r"\b(?:not|no|never|none|nothing|nobody|nor|neither|without|cannot)\b"
+        r"|n't\b",
+        re.IGNORECASE,
+    )
+    _NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        *,
+        guard: bool = True,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        ngram: int = 3,
+        dim: int = 2048,
+    ):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError(
+                "\n\nPlease install the `numpy` package to use "
+                "\x1b[38;2;229;192;123mSemanticCache\x1b[0m.\n"
+                "  \x1b[38;2;97;175;239m$ \x1b[38;2;229;192;123mpip\x1b[0m install numpy\n"
+            ) from None
+
+        self.threshold = threshold
+        self.guard = guard
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.ngram = ngram
+        self.dim = dim
+        self.stats = CacheStats()
+        self._np = numpy
+        self._vectors = numpy.zeros((max_entries, dim), dtype=numpy.float32)
+        self._scopes = numpy.zeros(max_entries, dtype=numpy.int64)
+        self._live = numpy.zeros(max_entries, dtype=bool)
+        self._created = numpy.zeros(max_entries)
+        self._used = numpy.zeros(max_entries)
+        self._values = [None] * max_entries
+        self._guards = [None] * max_entries
+        self._lock = threading.Lock()
+
+    def embed(self, text: str) -> "np.ndarray":
+        """Embeds text as a unit vector of hashed character n-grams. Case,
+        punctuation and extra whitespace are ignored."""
+        text = " " + " ".join(self._WORD.findall(text.lower())) + " "
+        n, dim = self.ngram, self.dim
+        buckets = [
+            zlib.crc32(text[i : i + n].encode("utf-8")) % dim
+            for i in range(len(text) - n + 1)
+        ]
+
+        vector = self._np.bincount(buckets, minlength=dim).astype(self._np.float32)
+        norm = self._np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def signature(self, text: str) -> Any:
+        """Gets what a hit's query must share with the text, besides being
+        similar: its numbers, and its count of negations."""
+        if not self.guard:
+            return None
+
+        return len(self._NEGATION.findall(text)), tuple(self._NUMBER.findall(text))
+
+    @staticmethod
+    def scope(*parts: Any) -> int:
+        """Hashes the context of a query into a scope. Parts must be
+        JSON-serializable."""
+        digest = hashlib.blake2b(canonical(parts), digest_size=8).digest()
+        return int.from_bytes(digest, "little", signed=True)
+
+    def get(self, text: str, scope: int = 0) -> Optional[bytes]:
+        """Gets the value of the most similar entry, if it's similar enough.
+
+        Args:
+            text (str): The query.
+            scope (int): The scope. See :meth:`scope`.
+        """
+        query = self.embed(text)
+        signature = self.signature(text)
+        now = time.time()
+
+        with self._lock:
+            mask = self._live & (self._scopes == scope)
+            if self.ttl is not None:
+                mask &= self._created >= now - self.ttl
+
+            rows = self._np.flatnonzero(mask)
+            if rows.size:
+                similarity = self._vectors[rows] @ query
+
+                # the most similar entry that passes the guard
+                above = self._np.flatnonzero(similarity >= self.threshold)
+                for best in above[self._np.argsort(-similarity[above])]:
+                    i = int(rows[best])
+                    if self._guards[i] != signature:
+                        continue
+
+                    self._used[i] = now
+                    self.stats.hits += 1
+                    event("semantic_cache.hit", similarity=float(similarity[best]))
+                    return self._values[i]
+
+            self.stats.misses += 1
+
+        event("semantic_cache.miss")
+        return None
+
+    def put(self, text: str, scope: int, value: bytes) -> None:
+        """Adds an entry, evicting expired or least recently used ones when full.
+
+        Args:
+            text (str): The query.
+            scope (int): The scope. See :meth:`scope`.
+            value (bytes): The value.
+        """
+        vector = self.embed(text)
+        signature = self.signature(text)
+        now = time.time()
+
+        with self._lock:
+            if self.ttl is not None:
+                self._live &= self._created >= now - self.ttl
+
+            free = self._np.flatnonzero(~self._live)
+            i = int(free[0]) if free.size else int(self._used.argmin())
+
+            self._vectors[i] = vector
+            self._scopes[i] = scope
+            self._live[i] = True
+            self._created[i] = now
+            self._used[i] = now
+            self._values[i] = value
+            self._guards[i] = signature
+
+    def clear(self) -> None:
+        with self._lock:
+            self._live[:] = False
+            self._values = [None] * self.max_entries
+            self._guards = [None] * self.max_entries
+
+    def __len__(self) -> int:
+        return int(self._live.sum())
+
+    def __repr__(self) -> str:
+        return (
+            f"SemanticCache(threshold={self.threshold}, "
+            f"size={len(self)}/{self.max_entries}, {self.stats!r})"
+        )
+
+
+_completion_cache: Optional[CompletionCache] = None
+
+
+def set_completion_cache(cache: Optional[CompletionCache]) -> None:
+    """Puts a completion cache in front of every backend. ``None`` turns it off.
+
+    Args:
+        cache (CompletionCache, optional): The cache.
+    """
+    global _completion_cache
+    _completion_cache = cache
+
+
+def get_completion_cache() -> Optional[CompletionCache]:
+    return _completion_cache
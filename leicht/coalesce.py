@@ -0,0 +1,377 @@
+"""Coalescing of identical in-flight requests.
+
+When many sessions send the same request at once (the same conditional check,
+the same function call detection prompt), only the first one goes upstream.
+The others wait for its result, or read along its stream.
+
+```python
+from leicht.coalesce import SingleFlight, set_single_flight
+
+set_single_flight(SingleFlight())
+```
+"""
+
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+)
+
+from ._codec import canonical
+from .deadline import DeadlineExceeded, remaining
+from .logger import event
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Shares one upstream call among concurrent identical requests.
+
+    Requests are identical when their endpoint, credentials and canonical
+    payload are.
+    By default only deterministic requests are shared (``temperature=0`` or a
+    fixed ``seed``): identical sampled requests are expected to give different
+    answers.
+
+    Args:
+        deterministic_only (bool): Only share deterministic requests.
+    """
+
+    __slots__ = (
+        "deterministic_only",
+        "calls",
+        "shared",
+        "_calls",
+        "_streams",
+        "_lock",
+    )
+    deterministic_only: bool
+    calls: int  # upstream calls made
+    shared: int  # requests that joined one
+    _calls: Dict[str, "Future[Any]"]
+    _streams: Dict[str, "Tee"]
+    _lock: threading.Lock
+
+    def __init__(self, *, deterministic_only: bool = True):
+        self.deterministic_only = deterministic_only
+        self.calls = 0
+        self.shared = 0
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def accepts(self, payload: Dict[str, Any]) -> bool:
+        """Can this payload be shared?"""
+        return not self.deterministic_only or (
+            payload.get("temperature") == 0 or payload.get("seed") is not None
+        )
+
+    def key(self, url: str, payload: Dict[str, Any], credentials: str = "") -> str:
+        """Makes the key identical requests share.
+
+        Args:
+            url (str): The endpoint.
+            payload (dict): The payload.
+            credentials (str): Whatever else picks who answers, e.g. the API
+                keys and base URLs a request may go to. Requests under other
+                credentials never share.
+        """
+        body = b"\0".join(
+            [url.encode("utf-8"), credentials.encode("utf-8"), canonical(payload)]
+        )
+        return hashlib.sha256(body).hexdigest()
+
+    def call(self, key: str, fn: Callable[[], T]) -> T:
+        """Calls ``fn``, unless a call with the same key is in flight, in which
+        case waits for its result (or exception) instead.
+
+        Args:
+            key (str): The key.
+            fn (Callable[[], T]): Makes the request.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+
+            if leader:
+                future = self._calls[key] = Future()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            event("flight.join", key=key)
+            try:
+                return future.result(remaining())  # type: ignore
+            except TimeoutError:
+                if not future.done():  # the wait timed out, not the call
+                    raise DeadlineExceeded() from None
+                raise
+
+        try:
+            result = fn()
+        except BaseException as err:
+            future.set_exception(err)  # type: ignore
+            raise
+        else:
+            future.set_result(result)  # type: ignore
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stream(
+        self, key: str, open: Callable[[], ContextManager[Any]]
+    ) -> "TeeReader":
+        """Gets a reader of the stream ``open()`` starts, unless one with the
+        same key is in flight, in which case reads along with it.
+
+        Args:
+            key (str): The key.
+            open (Callable): Makes the streaming request, e.g.
+                ``lambda: client.stream("POST", url, ...)``.
+        """
+        with self._lock:
+            tee = self._streams.get(key)
+            reader = tee.reader() if tee is not None else None
+
+            if reader is None:  # none in flight, or it just ended
+                tee = Tee(open, lambda: self._forget(key, tee))
+                self._streams[key] = tee
+                reader = tee.reader()
+                self.calls += 1
+            else:
+                self.shared += 1
+                event("flight.join", key=key, stream=True)
+
+        return reader  # type: ignore
+
+    def _forget(self, key: str, tee: Optional["Tee"]) -> None:
+        with self._lock:
+            if self._streams.get(key) is tee:
+                del self._streams[key]
+
+    def __repr__(self) -> str:
+        return f"SingleFlight(calls={self.calls}, shared={self.shared})"
+
+
+class Tee:
+    """Fans one upstream stream out to many readers.
+
+    Whichever reader is ahead pulls the next line from upstream; the others
+    read it from the buffer. Upstream is closed when it ends, or when every
+    reader has left. An error response is read whole, and every reader gets
+    its status and body.
+    """
+
+    __slots__ = (
+        "status_code",
+        "text",
+        "_open",
+        "_on_close",
+        "_pipe",
+        "_lines",
+        "_buffer",
+        "_readers",
+        "_pulling",
+        "_done",
+        "_error",
+        "_cond",
+    )
+    status_code: Optional[int]  # set if upstream answered with an error
+    text: str  # the error body
+    _open: Callable[[], ContextManager[Any]]
+    _on_close: Callable[[], None]
+    _pipe: Optional[ContextManager[Any]]
+    _lines: Optional[Iterator[str]]
+    _buffer: List[str]
+    _readers: int
+    _pulling: bool
+    _done: bool
+    _error: Optional[BaseException]
+    _cond: threading.Condition
+
+    def __init__(
+        self, open: Callable[[], ContextManager[Any]], on_close: Callable[[], None]
+    ):
+        self.status_code = None
+        self.text = ""
+        self._open = open
+        self._on_close = on_close
+        self._pipe = None
+        self._lines = None
+        self._buffer = []
+        self._readers = 0
+        self._pulling = False
+        self._done = False
+        self._error = None
+        self._cond = threading.Condition()
+
+    def reader(self) -> Optional["TeeReader"]:
+        """Gets a new reader, or ``None`` if the stream has ended."""
+        with self._cond:
+            if self._done:
+                return None
+
+            self._readers += 1
+            return TeeReader(self)
+
+    def open(self) -> None:
+        """Opens upstream, unless another reader has; waits for it then."""
+        cond = self._cond
+
+        with cond:
+            while self._pulling and self._lines is None and not self._done:
+                cond.wait()
+
+            if self._lines is not None or self._done:
+                return
+
+            self._pulling = True  # this reader opens it
+
+        try:
+            self._pipe = self._open()
+            r = self._pipe.__enter__()
+
+            if getattr(r, "is_error", False):
+                r.read()
+                self.status_code, self.text = r.status_code, r.text
+                self._finish(None)
+                return
+
+            lines = r.iter_lines()
+        except BaseException as err:
+            self._finish(err)
+            raise
+
+        with cond:
+            self._lines = lines
+            self._pulling = False
+            cond.notify_all()
+
+    def lines(self) -> Iterator[str]:
+        self.open()
+        cond = self._cond
+        buffer = self._buffer
+        i = 0
+
+        while True:
+            with cond:
+                while i >= len(buffer) and not self._done and self._pulling:
+                    cond.wait()
+
+                if i < len(buffer):
+                    line: Optional[str] = buffer[i]
+                elif self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                else:
+                    self._pulling = True  # this reader is ahead; it pulls
+                    line = None
+
+            if line is None:
+                try:
+                    line = next(self._lines, None)  # type: ignore
+                except BaseException as err:
+                    self._finish(err)
+                    raise
+
+                if line is None:
+                    self._finish(None)
+                    return
+
+                with cond:
+                    self._pulling = False
+                    buffer.append(line)
+                    cond.notify_all()
+
+            i += 1
+            yield line
+
+    def leave(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if self._readers:
+                return
+
+        self._finish(RuntimeError("Stream closed by every reader."))
+
+    def _finish(self, error: Optional[BaseException]) -> None:
+        with self._cond:
+            if self._done:
+                return
+
+            self._done = True
+            self._pulling = False
+            self._error = error
+            self._cond.notify_all()
+
+        self._on_close()
+        if self._pipe is not None:
+            self._pipe.__exit__(None, None, None)
+
+
+class TeeReader:
+    """A reader of a :class:`Tee`, in place of an ``httpx`` streaming
+    response."""
+
+    __slots__ = ("_tee", "_left")
+    _tee: Tee
+    _left: bool
+
+    def __init__(self, tee: Tee):
+        self._tee = tee
+        self._left = False
+
+    def __enter__(self) -> "TeeReader":
+        self._tee.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if not self._left:
+            self._left = True
+            self._tee.leave()
+
+    @property
+    def status_code(self) -> int:
+        return self._tee.status_code or 200
+
+    @property
+    def is_error(self) -> bool:
+        return self._tee.status_code is not None
+
+    @property
+    def text(self) -> str:
+        return self._tee.text
+
+    def read(self) -> None: ...  # an error body is read by the tee
+
+    def iter_lines(self) -> Iterator[str]:
+        return self._tee.lines()
+
+
+_single_flight: Optional[SingleFlight] = None
+
+
+def set_single_flight(flight: Optional[SingleFlight]) -> None:
+    """Coalesces identical in-flight requests in every backend. ``None`` turns
+    it off.
+
+    Args:
+        flight (SingleFlight, optional): The coalescer.
+    """
+    global _single_flight
+    _single_flight = flight
+
+
+def get_single_flight() -> Optional[SingleFlight]:
+    return _single_flight
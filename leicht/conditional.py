@@ -1,6 +1,43 @@
-from typing import Optional
+import contextvars
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, List, Optional, Pattern, Sequence, Union
+
+from .cache import CacheStats, LRUCache
 from .utils import clamp
-from .llms._conditional import get_conditional
+from .logger import event
+from .deadline import DeadlineExceeded, remaining
+from .metrics import record
+from .llms._conditional import get_conditional, get_conditionals
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class VerdictCache(LRUCache[bool]):
+    """Caches conditional verdicts. Can be shared by many conditionals.
+
+    Args:
+        maxsize (int): Max entries. The least recently used ones are evicted.
+        ttl (float, optional): Seconds a verdict stays valid.
+        path (str, optional): JSON file to persist verdicts to.
+    """
+
+    __slots__ = ()
+
+    def __init__(
+        self,
+        maxsize: int = 4096,
+        *,
+        ttl: Optional[float] = 3600.0,
+        path: Optional[str] = None,
+    ):
+        super().__init__(maxsize, ttl=ttl, path=path)
 
 
 class Conditional:
@@ -21,6 +58,51 @@ class Conditional:
         self._prompt = prompt
         self._kwargs = kwargs
         self._fillto = __fillto.strip("{}")
+        self._cache: Optional[VerdictCache] = None
+        self._identity = json.dumps(
+            [prompt, self._fillto, kwargs], sort_keys=True, default=str
+        )
+        self.stats = CacheStats()
+
+    def use_cache(self, cache: Optional[VerdictCache] = None) -> "Conditional":
+        """Caches verdicts, so repeated texts skip the LLM.
+
+        ```python
+        Conditional("is-harmful", "{text}").use_cache()
+        ```
+
+        Args:
+            cache (VerdictCache, optional): The cache. Pass the same one to share
+                it between conditionals. Creates one if not given.
+
+        Returns:
+            Conditional: This conditional.
+        """
+        self._cache = cache if cache is not None else VerdictCache()
+        return self
+
+    def cached(self, text: str, /) -> Optional[bool]:
+        """Gets the cached verdict for a text, if any.
+
+        Hits and misses are counted in ``stats``.
+
+        Args:
+            text (str): The text.
+        """
+        if self._cache is None:
+            return None
+
+        return self._cache.get(self._cache_key(text), stats=self.stats)
+
+    def remember(self, text: str, verdict: bool, /) -> None:
+        """Caches a verdict for a text, if caching is on.
+
+        Args:
+            text (str): The text.
+            verdict (bool): The verdict.
+        """
+        if self._cache is not None:
+            self._cache.put(self._cache_key(text), verdict)
 
     def check(self, text: str, /) -> bool:
         """Checks the conditional.
@@ -28,15 +110,485 @@ class Conditional:
         Args:
             text (str): The text.
         """
-        return get_conditional(self._prompt, **{**self._kwargs, self._fillto: text})
+        verdict = self.cached(text)
+        if verdict is None:
+            return self.evaluate(text)
+
+        return verdict
+
+    def evaluate(self, text: str, /) -> bool:
+        """Checks the conditional with the LLM, skipping the cache lookup. The
+        verdict is still cached. The time it took is recorded as a
+        ``conditional`` span.
+
+        Args:
+            text (str): The text.
+        """
+        start = time.perf_counter()
+        try:
+            verdict = get_conditional(
+                self._prompt, **{**self._kwargs, self._fillto: text}
+            )
+        finally:
+            record(
+                "conditional",
+                time.perf_counter() - start,
+                prompt=clamp(self._prompt),
+            )
+
+        self.remember(text, verdict)
+        return verdict
+
+    def _cache_key(self, text: str) -> str:
+        return hashlib.sha256(
+            (self._identity + hashlib.sha256(text.encode("utf-8")).hexdigest()).encode(
+                "utf-8"
+            )
+        ).hexdigest()
 
     def __repr__(self):
         return (
-            f"Conditional({clamp(self._prompt)!r}" + f", {clamp(self._note, 81)!r})"
-            if self._note
-            else ")"
+            f"Conditional({clamp(self._prompt)!r}"
+            + (f", {clamp(self._note, 81)!r}" if self._note else "")
+            + ")"
         )
 
 
 class ConditionalCheckError(Exception):
     """Conditional check error."""
+
+
+class RuleConditional:
+    """Represents a local, rule-based conditional. No LLM involved.
+
+    Unlike :class:`Conditional`, a rule can be inconclusive: :meth:`decide`
+    returns ``True`` (pass), ``False`` (reject) or ``None`` (can't tell).
+    Checked on its own, an inconclusive rule passes.
+
+    Args:
+        note (str, optional): Describe what this rule does. Be brief.
+    """
+
+    __slots__ = ("_note",)
+    _note: Optional[str]
+
+    def __init__(self, *, note: Optional[str] = None):
+        self._note = note
+
+    def decide(self, text: str, /) -> Optional[bool]: ...
+
+    def check(self, text: str, /) -> bool:
+        """Checks the rule. Inconclusive rules pass.
+
+        Args:
+            text (str): The text.
+        """
+        start = time.perf_counter()
+        verdict = self.decide(text)
+        record("conditional", time.perf_counter() - start, rule=type(self).__name__)
+
+        return verdict is not False
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(" + (
+            f"{clamp(self._note, 81)!r})" if self._note else ")"
+        )
+
+
+class RegexConditional(RuleConditional):
+    """Decides when a regex matches the text.
+
+    Args:
+        pattern (str | Pattern): The pattern. Searched, not fully matched.
+        on_match (bool): The verdict on a match. Defaults to rejecting.
+        flags (int): Regex flags.
+        note (str, optional): Describe what this rule does. Be brief.
+    """
+
+    __slots__ = ("pattern", "on_match")
+    pattern: Pattern[str]
+    on_match: bool
+
+    def __init__(
+        self,
+        pattern: Union[str, Pattern[str]],
+        *,
+        on_match: bool = False,
+        flags: int = 0,
+        note: Optional[str] = None,
+    ):
+        super().__init__(note=note)
+        self.pattern = re.compile(pattern, flags)
+        self.on_match = on_match
+
+    def decide(self, text: str, /) -> Optional[bool]:
+        return self.on_match if self.pattern.search(text) else None
+
+
+class KeywordConditional(RegexConditional):
+    """Decides when any of the keywords (or phrases) appears in the text, as
+    whole words.
+
+    Args:
+        keywords (Iterable[str]): The keywords.
+        on_match (bool): The verdict on a match. Defaults to rejecting.
+        case_sensitive (bool): Case sensitive?
+        note (str, optional): Describe what this rule does. Be brief.
+    """
+
+    __slots__ = ()
+
+    def __init__(
+        self,
+        keywords: Iterable[str],
+        *,
+        on_match: bool = False,
+        case_sensitive: bool = False,
+        note: Optional[str] = None,
+    ):
+        # one alternation, longest first, instead of a scan per keyword
+        words = sorted(set(keywords), key=len, reverse=True)
+        super().__init__(
+            r"\b(?:%s)\b" % "|".join(map(re.escape, words)) if words else r"(?!)",
+            on_match=on_match,
+            flags=0 if case_sensitive else re.IGNORECASE,
+            note=note,
+        )
+
+
+class LengthConditional(RuleConditional):
+    """Rejects texts that are too short or too long.
+
+    Args:
+        min_length (int): Min characters.
+        max_length (int, optional): Max characters.
+        note (str, optional): Describe what this rule does. Be brief.
+    """
+
+    __slots__ = ("min_length", "max_length")
+    min_length: int
+    max_length: Optional[int]
+
+    def __init__(
+        self,
+        min_length: int = 0,
+        max_length: Optional[int] = None,
+        *,
+        note: Optional[str] = None,
+    ):
+        super().__init__(note=note)
+        self.min_length = min_length
+        self.max_length = max_length
+
+    def decide(self, text: str, /) -> Optional[bool]:
+        if len(text) < self.min_length or (
+            self.max_length is not None and len(text) > self.max_length
+        ):
+            return False
+
+        return None
+
+
+class CharsetConditional(RuleConditional):
+    """Rejects texts with characters outside of a charset.
+
+    ```python
+    CharsetConditional("\\x00-\\x7f")  # ASCII only
+    ```
+
+    Args:
+        allowed (str): The allowed characters, as the body of a regex
+            character class.
+        note (str, optional): Describe what this rule does. Be brief.
+    """
+
+    __slots__ = ("_disallowed",)
+    _disallowed: Pattern[str]
+
+    def __init__(self, allowed: str, *, note: Optional[str] = None):
+        super().__init__(note=note)
+        self._disallowed = re.compile("[^%s]" % allowed)
+
+    def decide(self, text: str, /) -> Optional[bool]:
+        return False if self._disallowed.search(text) else None
+
+
+class PredicateConditional(RuleConditional):
+    """Decides with a custom Python function.
+
+    Args:
+        fn (Callable[[str], bool | None]): Returns ``True`` (pass), ``False``
+            (reject) or ``None`` (can't tell).
+        note (str, optional): Describe what this rule does. Be brief.
+    """
+
+    __slots__ = ("fn",)
+    fn: Callable[[str], Optional[bool]]
+
+    def __init__(
+        self, fn: Callable[[str], Optional[bool]], *, note: Optional[str] = None
+    ):
+        super().__init__(note=note or getattr(fn, "__name__", None))
+        self.fn = fn
+
+    def decide(self, text: str, /) -> Optional[bool]:
+        return self.fn(text)
+
+
+class ConditionalCascade:
+    """Runs conditionals tier by tier, cheapest first, until one decides.
+
+    ```python
+    ConditionalCascade(
+        [LengthConditional(max_length=4000), KeywordConditional(["hi", "hello"], on_match=True)],
+        Conditional("is-harmful", "{text}"),  # only when the rules can't tell
+    )
+    ```
+
+    A tier decides when any of its conditionals does; a rejection wins over a
+    pass, so a rule's pass still waits for the tier's LLM conditionals, which
+    are always conclusive. A rule's rejection skips them. If no tier decides,
+    the text passes.
+
+    The deciding tier's index is recorded in ``last_tier`` (``None`` if no tier
+    decided) and counted in ``decisions``.
+
+    Args:
+        *tiers: Tiers. Each is a conditional or a list of them.
+        batch (bool): Check a tier's LLM conditionals in a single request.
+    """
+
+    __slots__ = ("tiers", "batch", "last_tier", "decisions", "_lock")
+    tiers: List[List["AnyConditional"]]
+    batch: bool
+    last_tier: Optional[int]
+    decisions: "Counter[Optional[int]]"
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        *tiers: Union["AnyConditional", Sequence["AnyConditional"]],
+        batch: bool = False,
+    ):
+        self.tiers = [
+            list(tier) if isinstance(tier, (list, tuple)) else [tier] for tier in tiers
+        ]
+        self.batch = batch
+        self.last_tier = None
+        self.decisions = Counter()
+        self._lock = threading.Lock()
+
+    def decide(self, text: str, /) -> Optional[bool]:
+        start = time.perf_counter()
+        decided: Optional[int] = None
+        verdict: Optional[bool] = None
+
+        for i, tier in enumerate(self.tiers):
+            verdict = self._decide_tier(tier, text)
+            if verdict is not None:
+                decided = i
+                break
+
+        record("cascade", time.perf_counter() - start, tier=decided)
+        with self._lock:
+            self.last_tier = decided
+            self.decisions[decided] += 1
+        event("cascade.decided", tier=decided, verdict=verdict)
+
+        return verdict
+
+    def check(self, text: str, /) -> bool:
+        """Checks the cascade. Passes if no tier decides.
+
+        Args:
+            text (str): The text.
+        """
+        return self.decide(text) is not False
+
+    def _decide_tier(self, tier: List["AnyConditional"], text: str) -> Optional[bool]:
+        passed = False
+        remote = []
+
+        for con in tier:
+            if isinstance(con, Conditional):
+                remote.append(con)
+                continue
+
+            verdict = (
+                con.decide(text)
+                if isinstance(con, (RuleConditional, ConditionalCascade))
+                else con.check(text)
+            )
+            if verdict is False:
+                return False
+
+            passed = passed or verdict is True
+
+        if remote:
+            try:
+                check_all(remote, text, batch=self.batch)
+            except ConditionalCheckError:
+                return False
+
+            return True
+
+        return True if passed else None
+
+    def __repr__(self) -> str:
+        return f"ConditionalCascade(tiers={self.tiers!r})"
+
+
+AnyConditional = Union[Conditional, RuleConditional, ConditionalCascade]
+
+
+def check_all(
+    conditionals: Sequence[AnyConditional], text: str, /, *, batch: bool = False
+) -> None:
+    """Checks all conditionals concurrently.
+
+    Rule conditionals run first, inline. The first rejection cancels the checks
+    that haven't started yet; checks already in flight finish in the background
+    and are ignored.
+
+    Args:
+        conditionals (Sequence[AnyConditional]): The conditionals.
+        text (str): The text.
+        batch (bool): Check the LLM conditionals in a single request instead.
+            See :func:`check_batch`.
+
+    Raises:
+        ConditionalCheckError: If any of the conditionals rejected.
+    """
+    remote: List[AnyConditional] = []
+
+    for con in conditionals:
+        if not isinstance(con, RuleConditional):
+            remote.append(con)
+        elif not con.check(text):
+            raise ConditionalCheckError(f"Rejected due to conditional check: {con!r}")
+
+    if batch:
+        llm_cons = [con for con in remote if isinstance(con, Conditional)]
+
+        if len(llm_cons) > 1:
+            check_batch(llm_cons, text)
+            remote = [con for con in remote if not isinstance(con, Conditional)]
+
+    _check_concurrently(remote, lambda con: con.check(text))
+
+
+def check_batch(conditionals: Sequence[Conditional], text: str, /) -> None:
+    """Checks all conditionals in a single LLM request.
+
+    The text is sent once, along with every conditional's prompt. Conditionals
+    the reply has no usable answer for are checked individually.
+
+    Args:
+        conditionals (Sequence[Conditional]): The conditionals.
+        text (str): The text.
+
+    Raises:
+        ConditionalCheckError: If any of the conditionals rejected.
+    """
+    uncached: List[Conditional] = []
+
+    for con in conditionals:
+        verdict = con.cached(text)
+        if verdict is None:
+            uncached.append(con)
+        elif not verdict:
+            raise ConditionalCheckError(f"Rejected due to conditional check: {con!r}")
+
+    if len(uncached) > 1:
+        start = time.perf_counter()
+        verdicts = get_conditionals(
+            [(con._prompt, con._fillto, con._kwargs) for con in uncached], text
+        )
+        latency = time.perf_counter() - start
+        leftovers: List[Conditional] = []
+
+        for con, verdict in zip(uncached, verdicts):
+            if verdict is None:
+                leftovers.append(con)
+            else:
+                record("conditional", latency, prompt=clamp(con._prompt), batch=True)
+                con.remember(text, verdict)
+
+        for con, verdict in zip(uncached, verdicts):
+            if verdict is False:
+                raise ConditionalCheckError(
+                    f"Rejected due to conditional check: {con!r}"
+                )
+
+        uncached = leftovers
+
+    _check_concurrently(uncached, lambda con: con.evaluate(text))
+
+
+def _check_concurrently(
+    conditionals: Sequence[AnyConditional], check: Callable[..., bool]
+) -> None:
+    if not conditionals:
+        return
+
+    if len(conditionals) == 1:
+        if not check(conditionals[0]):
+            raise ConditionalCheckError(
+                f"Rejected due to conditional check: {conditionals[0]!r}"
+            )
+        return
+
+    executor = _get_executor()
+    pending: List[Future] = []
+    owners = {}
+    inline: List[AnyConditional] = []
+
+    for con in conditionals:
+        if isinstance(con, ConditionalCascade):
+            # a cascade waits on checks of its own; on the pool, cascades could
+            # take every worker and wait forever for checks that can't start
+            inline.append(con)
+            continue
+
+        # each check runs in a copy of the context, to see the deadline
+        future = executor.submit(contextvars.copy_context().run, check, con)
+        owners[future] = con
+        pending.append(future)
+
+    try:
+        for con in inline:
+            if not check(con):
+                raise ConditionalCheckError(
+                    f"Rejected due to conditional check: {con!r}"
+                )
+
+        while pending:
+            done, not_done = wait(
+                pending, timeout=remaining(), return_when=FIRST_COMPLETED
+            )
+            if not done:
+                raise DeadlineExceeded()
+
+            pending = list(not_done)
+
+            for future in done:
+                if not future.result():
+                    raise ConditionalCheckError(
+                        f"Rejected due to conditional check: {owners[future]!r}"
+                    )
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=32, thread_name_prefix="leicht-conditional"
+                )
+
+    return _executor
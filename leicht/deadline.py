@@ -0,0 +1,224 @@
+"""Deadline budgets for turns.
+
+```python
+from leicht.deadline import Deadline
+
+assistant.run("hi", timeout=2.0)
+
+with Deadline(2.0, degrade=["skip_detection", "partial"]):
+    res = assistant.run("hi", stream=True)
+```
+
+A turn's budget is split across its stages: conditionals, function call
+detection and tools each get a share of it, and generation gets whatever is
+left. HTTP requests made in a stage time out with it, and waits on other
+threads end with it. When a stage runs out of time, :class:`DeadlineExceeded`
+is raised, unless the degrade policy says otherwise:
+
+- ``"skip_conditionals"``: LLM conditionals that haven't answered yet are
+  skipped (rule conditionals always run);
+- ``"skip_detection"``: the answer is generated without tools;
+- ``"partial"``: a stream ends early, with what was generated so far.
+
+The deadline is kept in a context variable, so it follows the turn into the
+threads leicht starts for it.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+)
+
+import httpx
+
+from .logger import event
+
+Degrade = Literal["skip_conditionals", "skip_detection", "partial"]
+Stage = Literal["conditionals", "detection", "tool", "generation"]
+
+# share of the budget each stage may use at most; generation gets the rest
+SHARES: Dict[str, float] = {"conditionals": 0.2, "detection": 0.3, "tool": 0.3}
+
+_deadline: ContextVar[Optional["Deadline"]] = ContextVar(
+    "leicht_deadline", default=None
+)
+_stage: ContextVar[Optional[Tuple[str, float]]] = ContextVar(
+    "leicht_stage", default=None
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """A deadline ran out.
+
+    Args:
+        stage (str, optional): The stage it ran out in. Defaults to the
+            current one.
+    """
+
+    stage: str
+
+    def __init__(self, stage: Optional[str] = None):
+        current = _stage.get()
+        self.stage = stage or (current[0] if current else "run")
+        super().__init__(f"The deadline ran out during {self.stage}.")
+
+
+class Deadline:
+    """Represents a time budget, starting now.
+
+    Use it as a context manager to apply it to every turn run inside, or pass
+    it to :meth:`Assistant.run`.
+
+    Args:
+        timeout (float): The budget, in seconds.
+        degrade (Iterable[Degrade]): What to give up on instead of failing
+            when a stage runs out of time.
+        shares (dict[str, float], optional): Max share of the budget per
+            stage, overriding :data:`SHARES`.
+    """
+
+    __slots__ = ("timeout", "at", "degrade", "shares", "_tokens")
+    timeout: float
+    at: float  # `time.monotonic()` it runs out at
+    degrade: frozenset
+    shares: Dict[str, float]
+    _tokens: List
+
+    def __init__(
+        self,
+        timeout: float,
+        *,
+        degrade: Iterable[Degrade] = (),
+        shares: Optional[Dict[str, float]] = None,
+    ):
+        self.timeout = timeout
+        self.at = time.monotonic() + timeout
+        self.degrade = frozenset(degrade)
+        self.shares = {**SHARES, **(shares or {})}
+        self._tokens = []
+
+    def remaining(self) -> float:
+        """Seconds left, at least 0."""
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    def stage_end(self, stage: str) -> float:
+        """When a stage starting now runs out of time."""
+        share = self.shares.get(stage)
+        if share is None:
+            return self.at
+
+        return min(self.at, time.monotonic() + share * self.timeout)
+
+    def __enter__(self) -> "Deadline":
+        # one thread at a time; see `using` otherwise
+        self._tokens.append(_deadline.set(self))
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _deadline.reset(self._tokens.pop())
+
+    def __repr__(self) -> str:
+        return (
+            f"Deadline({self.timeout}, remaining={self.remaining():.3f}, "
+            f"degrade={sorted(self.degrade)!r})"
+        )
+
+
+def current() -> Optional[Deadline]:
+    """Gets the deadline in effect, if any."""
+    return _deadline.get()
+
+
+@contextmanager
+def using(deadline: Optional[Deadline]) -> Iterator[None]:
+    """Applies a deadline, if given, to the code inside. Unlike entering the
+    deadline itself, safe to use from several threads at once.
+
+    Args:
+        deadline (Deadline, optional): The deadline.
+    """
+    if deadline is None:
+        yield
+        return
+
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def degrades(policy: Degrade) -> bool:
+    """Does the deadline in effect allow this degrade?"""
+    deadline = _deadline.get()
+    return deadline is not None and policy in deadline.degrade
+
+
+def remaining() -> Optional[float]:
+    """Gets the seconds left in the current stage, for timeouts. ``None``
+    without a deadline.
+
+    Raises:
+        DeadlineExceeded: If none are left.
+    """
+    current_stage = _stage.get()
+    if current_stage is not None:
+        end = current_stage[1]
+    else:
+        deadline = _deadline.get()
+        if deadline is None:
+            return None
+        end = deadline.at
+
+    left = end - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded()
+
+    return left
+
+
+@contextmanager
+def stage(name: Stage) -> Iterator[None]:
+    """Runs a stage of the turn under the deadline in effect, if any: gives
+    it its share of the budget, and turns HTTP timeouts into
+    :class:`DeadlineExceeded`.
+
+    Args:
+        name (Stage): The stage.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        yield
+        return
+
+    if deadline.expired():
+        raise DeadlineExceeded(name)
+
+    token = _stage.set((name, deadline.stage_end(name)))
+    try:
+        yield
+    except httpx.TimeoutException as err:
+        raise DeadlineExceeded(name) from err
+    finally:
+        _stage.reset(token)
+
+
+def skipped(name: Stage, deadline: Optional[Deadline] = None) -> None:
+    """Reports a stage skipped (or cut short) by a degrade."""
+    deadline = deadline or _deadline.get()
+    event(
+        "deadline.degrade",
+        stage=name,
+        remaining=deadline.remaining() if deadline is not None else None,
+    )
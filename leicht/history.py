@@ -0,0 +1,158 @@
+"""Persistent message history."""
+
+from collections.abc import MutableSequence
+from typing import Any, Iterable, Iterator, List, Optional, Union, overload
+
+from .types import Message
+
+
+class _Node:
+    __slots__ = ("message", "parent", "length")
+    message: Message
+    parent: Optional["_Node"]
+    length: int
+
+    def __init__(self, message: Message, parent: Optional["_Node"]):
+        self.message = message
+        self.parent = parent
+        self.length = parent.length + 1 if parent is not None else 1
+
+
+class History(MutableSequence):
+    """A message history that forks in O(1).
+
+    Messages are kept in a persistent linked list: appending adds a node that
+    points to the previous head, so forks share every message before the
+    fork point, and appending to one fork never affects another.
+
+    Reads go through a list materialized on first use and extended in place
+    afterwards, so it's only rebuilt after a fork.
+
+    It's a mutable sequence, so code written for a list of messages keeps
+    working: ``pop()``, ``del history[i]``, ``==`` with a list, and so on.
+    Appending and popping the last message are O(1); other edits rebuild the
+    history, O(n). For JSON, use :meth:`to_list`, as ``json.dumps`` only takes
+    real lists.
+
+    Args:
+        messages (Iterable[Message]): Initial messages.
+    """
+
+    __slots__ = ("_head", "_list")
+    _head: Optional[_Node]
+    _list: Optional[List[Message]]  # materialized messages, up to `_head`
+
+    def __init__(self, messages: Iterable[Message] = ()):
+        self._head = None
+        self._list = None
+        self.extend(messages)
+
+    __hash__ = None  # type: ignore
+
+    def append(self, message: Message) -> None:
+        self._head = _Node(message, self._head)
+
+        if self._list is not None:
+            self._list.append(message)
+
+    def extend(self, messages: Iterable[Message]) -> None:
+        for message in messages:
+            self.append(message)
+
+    def __iadd__(self, messages: Iterable[Message]) -> "History":
+        self.extend(messages)
+        return self
+
+    def fork(self) -> "History":
+        """Creates a fork. O(1): the messages so far are shared."""
+        history = History.__new__(History)
+        history._head = self._head
+        history._list = None
+        return history
+
+    def to_list(self) -> List[Message]:
+        """Gets the messages as a new list."""
+        return self._messages().copy()
+
+    copy = to_list
+
+    def _messages(self) -> List[Message]:
+        # the materialized list; not to be mutated but by `append` and `pop`
+        if self._list is None:
+            messages = []
+            node = self._head
+
+            while node is not None:
+                messages.append(node.message)
+                node = node.parent
+
+            messages.reverse()
+            self._list = messages
+
+        return self._list
+
+    @overload
+    def __getitem__(self, i: int) -> Message: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[Message]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Message, List[Message]]:
+        if i == -1 and self._head is not None:
+            return self._head.message
+
+        return self._messages()[i]
+
+    @overload
+    def __setitem__(self, i: int, message: Message) -> None: ...
+
+    @overload
+    def __setitem__(self, i: slice, message: Iterable[Message]) -> None: ...
+
+    def __setitem__(self, i, message) -> None:
+        messages = self.to_list()
+        messages[i] = message
+        self._rebuild(messages)
+
+    def __delitem__(self, i: Union[int, slice]) -> None:
+        if i in (-1, len(self) - 1) and self._head is not None:
+            self._head = self._head.parent
+            if self._list is not None:
+                self._list.pop()
+            return
+
+        messages = self.to_list()
+        del messages[i]
+        self._rebuild(messages)
+
+    def insert(self, i: int, message: Message) -> None:
+        messages = self.to_list()
+        messages.insert(i, message)
+        self._rebuild(messages)
+
+    def clear(self) -> None:
+        self._head = None
+        self._list = None
+
+    def _rebuild(self, messages: List[Message]) -> None:
+        # forks keep the nodes they share; this history gets new ones
+        self._head = None
+        self._list = None
+        self.extend(messages)
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self._messages())
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (History, list, tuple)):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other)
+            )
+
+        return NotImplemented
+
+    def __len__(self) -> int:
+        return self._head.length if self._head is not None else 0
+
+    def __repr__(self) -> str:
+        return f"History({len(self)} messages)"
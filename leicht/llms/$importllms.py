@@ -1 +0,0 @@
-from leicht.llms import OpenAI, Groq  # noqa: F401
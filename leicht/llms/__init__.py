@@ -1,16 +1,52 @@
 """LLMs."""
 
-from .base import BaseLLM
-from .groq import Groq
-from .openai import OpenAI
-from ._pipeline import get_llm, pipeline
+from typing import TYPE_CHECKING, Any
 
-try:
-    import dotenv
+if TYPE_CHECKING:
+    from .base import BaseLLM
+    from .groq import Groq
+    from .openai import OpenAI, OpenAILike
+    from .router import Router, Tier
+    from ._pipeline import get_llm, pipeline, register_llm
 
-    dotenv.load_dotenv()
-except ImportError:
-    dotenv = None  # unused. I just don't want to use 'pass'
+# imported on first access, so `import leicht.llms` stays cheap
+_lazy = {
+    "BaseLLM": ".base",
+    "Groq": ".groq",
+    "OpenAI": ".openai",
+    "OpenAILike": ".openai",
+    "Router": ".router",
+    "Tier": ".router",
+    "get_llm": "._pipeline",
+    "pipeline": "._pipeline",
+    "register_llm": "._pipeline",
+}
 
 
-__all__ = ("BaseLLM", "Groq", "OpenAI", "get_llm", "pipeline")
+def __getattr__(name: str) -> Any:
+    if name not in _lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from importlib import import_module
+
+    if name in ("Groq", "OpenAI", "OpenAILike"):
+        from .._env import load_env
+
+        load_env()  # these read API keys from the env
+
+    value = getattr(import_module(_lazy[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+__all__ = (
+    "BaseLLM",
+    "Groq",
+    "OpenAI",
+    "OpenAILike",
+    "Router",
+    "Tier",
+    "get_llm",
+    "pipeline",
+    "register_llm",
+)
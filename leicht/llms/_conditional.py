@@ -1,35 +1,136 @@
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
 from ._pipeline import pipeline
 from ..utils import prompt_alike
 from ..prompts import get_prompt
 
+VERDICTS = {"true": True, "false": False, "null": None}
 
-def get_conditional(prompt: str, **kwargs: str) -> bool:
-    """Checks a conditional statement from a piece of text.
+BATCH_TEXT = "<<TEXT>>"
+BATCH_PROMPT = """You are given a TEXT and {count} numbered checks about it. Answer every \
+check on its own, as if it were the only one.
+
+TEXT:
+\"\"\"
+{text}
+\"\"\"
+
+{checks}
+
+Reply with a single JSON object mapping each check number to true, false or \
+null, and nothing else. For example: {{"1": true, "2": false, "3": null}}"""
+
+
+def render_conditional(prompt: str, **kwargs: str) -> str:
+    """Renders a conditional prompt.
 
     Args:
         prompt (str): Prompt name or prompt content.
         **kwargs: Keyword-only arguments for the prompt.
     """
     if prompt_alike(prompt):
-        prompt = get_prompt(prompt)
-    else:
-        for k, v in kwargs.items():
-            prompt = prompt.replace(k, v)
+        return get_prompt(prompt, **kwargs)
+
+    for k, v in kwargs.items():
+        prompt = prompt.replace("{%s}" % k, v)
 
-    res = pipeline("hf", messages=[{"role": "user", "content": prompt}])
+    return prompt
+
+
+def get_conditional(prompt: str, **kwargs: str) -> bool:
+    """Checks a conditional statement from a piece of text.
+
+    Args:
+        prompt (str): Prompt name or prompt content.
+        **kwargs: Keyword-only arguments for the prompt.
+    """
+    res = pipeline(
+        "hf",
+        messages=[{"role": "user", "content": render_conditional(prompt, **kwargs)}],
+    )
 
     content: str = (
-        res.copy()["choices"][0]["message"]["content"]
+        res["choices"][0]["message"]["content"]
         .splitlines()[0]
         .split(".")[0]
         .strip()
         .lower()
     )
 
-    assert content in {
-        "true",
-        "false",
-        "null",
-    }, "LLM did not reply with 'true', 'false' or 'null'"
+    assert content in VERDICTS, "LLM did not reply with 'true', 'false' or 'null'"
+
+    return bool(VERDICTS[content])
+
+
+def get_conditionals(
+    checks: List[Tuple[str, str, Dict[str, str]]], text: str
+) -> List[Optional[bool]]:
+    """Checks several conditional statements on the same text in one request.
+
+    Args:
+        checks (list[tuple[str, str, dict[str, str]]]): ``(prompt, fillto, kwargs)``
+            for each conditional. ``fillto`` is the argument the text goes to.
+        text (str): The text.
+
+    Returns:
+        list[bool | None]: The verdict of each check, in order. ``None`` if the
+        reply had no usable answer for that check; check it individually.
+    """
+    rendered = "\n\n".join(
+        f"Check {i}:\n"
+        + render_conditional(
+            prompt, **{**kwargs, fillto: BATCH_TEXT}
+        ).replace(BATCH_TEXT, "the TEXT")
+        for i, (prompt, fillto, kwargs) in enumerate(checks, 1)
+    )
+    res = pipeline(
+        "hf",
+        messages=[
+            {
+                "role": "user",
+                "content": BATCH_PROMPT.format(
+                    count=len(checks),
+                    text=text,
+                    checks=rendered,
+                ),
+            }
+        ],
+    )
+    content: str = res["choices"][0]["message"].get("content", "")
+    verdicts = parse_verdicts(content)
+
+    # 'null' rejects, just like `get_conditional`
+    return [
+        bool(verdicts[i]) if i in verdicts else None
+        for i in range(1, len(checks) + 1)
+    ]
+
+
+def parse_verdicts(content: str) -> Dict[int, Optional[bool]]:
+    """Parses ``{"1": true, ...}``-like verdicts, tolerating surrounding prose,
+    code fences and ``1: true`` lists."""
+    answers: Dict[int, Optional[bool]] = {}
+
+    for blob in re.findall(r"\{[^{}]*\}", content):
+        try:
+            data = json.loads(blob)
+        except ValueError:
+            continue
+
+        for k, v in data.items():
+            if str(k).strip().isdigit() and (v is None or isinstance(v, bool)):
+                answers[int(k)] = v
+
+    if answers:
+        return answers
+
+    for k, v in re.findall(
+        r"^\W*(?:check\s*)?(\d+)\W*\s*(true|false|null)\b",
+        content,
+        re.IGNORECASE | re.MULTILINE,
+    ):
+        answers[int(k)] = VERDICTS[v.lower()]
 
-    return {"true": True, "false": False, "null": False}[content]
+    return answers
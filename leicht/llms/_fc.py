@@ -7,7 +7,8 @@ from typing_extensions import TypedDict
 from ._pipeline import pipeline
 from ..types import Message, BasicLLMResponse
 from ..prompts import get_prompt
-from ..logger import logger
+from ..logger import event
+from ..metrics import span
 
 FunctionCalls = List[Tuple[str, str]]
 
@@ -19,30 +20,31 @@ class FunctionCallResponse(TypedDict):
 def get_function_call(
     messages: List[Message], tools: List[str]
 ) -> Optional[FunctionCalls]:
-    logger.info("_fc: getting function call...")
+    event("fc.detect", tools=len(tools))
     messages_text = "Given messages:\n" + "\n".join(
         (f"{m['role']}: {m['content']}" for m in messages)
     )
-    res: BasicLLMResponse = pipeline(
-        "hf",
-        messages=[
-            {
-                "role": "user",
-                "content": (
-                    get_prompt(
-                        "functions-v2",
-                        tools="\n\n".join(tools),
-                        most_commonly_used=tools[0].splitlines()[0],
-                        messages=messages_text,
-                    )
-                ),
-            }
-        ],
-    )
+    with span("detection", tools=len(tools)):
+        res: BasicLLMResponse = pipeline(
+            "hf",
+            messages=[
+                {
+                    "role": "user",
+                    "content": (
+                        get_prompt(
+                            "functions-v2",
+                            tools="\n\n".join(tools),
+                            most_commonly_used=tools[0].splitlines()[0],
+                            messages=messages_text,
+                        )
+                    ),
+                }
+            ],
+        )
 
     content: str = res["choices"][0]["message"].get("content", "").strip()
 
-    logger.info(f"_fc: function call (res): {content}")
+    event("fc.response", content=content)
 
     return (
         parse_function_call(content)
@@ -58,14 +60,12 @@ def check_if_applicable_for_fn_call(content: str) -> bool:
         .lower()  # Convert to lower case
         .startswith("null")  # Startswith "null"? (AKA. no function call?)
     )
-    logger.info(f"_fc: function call applicable? {appl}")
+    event("fc.applicable", applicable=appl)
 
     return appl
 
 
 def parse_function_call(text: str) -> FunctionCalls:
-    logger.info("_fc: parsing function call...")
-
     calls = []
 
     for line in text.splitlines():
@@ -78,5 +78,5 @@ def parse_function_call(text: str) -> FunctionCalls:
 
         calls.append((r[0].replace("\\_", "_"), r[1]))
 
-    logger.info(f"_fc: function calls - {calls}")
+    event("fc.parsed", calls=calls)
     return calls
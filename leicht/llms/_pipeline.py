@@ -1,13 +1,86 @@
 """Pipeline."""
 
-import os
-from importlib.machinery import SourceFileLoader
+import threading
+from importlib import import_module
+from importlib.metadata import entry_points
+from typing import Dict, Type, Union
 
 from .base import BaseLLM
-from .hf import mistral_7b_instruct_v0_2_api
+from .._env import load_env
 from ..types import LLMType, BasicLLMResponse
 
-llm_mapping = {"openai": "OpenAI", "groq": "Groq"}
+ENTRY_POINT_GROUP = "leicht.llms"
+
+# name -> class, or "module:attr" until first resolved
+_registry: Dict[str, Union[str, Type[BaseLLM]]] = {
+    "openai": "leicht.llms.openai:OpenAI",
+    "groq": "leicht.llms.groq:Groq",
+    "g4f": "leicht.llms.g4f:GPT4Free",
+}
+_plugins_loaded = False
+_lock = threading.Lock()
+
+
+def register_llm(name: str, llm: Union[str, Type[BaseLLM]]) -> None:
+    """Registers an LLM, so it can be referenced by name.
+
+    Third-party packages can register theirs with an entry point instead:
+
+    ```toml
+    [project.entry-points."leicht.llms"]
+    my_llm = "leicht_my_llm:MyLLM"
+    ```
+
+    Args:
+        name (str): The name.
+        llm (str | type[BaseLLM]): The class, or ``"module:attr"`` to import it
+            lazily.
+    """
+    with _lock:
+        _registry[name] = llm
+
+
+def load_plugins() -> None:
+    """Loads LLMs registered through ``leicht.llms`` entry points. Built-in
+    names are never overridden."""
+    global _plugins_loaded
+
+    with _lock:
+        if _plugins_loaded:
+            return
+
+        for ep in entry_points(group=ENTRY_POINT_GROUP):
+            _registry.setdefault(ep.name, ep.value)
+
+        _plugins_loaded = True
+
+
+def resolve_llm(name: str) -> Type[BaseLLM]:
+    """Resolves an LLM class from its name. Classes are imported once, then
+    cached.
+
+    Args:
+        name (str): The name.
+    """
+    llm = _registry.get(name)
+
+    if llm is None:
+        load_plugins()
+        llm = _registry.get(name)
+
+        if llm is None:
+            raise KeyError(
+                f"Unknown LLM {name!r}. Available: {', '.join(sorted(_registry))}"
+            )
+
+    if isinstance(llm, str):
+        module, _, attr = llm.partition(":")
+        llm = getattr(import_module(module), attr)
+
+        with _lock:
+            _registry[name] = llm
+
+    return llm  # type: ignore
 
 
 def get_llm(llm: LLMType, **kwargs) -> BaseLLM:
@@ -25,11 +98,10 @@ def get_llm(llm: LLMType, **kwargs) -> BaseLLM:
         **kwargs: Extra keyword-only arguments to pass to the LLM.
     """
     if isinstance(llm, str):
-        mod = SourceFileLoader(
-            "$importllms", os.path.join(os.path.dirname(__file__), "$importllms.py")
-        ).load_module("$importllms")
-        return getattr(mod, llm_mapping[llm])(**kwargs)
+        load_env()
+        return resolve_llm(llm)(**kwargs)
     elif isinstance(llm, type):
+        load_env()
         return llm(**kwargs)
     else:
         return llm.set(**kwargs)
@@ -37,6 +109,8 @@ def get_llm(llm: LLMType, **kwargs) -> BaseLLM:
 
 def pipeline(__name: LLMType, **kwargs) -> BasicLLMResponse:
     if __name == "hf":
+        from .hf import mistral_7b_instruct_v0_2_api
+
         return mistral_7b_instruct_v0_2_api(**kwargs)
 
     model = get_llm(__name)
@@ -0,0 +1,291 @@
+"""Load balancing over API keys and base URLs."""
+
+import threading
+import time
+from typing import Any, Callable, ContextManager, Dict, List, Literal, Optional
+
+import httpx
+
+from ..logger import event
+
+Strategy = Literal["least_outstanding", "rate_limit"]
+
+# statuses that take an endpoint out of rotation, and get retried on another
+RETRY_STATUSES = (401, 403, 429)
+
+
+class Endpoint:
+    """Represents a base URL and API key pair, and its usage.
+
+    Args:
+        base_url (str): API base URL.
+        headers (dict[str, str]): Headers, including the API key.
+        key (str, optional): The API key, for reporting (masked).
+    """
+
+    __slots__ = (
+        "base_url",
+        "headers",
+        "key",
+        "outstanding",
+        "requests",
+        "errors",
+        "busy",
+        "remaining",
+        "cooldown_until",
+        "_since",
+    )
+    base_url: str
+    headers: Dict[str, str]
+    key: Optional[str]
+    outstanding: int
+    requests: int
+    errors: int
+    busy: float  # seconds with a request outstanding
+    remaining: Optional[int]  # requests left in the rate limit window, if known
+    cooldown_until: float
+    _since: float  # start of the current busy period
+
+    def __init__(self, base_url: str, headers: Dict[str, str], key: Optional[str]):
+        self.base_url = base_url
+        self.headers = headers
+        self.key = key
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.remaining = None
+        self.cooldown_until = 0.0
+        self._since = 0.0
+
+    @property
+    def name(self) -> str:
+        key = self.key
+        if not key:
+            return self.base_url
+
+        masked = f"{key[:4]}…{key[-4:]}" if len(key) > 12 else "***"
+        return f"{self.base_url} ({masked})"
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.name!r}, outstanding={self.outstanding})"
+
+
+class EndpointPool:
+    """Spreads requests over endpoints.
+
+    Endpoints are picked by fewest outstanding requests
+    (``"least_outstanding"``), or by most requests left in the rate limit
+    window (``"rate_limit"``, from the ``x-ratelimit-remaining-requests``
+    header). After a 429, 401 or 403, an endpoint sits out for ``Retry-After``
+    seconds or ``cooldown``, and the request is retried on another one.
+
+    Args:
+        endpoints (list[Endpoint]): The endpoints.
+        strategy (Strategy): How to pick an endpoint.
+        cooldown (float): Seconds an endpoint sits out after an error.
+    """
+
+    __slots__ = ("endpoints", "strategy", "cooldown", "_lock", "_created")
+    endpoints: List[Endpoint]
+    strategy: Strategy
+    cooldown: float
+    _lock: threading.Lock
+    _created: float
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        *,
+        strategy: Strategy = "least_outstanding",
+        cooldown: float = 30.0,
+    ):
+        self.endpoints = endpoints
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._created = time.perf_counter()
+
+    def acquire(self) -> Endpoint:
+        """Picks an endpoint and counts a request on it. Pair with
+        :meth:`release`."""
+        now = time.time()
+
+        with self._lock:
+            available = [e for e in self.endpoints if e.cooldown_until <= now]
+
+            if not available:  # all cooling down; take the first one back
+                endpoint = min(self.endpoints, key=lambda e: e.cooldown_until)
+            elif self.strategy == "rate_limit":
+                endpoint = max(
+                    available,
+                    key=lambda e: (
+                        (e.remaining if e.remaining is not None else 1 << 30)
+                        - e.outstanding,
+                        -e.requests,
+                    ),
+                )
+            else:
+                endpoint = min(available, key=lambda e: (e.outstanding, e.requests))
+
+            if not endpoint.outstanding:
+                endpoint._since = time.perf_counter()
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+
+        return endpoint
+
+    def release(self, endpoint: Endpoint, response: Optional[httpx.Response]) -> None:
+        """Ends a request, and reads its status and rate limit headers.
+
+        Args:
+            endpoint (Endpoint): The endpoint.
+            response (httpx.Response, optional): The response, if any.
+        """
+        with self._lock:
+            endpoint.outstanding -= 1
+            if not endpoint.outstanding:
+                endpoint.busy += time.perf_counter() - endpoint._since
+
+            if response is None:
+                endpoint.errors += 1
+                return
+
+            remaining = response.headers.get("x-ratelimit-remaining-requests")
+            if remaining is not None and remaining.isdigit():
+                endpoint.remaining = int(remaining)
+
+            if response.status_code in RETRY_STATUSES:
+                endpoint.errors += 1
+                retry_after = response.headers.get("retry-after", "")
+                endpoint.cooldown_until = time.time() + (
+                    float(retry_after)
+                    if retry_after.replace(".", "", 1).isdigit()
+                    else self.cooldown
+                )
+
+        if response.status_code in RETRY_STATUSES:
+            event(
+                "pool.cooldown",
+                endpoint=endpoint.name,
+                status=response.status_code,
+                until=endpoint.cooldown_until,
+            )
+
+    def send(self, fn: Callable[[Endpoint], httpx.Response]) -> httpx.Response:
+        """Sends a request with ``fn(endpoint)``, retrying on another endpoint
+        after a 429, 401 or 403.
+
+        Args:
+            fn (Callable[[Endpoint], httpx.Response]): Sends the request.
+        """
+        for attempt in range(len(self.endpoints)):
+            endpoint = self.acquire()
+            try:
+                r = fn(endpoint)
+            except BaseException:
+                self.release(endpoint, None)
+                raise
+
+            self.release(endpoint, r)
+            if r.status_code not in RETRY_STATUSES:
+                break
+
+        return r  # type: ignore
+
+    def stream(
+        self, open: Callable[[Endpoint], ContextManager[httpx.Response]]
+    ) -> "Lease":
+        """Like :meth:`send`, for streaming requests: the endpoint is picked
+        when the returned context is entered, and released when it exits.
+
+        Args:
+            open (Callable): Makes the streaming request, e.g.
+                ``lambda e: client.stream("POST", e.base_url + ...)``.
+        """
+        return Lease(self, open)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Gets per-endpoint usage. ``utilization`` is the fraction of time the
+        endpoint had a request outstanding."""
+        elapsed = time.perf_counter() - self._created
+        now = time.time()
+
+        with self._lock:
+            return [
+                {
+                    "endpoint": e.name,
+                    "requests": e.requests,
+                    "errors": e.errors,
+                    "outstanding": e.outstanding,
+                    "remaining": e.remaining,
+                    "cooling_down": e.cooldown_until > now,
+                    "utilization": (
+                        e.busy
+                        + (time.perf_counter() - e._since if e.outstanding else 0.0)
+                    )
+                    / elapsed,
+                }
+                for e in self.endpoints
+            ]
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def __repr__(self) -> str:
+        return f"EndpointPool({self.endpoints!r}, strategy={self.strategy!r})"
+
+
+class Lease:
+    """A streaming request on a pooled endpoint, in place of the ``httpx``
+    streaming context."""
+
+    __slots__ = ("_pool", "_open", "_endpoint", "_context", "_response")
+    _pool: EndpointPool
+    _open: Callable[[Endpoint], ContextManager[httpx.Response]]
+    _endpoint: Optional[Endpoint]
+    _context: Optional[ContextManager[httpx.Response]]
+    _response: Optional[httpx.Response]
+
+    def __init__(
+        self,
+        pool: EndpointPool,
+        open: Callable[[Endpoint], ContextManager[httpx.Response]],
+    ):
+        self._pool = pool
+        self._open = open
+        self._endpoint = None
+        self._context = None
+        self._response = None
+
+    def __enter__(self) -> httpx.Response:
+        pool = self._pool
+
+        for attempt in range(len(pool)):
+            endpoint = pool.acquire()
+            context = self._open(endpoint)
+
+            try:
+                r = context.__enter__()
+            except BaseException:
+                pool.release(endpoint, None)
+                raise
+
+            if r.status_code not in RETRY_STATUSES or attempt == len(pool) - 1:
+                break
+
+            context.__exit__(None, None, None)
+            pool.release(endpoint, r)
+
+        self._endpoint, self._context, self._response = endpoint, context, r
+        return r
+
+    def __exit__(self, *exc) -> Any:
+        if self._context is None:
+            return None
+
+        try:
+            return self._context.__exit__(*exc)
+        finally:
+            self._pool.release(self._endpoint, self._response)  # type: ignore
+            self._context = None
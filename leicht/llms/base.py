@@ -21,14 +21,33 @@ class BaseLLM:
 
     def set(self, **kwargs) -> Self: ...
 
+    def warmup_plan(self) -> Dict[str, List[str]]:
+        """Prompts (``"prompts"``) and URLs (``"urls"``) this LLM needs, so
+        they can be loaded ahead of the first request."""
+        return {"prompts": [], "urls": []}
+
 
 class BaseResponse:
-    __slots__ = ("_stream", "_data", "_pipe")
+    """Represents a response.
+
+    Non-streaming responses may hold the raw body (``_raw``) and decode it only
+    when first read. Reads (``get``, ``[]``) never copy.
+    """
+
+    __slots__ = ("_stream", "_data", "_pipe", "_raw")
     _stream: bool
     _data: dict
     _pipe: Any
-
-    def __init__(self, data: dict, *, stream: bool = False, pipe: Any): ...
+    _raw: Optional[bytes]
+
+    def __init__(
+        self,
+        data: dict,
+        *,
+        stream: bool = False,
+        pipe: Any,
+        raw: Optional[bytes] = None,
+    ): ...
 
     def copy(self) -> dict:
         return self.data.copy()
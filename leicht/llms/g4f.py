@@ -5,9 +5,14 @@ from contextlib import contextmanager
 from typing import Any, Dict, List, Literal, Optional, Tuple, Union
 from typing_extensions import Mapping, NotRequired
 
-import httpx
-
 from .base import BaseLLM
+from .._codec import dumps, loads
+from .._http import get_client
+from ..cache import get_completion_cache
+from ..coalesce import get_single_flight
+from ..deadline import DeadlineExceeded, degrades, remaining, skipped
+from ..deadline import stage as deadline_stage
+from ..metrics import span
 from .groq import Groq
 from ..types import BasicLLMPayload
 from ..prompts import get_prompt
@@ -51,7 +56,10 @@ class GPT4Free(BaseLLM):
     ):
         self.base_url = base_url
         self._payload = {"model": model, "provider": provider, **extra_payload}
-        self._headers = {"Authorization": "Bearer xxx"}
+        self._headers = {
+            "Authorization": "Bearer xxx",
+            "Content-Type": "application/json",
+        }
 
         tools = tools or []
         self.set(tools=tools)
@@ -59,21 +67,53 @@ class GPT4Free(BaseLLM):
         self.is_tool_self = tool_self
 
     def run(self, payload: Payload, *, stream: Optional[bool] = None):
-        client = httpx.Client()
-        r = client.post(
-            self.base_url + "/chat/completions",
-            json={**payload, **self._payload},
-            params={"id": time.time_ns()},
-            headers=self._headers,
-        )
-        r.raise_for_status()
-        return r.json()
+        url = self.base_url + "/chat/completions"
+        json_payload = {**payload, **self._payload}
+        cache = get_completion_cache()
+        key = None
+
+        if cache is not None and cache.accepts(json_payload):
+            key = cache.key(url, json_payload)
+            cached = cache.get(key)
+            if cached is not None:
+                return loads(cached)
+
+        client = get_client()
+        stage = "detection" if self.is_tool_self else "generation"
+        timeout = remaining()
+
+        with span(stage, model=self._payload["model"]) as sp:
+
+            def send():
+                return client.post(
+                    url,
+                    content=dumps(json_payload),
+                    params={"id": time.time_ns()},
+                    headers=self._headers,
+                    timeout=client.timeout if timeout is None else timeout,
+                )
+
+            flight = get_single_flight()
+            if flight is not None and flight.accepts(json_payload):
+                r = flight.call(flight.key(url, json_payload), send)
+            else:
+                r = send()
+
+            r.raise_for_status()
+            data = loads(r.content)
+            sp.set(usage=data.get("usage"))
+
+        if key:
+            cache.put(key, r.content)  # type: ignore
+
+        return data
 
     def get_function_call(
-        self, text: str, payload: Payload
+        self, text: str, payload: Payload, tools: Optional[List[str]] = None
     ) -> Optional[List[Tuple[str, str]]]:
         # Check groq.py
         assert self._tool_self, "'tools' are not avaiable for this GPT74Free session."
+        tools = self._tools if tools is None else tools
 
         result = self._tool_self.run(
             {
@@ -91,8 +131,8 @@ class GPT4Free(BaseLLM):
                             )
                             + get_prompt(
                                 "functions-groq",
-                                tools="\n\n".join(self._tools),
-                                most_commonly_used=self._tools[0],
+                                tools="\n\n".join(tools),
+                                most_commonly_used=tools[0],
                                 text=text,
                             )
                         ),
@@ -105,16 +145,27 @@ class GPT4Free(BaseLLM):
 
         return Groq.parse_fn_call(content) if run_tools else None
 
-    def __call__(self, payload: Payload):
+    def __call__(self, payload: Payload, *, tools: Optional[List[str]] = None):
         messages = payload["messages"]
 
-        if self._tool_self:
+        if self._tool_self and (tools is None or tools):
             # tools are available
-            fn = self.get_function_call(messages[-1]["content"], payload)
+            try:
+                with deadline_stage("detection"):
+                    fn = self.get_function_call(
+                        messages[-1]["content"], payload, tools
+                    )
+            except DeadlineExceeded:
+                if not degrades("skip_detection"):
+                    raise
+                skipped("detection")
+                fn = None
+
             if fn:
                 return {"functions": fn}
 
-        return self.run(payload)
+        with deadline_stage("generation"):
+            return self.run(payload)
 
     def set(self, **kwargs):
         for k, v in kwargs.items():
@@ -137,6 +188,12 @@ class GPT4Free(BaseLLM):
 
         return self
 
+    def warmup_plan(self):
+        return {
+            "prompts": ["functions-groq"] if self._tools else [],
+            "urls": [self.base_url],
+        }
+
     @contextmanager
     def notools(self, _m: bool = True):
         if _m:
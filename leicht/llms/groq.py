@@ -1,33 +1,14 @@
 from __future__ import annotations
 
-import json
 import os
-from types import ModuleType
-from typing import (
-    Any,
-    TYPE_CHECKING,
-    Iterable,
-    List,
-    Literal,
-    NotRequired,
-    Optional,
-    Union,
-    overload,
-)
-from typing_extensions import Mapping, TypedDict
-
-import httpx
-
-from .base import BaseLLM, BaseResponse
-from ._fc import FunctionCallResponse, get_function_call
-from ..types import BasicLLMPayload, BasicLLMResponse
-from ..logger import logger
+from typing import Iterable, List, Literal, NotRequired, Optional, Union
+from typing_extensions import TypedDict
 
-if TYPE_CHECKING:
-    json: ModuleType
+from .openai import OpenAILike, OpenAIResponse, Replay  # noqa: F401
+from ..types import BasicLLMPayload, BasicLLMResponse
+from .._env import load_env
 
 Model = Literal["mixtral-8x7b-32768", "gemma-7b-it", "llama2-70b-4096"]
-Headers = Mapping[str, str]
 
 
 class GroqPayload(BasicLLMPayload):
@@ -58,190 +39,55 @@ StreamingDict = Iterable[Response]
 RunResult = Union[StreamingDict, Response]
 
 
-class GroqResponse(BaseResponse):
-    def __init__(self, data: dict, *, stream: bool, pipe: Any, json_mode: bool):
-        self._stream = stream
-        self._data = data
-        self._pipe = pipe
-        self._json_mode = json_mode
-
-        if json_mode:
-            sc = self._data["choices"][0]["message"]  # shortcut
-            sc["json"] = json.loads(sc["content"])
-
-    def __iter__(self):
-        def iterator():
-            if not self._stream or self._json_mode:
-                if self._data:
-                    raise TypeError("Streaming is completed.")
-
-                raise TypeError("This is not a stream or streaming is completed.")
-
-            pipe = self._pipe
-
-            # We're adding this in case of out of bound errors
-            last_d = {}  # type: ignore
-            text = ""
-
-            with pipe as r:
-                for line in r.iter_lines():
-                    # len("data: ") = 6
-                    # we'll remove the first 6 characters
-                    raw = line[6:]
-
-                    if raw == "[DONE]":
-                        break
-                    elif not raw:
-                        continue
-
-                    d = json.loads(raw)
-                    yield d
-
-                    if d.get("x_groq"):
-                        last_d = d
-
-                    text += d["choices"][0].get("content", "")
-
-            last_d: GroqResponseEnd
-            self._stream = False
-            self._data = {
-                **last_d,
-                "choices": [
-                    {"index": 0, "message": {"role": "assistant", "content": text}}
-                ],
-            }
-
-        return iterator()
-
-    def dict(self):
-        list(self.__iter__())
-        return self._data
-
-    def __next__(self):
-        return self.__iter__()
-
-    def __repr__(self) -> str:
-        return "GroqResponse(" + json.dumps(self._data) + ")"
+class GroqResponse(OpenAIResponse):
+    __slots__ = ()
 
 
-class Groq(BaseLLM):
+class Groq(OpenAILike):
     """Represents the Groq LLM.
 
     Args:
         model (Model): The model name.
-        api_key (str, optional): API key. If not provided, uses env ``GROQ_API_KEY``
+        api_key (str | list[str], optional): API key, or several to balance
+            over. If not provided, uses env ``GROQ_API_KEY`` (comma-separated)
             instead.
-        json_mode (bool): JSON mode? **BETA**
+        base_url (str, optional): API base URL. If not provided, uses env
+            ``GROQ_BASE_URL``, or Groq's.
+        json_mode (bool): JSON mode? Streams too: see
+            :meth:`OpenAIResponse.iter_json`.
         tools (list[str], optional): List of tools in ``str``.
-        **extra_payload: Extra payload.
+        **extra_payload: Extra payload. See :class:`OpenAILike` for the other
+            options, e.g. ``balance``.
     """
 
-    __slots__ = (
-        "_headers",
-        "_api_key",
-        "_payload",
-        "_json_mode",
-        "_tools",
-    )
-    _headers: Headers
-    _api_key: str
-    _payload: dict  # extra payload to append
-    _json_mode: bool
-    _tools: List[str]
-    _api_base = "https://api.groq.com/openai/v1"
+    __slots__ = ()
+    API_BASE = "https://api.groq.com/openai/v1"
+    API_KEY_ENV = "GROQ_API_KEY"
+    BASE_URL_ENV = "GROQ_BASE_URL"
+    RESPONSE = GroqResponse
 
     def __init__(
         self,
         model: Model = "mixtral-8x7b-32768",
         *,
-        api_key: Optional[str] = None,
+        api_key: Union[str, List[str], None] = None,
+        base_url: Optional[str] = None,
         json_mode: bool = False,
         tools: Optional[List[str]] = None,
         **extra_payload,
     ):
         # if `api_key` is not provided, use the env
-        self._api_key = api_key or os.environ["GROQ_API_KEY"]
-        self._headers = {
-            "Authorization": "Bearer %s" % self._api_key,
-            "Content-Type": "application/json",
-        }
-        self._payload = {"model": model, **extra_payload}
-
-        self._json_mode = json_mode
-        if json_mode:
-            self._payload["response_format"] = {"type": "json_object"}
-
-        self._tools = tools or []
-
-    def run(  # type: ignore
-        self, payload: GroqPayload, *, stream: Optional[bool] = None
-    ) -> GroqResponse:
-        should_stream = payload["stream"] if stream is None else stream
-        client = httpx.Client()
-        json_payload = self._payload | payload
-
-        if (self._json_mode or "response_format" in payload) and stream:
-            raise TypeError(
-                "This instance of Groq is in JSON mode, which doesn't support streaming."
-            )
-
-        if should_stream:
-            pipe = client.stream(
-                "POST",
-                self._api_base + "/chat/completions",
-                json=json_payload,
-                headers=self._headers,
-            )
-            return GroqResponse({}, stream=True, pipe=pipe, json_mode=self._json_mode)
-
-        else:
-            r = client.post(
-                self._api_base + "/chat/completions",
-                json=json_payload,
-                headers=self._headers,
-                timeout=None,
-            )
-            try:
-                r.raise_for_status()
-            except httpx.HTTPStatusError as err:
-                raise RuntimeError(f"\n\nResponse:\n{r.json()}") from err
-            return GroqResponse(
-                r.json(), stream=False, pipe=None, json_mode=self._json_mode
-            )
-
-    @overload
-    def __call__(
-        self, payload: GroqPayload, *, notools: Literal[True] = True
-    ) -> GroqResponse: ...
-
-    @overload
-    def __call__(
-        self, payload: GroqPayload, *, notools: Literal[False] = False
-    ) -> FunctionCallResponse: ...
-
-    def __call__(self, payload: GroqPayload, *, notools: bool = False):  # type: ignore
-        """Runs a call.
-
-        Returns `FunctionCallResponse` if applicable for a function call.
-
-        Args:
-            payload (GroqPayload): The payload.
-            stream (bool): Stream?
-        """
-        if not notools:
-            functions = get_function_call(payload["messages"], tools=self._tools)
-
-            if functions:
-                return FunctionCallResponse(functions=functions)
-
-        return self.run(payload, stream=payload["stream"])
-
-    def set(self, **kwargs):
-        for k, v in kwargs.items():
-            if k == "tools":
-                self._tools = v
-                logger.info("Groq(): set tools")
-        return self
+        if not api_key:
+            load_env()
+
+        super().__init__(
+            model,
+            api_key=api_key or os.environ["GROQ_API_KEY"],
+            base_url=base_url,
+            json_mode=json_mode,
+            tools=tools,
+            **extra_payload,
+        )
 
     def __repr__(self):
         return "Groq(api_key='gsk_***')"
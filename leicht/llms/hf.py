@@ -1,8 +1,17 @@
+import os
 import time
 from typing import List, Literal
 from typing_extensions import TypedDict
 
-import httpx
+from .._codec import dumps, loads
+from .._http import get_client
+from ..cache import get_completion_cache
+from ..coalesce import get_single_flight
+from ..deadline import remaining
+
+BASE_URL = os.environ.get(
+    "LEICHT_HF_BASE_URL", "https://aweirddev-mistral-7b-instruct-v0-2-leicht.hf.space"
+)
 
 
 class Message(TypedDict):
@@ -27,21 +36,44 @@ def mistral_7b_instruct_v0_2_api(
     ])
     ```
     """
-    base_url = "https://aweirddev-mistral-7b-instruct-v0-2-leicht.hf.space"
-    client = httpx.Client()
-    r = client.post(
-        base_url + "/chat/completions",
-        params={
-            "id": time.time_ns()  # prevents "server unavailable" errors
-        },
-        json={
-            "model": "mistral-7b-instruct-v0.2",
-            "messages": messages,
-            "temperature": temperature,
-            "frequency_penalty": frequency_penalty,
-            "top_p": top_p,
-            "stream": False,
-        },
-        timeout=None,
-    )
-    return r.json()
+    url = BASE_URL + "/chat/completions"
+    payload = {
+        "model": "mistral-7b-instruct-v0.2",
+        "messages": messages,
+        "temperature": temperature,
+        "frequency_penalty": frequency_penalty,
+        "top_p": top_p,
+        "stream": False,
+    }
+    cache = get_completion_cache()
+    key = None
+
+    if cache is not None and cache.accepts(payload):
+        key = cache.key(url, payload)
+        cached = cache.get(key)
+        if cached is not None:
+            return loads(cached)
+
+    client = get_client()
+
+    def send():
+        return client.post(
+            url,
+            params={
+                "id": time.time_ns()  # prevents "server unavailable" errors
+            },
+            content=dumps(payload),
+            headers={"Content-Type": "application/json"},
+            timeout=remaining(),
+        )
+
+    flight = get_single_flight()
+    if flight is not None and flight.accepts(payload):
+        r = flight.call(flight.key(url, payload), send)
+    else:
+        r = send()
+
+    if key and r.is_success:
+        cache.put(key, r.content)  # type: ignore
+
+    return loads(r.content)
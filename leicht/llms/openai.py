@@ -1,61 +1,760 @@
-"""The OpenAI LLM."""
+"""OpenAI and OpenAI-compatible LLMs.
 
+``OpenAILike`` talks to any server with an OpenAI-compatible
+``/chat/completions`` endpoint: llama.cpp's server, vLLM, gateways, and Groq
+(see ``groq.py``). It uses the shared connection pool, not the ``openai``
+package.
+
+```python
+from leicht.llms.openai import OpenAILike
+
+llm = OpenAILike("llama-3-8b", base_url="http://localhost:8080/v1")
+```
+"""
+
+from __future__ import annotations
+
+import contextvars
 import os
-from typing import Optional, TYPE_CHECKING
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Union,
+    overload,
+)
+
+import httpx
+
+from .base import BaseLLM, BaseResponse
+from ._fc import FunctionCallResponse, get_function_call
+from ._pool import Endpoint, EndpointPool, Strategy
+from .hf import BASE_URL as HF_BASE_URL
+from ..types import BasicLLMPayload
+from ..logger import event
+from .._codec import dumps, loads
+from .._jsonstream import JSONStream, Path
+from .._env import load_env
+from .._http import get_client
+from ..cache import get_completion_cache
+from ..coalesce import TeeReader, get_single_flight
+from ..deadline import (
+    Deadline,
+    DeadlineExceeded,
+    current,
+    degrades,
+    remaining,
+    skipped,
+    stage,
+)
+from ..metrics import enabled as metrics_enabled, record, span
+
+Headers = Dict[str, str]
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _usage(data: dict) -> Optional[dict]:
+    # Groq reports usage under "x_groq", everyone else at the top level
+    return data.get("x_groq", {}).get("usage") or data.get("usage")
+
+
+def _as_list(value: Union[str, List[str], None]) -> list:
+    # "a,b" (from the env) and ["a", "b"] both give ["a", "b"]
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return list(value)
+
+
+def _parse_json(content: str) -> Any:
+    try:
+        return loads(content)
+    except Exception:
+        raise ValueError(
+            f"The completion is not valid JSON: {content[-80:]!r}"
+        ) from None
+
+
+def _with_key(headers: Dict[str, str], key: Optional[str]) -> Dict[str, str]:
+    return {**headers, "Authorization": "Bearer %s" % key} if key else headers
+
+
+class OpenAIResponse(BaseResponse):
+    """A chat completion, streamed or not. Iterate it to read a stream chunk by
+    chunk; read it like a ``dict`` to get the (assembled) completion.
+
+    In JSON mode, the completed message has the parsed document under
+    ``"json"``, and :meth:`iter_json` and :meth:`iter_partial` read it as it
+    streams.
+
+    Under a deadline (see :mod:`leicht.deadline`), a stream that runs out of
+    time raises ``DeadlineExceeded``, or with the ``"partial"`` degrade, ends
+    with what was generated so far and ``"finish_reason": "deadline"``.
+    """
+
+    __slots__ = ("_json_mode", "_on_done", "_deadline")
+    _json_mode: bool
+    _on_done: Optional[Callable[[dict], None]]
+    _deadline: Optional[Deadline]
+
+    def __init__(
+        self,
+        data: dict,
+        *,
+        stream: bool,
+        pipe: Any,
+        json_mode: bool,
+        raw: Optional[bytes] = None,
+        on_done: Optional[Callable[[dict], None]] = None,
+        deadline: Optional[Deadline] = None,
+    ):
+        self._stream = stream
+        self._data = data
+        self._pipe = pipe
+        self._raw = raw
+        self._json_mode = json_mode
+        self._on_done = on_done  # called with the assembled data after a stream
+        self._deadline = deadline
+
+    def __iter__(self):
+        def iterator():
+            if not self._stream:
+                if self._data or self._raw is not None:
+                    raise TypeError("Streaming is completed.")
+
+                raise TypeError("This is not a stream or streaming is completed.")
+
+            pipe = self._pipe
+            deadline = self._deadline
+
+            # We're adding this in case of out of bound errors
+            last_d = {}  # type: ignore
+            text = ""
+            start = time.perf_counter()
+            ttft: Optional[float] = None
+            truncated = False
+
+            with pipe as r:
+                if isinstance(r, (httpx.Response, TeeReader)) and r.is_error:
+                    r.read()
+                    raise RuntimeError(f"\n\nResponse:\n{r.text}")
+
+                try:
+                    for line in r.iter_lines():
+                        # len("data: ") = 6
+                        # we'll remove the first 6 characters
+                        raw = line[6:]
+
+                        if raw == "[DONE]":
+                            break
+                        elif not raw:
+                            continue
+
+                        d = loads(raw)
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                        yield d
+
+                        if d.get("x_groq") or d.get("usage"):
+                            last_d = d
+
+                        if d.get("choices"):
+                            text += d["choices"][0]["delta"].get("content") or ""
+
+                        if deadline is not None and deadline.expired():
+                            raise DeadlineExceeded("generation")
+
+                except (DeadlineExceeded, httpx.TimeoutException) as err:
+                    if deadline is None:
+                        raise
+                    if "partial" not in deadline.degrade:
+                        raise DeadlineExceeded("generation") from err
+
+                    truncated = True
+                    skipped("generation", deadline)
+
+            record(
+                "generation",
+                time.perf_counter() - start,
+                model=last_d.get("model"),
+                stream=True,
+                ttft=ttft,
+                usage=_usage(last_d),
+            )
+            self._stream = False
+            message = {"role": "assistant", "content": text}
+            choice: Dict[str, Any] = {"index": 0, "message": message}
+
+            if truncated:
+                choice["finish_reason"] = "deadline"
+            elif self._json_mode:
+                message["json"] = _parse_json(text)
+
+            self._data = {**last_d, "choices": [choice]}
+
+            if self._on_done and not truncated:  # partial answers aren't cached
+                self._on_done(self._data)
+
+        return iterator()
+
+    def iter_json(self, depth: int = 1) -> Iterator[tuple[Path, Any]]:
+        """Reads a JSON mode completion, yielding each field or array element
+        as soon as it completes, as ``(path, value)``, up to ``depth`` levels
+        deep. For ``{"items": [{...}, {...}]}``, ``depth=2`` yields
+        ``(("items", 0), {...})`` before the second item has arrived.
+
+        The complete document is validated at the end (``ValueError`` if
+        invalid), and kept under ``"json"`` in the message.
+
+        Args:
+            depth (int): Max depth of the values to yield.
+        """
+        parser = JSONStream(depth)
+
+        if not self._stream:
+            yield from parser.feed(self["choices"][0]["message"]["content"])
+            parser.close()
+            return
+
+        for chunk in self:
+            if chunk.get("choices"):
+                delta = chunk["choices"][0]["delta"].get("content")
+                if delta:
+                    yield from parser.feed(delta)
+
+        parser.close()  # whether JSON mode was on or not
+
+    def iter_partial(self) -> Iterator[Any]:
+        """Reads a JSON mode completion, yielding the document so far after
+        each chunk, including the text of a string still arriving. The same
+        object is yielded each time, updated in place; copy it to keep a
+        snapshot. The complete document is validated at the end."""
+        parser = JSONStream()
+
+        if not self._stream:
+            parser.feed(self["choices"][0]["message"]["content"])
+            yield parser.close()
+            return
+
+        for chunk in self:
+            if chunk.get("choices"):
+                delta = chunk["choices"][0]["delta"].get("content")
+                if delta:
+                    parser.feed(delta)
+                    document = parser.partial()
+                    if document is not None:
+                        yield document
+
+        parser.close()
+
+    def start(self) -> None:
+        """Sends a streaming request now, rather than on first iteration."""
+        if self._stream and not isinstance(self._pipe, _Started):
+            self._pipe = _Started(self._pipe)
+
+    def close(self) -> None:
+        """Closes a stream that won't be read."""
+        if self._stream and isinstance(self._pipe, _Started):
+            self._pipe.__exit__(None, None, None)
+            self._stream = False
+
+    def add_done_callback(self, fn: Callable[[dict], None]) -> None:
+        """Calls ``fn`` with the assembled data once the stream is read."""
+        previous = self._on_done
+
+        def on_done(data: dict) -> None:
+            if previous:
+                previous(data)
+            fn(data)
+
+        self._on_done = on_done
+
+    def dict(self):
+        if self._raw is not None:
+            # decode lazily, on first read
+            data, self._raw = loads(self._raw), None
+
+            if self._json_mode:
+                sc = data["choices"][0]["message"]  # shortcut
+                sc["json"] = loads(sc["content"])
+
+            return data
+
+        list(self.__iter__())
+        return self._data
+
+    def __next__(self):
+        return self.__iter__()
+
+    def __repr__(self) -> str:
+        return type(self).__name__ + "(" + dumps(self.data).decode("utf-8") + ")"
+
+
+class _Started:
+    """A streaming context that has already been entered."""
+
+    __slots__ = ("_context", "_response")
+    _context: Any
+    _response: Any
+
+    def __init__(self, context: Any):
+        self._context = context
+        self._response = context.__enter__()
+
+    def __enter__(self) -> Any:
+        return self._response
+
+    def __exit__(self, *exc) -> Any:
+        return self._context.__exit__(*exc)
+
+
+class Replay:
+    """Replays a cached completion as a server-sent event stream, in place of
+    an ``httpx`` streaming response."""
+
+    __slots__ = ("_raw",)
+    _raw: bytes
 
-from .base import BaseLLM
+    def __init__(self, raw: bytes):
+        self._raw = raw
 
-try:
-    from openai import OpenAI as _OpenAI
-except ImportError:
-    _OpenAI = None
+    def __enter__(self) -> "Replay":
+        return self
 
-if TYPE_CHECKING:
-    _OpenAI: Optional[type]
+    def __exit__(self, *exc) -> None: ...
+
+    def iter_lines(self) -> Iterator[str]:
+        data = loads(self._raw)
+        content: str = data["choices"][0]["message"].get("content") or ""
+        pieces = re.findall(r"\S+\s*|\s+", content) or [""]
+        base = {
+            "id": data.get("id"),
+            "object": "chat.completion.chunk",
+            "created": data.get("created"),
+            "model": data.get("model"),
+        }
+
+        for i, piece in enumerate(pieces):
+            chunk = {
+                **base,
+                "choices": [
+                    {"index": 0, "delta": {"content": piece}, "finish_reason": None}
+                ],
+            }
+            if i == len(pieces) - 1:
+                chunk["choices"][0]["finish_reason"] = "stop"
+                for k in ("usage", "x_groq"):
+                    if k in data:
+                        chunk[k] = data[k]
+
+            yield "data: " + dumps(chunk).decode("utf-8")
+
+        yield "data: [DONE]"
 
 
 class OpenAILike(BaseLLM):
-    """Represents an OpenAI-like LLM.
+    """Represents an LLM behind an OpenAI-compatible API.
 
     Args:
-        api_key (str, optional): The API key.
+        model (str, optional): The model name. Omitted from requests if not
+            given, for servers that serve a single model.
+        base_url (str | list[str], optional): API base URL, e.g.
+            ``"http://localhost:8080/v1"``, or several to balance over.
+            Defaults to env ``BASE_URL_ENV`` (comma-separated), then
+            ``API_BASE``.
+        api_key (str | list[str], optional): API key, or several to balance
+            over. Defaults to env ``API_KEY_ENV``, or ``api_key_path``
+            (comma-separated). Local servers usually need none.
+        api_key_path (str, optional): Name of the env variable holding the API
+            key.
+        balance (Strategy): With several keys or base URLs, pick by fewest
+            outstanding requests (``"least_outstanding"``) or by most rate
+            limit left (``"rate_limit"``). Every key is used with every base
+            URL.
+        cooldown (float): Seconds a key sits out after a 429 or auth error,
+            unless the response says otherwise (``Retry-After``).
+        speculative (bool): With tools, start generating while function call
+            detection runs, instead of after. Turns without tool calls then
+            take one round trip instead of two; turns with tool calls waste
+            the speculative completion (streams are closed early).
+        json_mode (bool): JSON mode? Streams too: see
+            :meth:`OpenAIResponse.iter_json`.
+        tools (list[str], optional): List of tools in ``str``.
+        headers (dict[str, str], optional): Extra headers.
+        **extra_payload: Extra payload, sent with every request.
     """
 
-    __slots__ = ("api_key",)
-    api_key: str
+    __slots__ = (
+        "_headers",
+        "_api_key",
+        "_payload",
+        "_json_mode",
+        "_tools",
+        "_api_base",
+        "_pool",
+        "_speculative",
+    )
+    _headers: Headers
+    _api_key: Optional[str]
+    _payload: dict  # extra payload to append
+    _json_mode: bool
+    _tools: List[str]
+    _api_base: str  # the first base URL; identifies this LLM in cache keys
+    _pool: EndpointPool
+    _speculative: bool
+    API_BASE: Optional[str] = None
+    API_KEY_ENV: Optional[str] = None
+    BASE_URL_ENV: Optional[str] = None
+    RESPONSE: type = OpenAIResponse
 
     def __init__(
         self,
+        model: Optional[str] = None,
         *,
-        base_url: str,
-        api_key: Optional[str] = None,
+        base_url: Union[str, List[str], None] = None,
+        api_key: Union[str, List[str], None] = None,
         api_key_path: Optional[str] = None,
-        **kwargs,
+        balance: Strategy = "least_outstanding",
+        cooldown: float = 30.0,
+        speculative: bool = False,
+        json_mode: bool = False,
+        tools: Optional[List[str]] = None,
+        headers: Optional[Headers] = None,
+        **extra_payload,
     ):
+        key_env = api_key_path or self.API_KEY_ENV
+
         # if `api_key` is not provided, use the env
-        if not _OpenAI:
-            raise ImportError(
-                "\n\nPlease install the `openai` package to use "
-                "\x1b[38;2;229;192;123mOpenAI\x1b[0m(\x1b[38;2;97;175;239mBaseLLM\x1b[0m).\n"
-                "  \x1b[38;2;97;175;239m$ \x1b[38;2;229;192;123mpip\x1b[0m install openai\n"
+        if not api_key or not base_url:
+            load_env()
+
+        api_keys = _as_list(
+            api_key or (os.environ.get(key_env) if key_env else None)
+        )
+        api_bases = _as_list(
+            base_url
+            or (os.environ.get(self.BASE_URL_ENV) if self.BASE_URL_ENV else None)
+            or self.API_BASE
+        )
+        if not api_bases:
+            raise ValueError(
+                "\n\nPlease provide the API base URL. From:\n"
+                "  \x1b[38;2;229;192;123m%s\x1b[0m(..., "
+                "\x1b[38;2;97;175;239mbase_url\x1b[0m=\x1b[38;2;152;195;121m"
+                "'http://localhost:8080/v1'\x1b[0m)\n" % type(self).__name__
             )
 
-        self.api_key = api_key or os.environ[api_key_path] if api_key_path else ""
-        self.openai = _OpenAI(base_url=base_url, api_key=self.api_key, **kwargs)
+        self._headers = {"Content-Type": "application/json", **(headers or {})}
+        self._pool = EndpointPool([], strategy=balance, cooldown=cooldown)
+        self._use(api_bases, api_keys or [None])
 
-    def chat_completions(self):
-        response = self.openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": "write a poem about a tree"}],
-        )
-        return response
+        self._payload = {**({"model": model} if model else {}), **extra_payload}
+
+        self._json_mode = json_mode
+        if json_mode:
+            self._payload["response_format"] = {"type": "json_object"}
+
+        self._tools = tools or []
+        self._speculative = speculative
+
+    @property
+    def pool(self) -> EndpointPool:
+        """The keys and base URLs requests are spread over. See
+        :meth:`EndpointPool.stats` for per-key utilization."""
+        return self._pool
+
+    def _use(self, api_bases: List[str], api_keys: List[Optional[str]]) -> None:
+        api_bases = [url.rstrip("/") for url in api_bases]
+        headers = {k: v for k, v in self._headers.items() if k != "Authorization"}
+
+        self._api_base = api_bases[0]
+        self._api_key = api_keys[0]
+        self._headers = _with_key(headers, api_keys[0])
+        self._pool.endpoints = [
+            Endpoint(url, _with_key(headers, key), key)
+            for url in api_bases
+            for key in api_keys
+        ]
+
+    def _credentials(self) -> str:
+        # who may answer, for the single-flight key: only hashed
+        return "\n".join(f"{e.base_url}\0{e.key or ''}" for e in self._pool.endpoints)
+
+    def run(  # type: ignore
+        self, payload: BasicLLMPayload, *, stream: Optional[bool] = None
+    ) -> OpenAIResponse:
+        should_stream = payload["stream"] if stream is None else stream
+        client = get_client()
+        timeout = remaining()
+        json_payload = self._payload | payload
+
+        url = self._api_base + "/chat/completions"
+        cache = get_completion_cache()
+        key = None
+        response = self.RESPONSE
+
+        if cache is not None and cache.accepts(json_payload):
+            key = cache.key(url, json_payload)
+            cached = cache.get(key)
+
+            if cached is not None:
+                return response(
+                    {},
+                    stream=should_stream,
+                    pipe=Replay(cached) if should_stream else None,
+                    json_mode=self._json_mode,
+                    raw=None if should_stream else cached,
+                )
+
+        flight = get_single_flight()
+        if flight is not None and not flight.accepts(json_payload):
+            flight = None
+
+        body = dumps(json_payload)
+        pool = self._pool
+
+        if should_stream:
+
+            def send():
+                return pool.stream(
+                    lambda e: client.stream(
+                        "POST",
+                        e.base_url + "/chat/completions",
+                        content=body,
+                        headers=e.headers,
+                        timeout=timeout,
+                    )
+                )
+
+            if flight is not None:
+                pipe = flight.stream(
+                    flight.key(
+                        url, {**json_payload, "stream": True}, self._credentials()
+                    ),
+                    send,
+                )
+            else:
+                pipe = send()
+
+            return response(
+                {},
+                stream=True,
+                pipe=pipe,
+                json_mode=self._json_mode,
+                on_done=(lambda data: cache.put(key, dumps(data))) if key else None,
+                deadline=current(),
+            )
+
+        else:
+            with span("generation", model=json_payload.get("model")) as sp:
+
+                def send():
+                    return pool.send(
+                        lambda e: client.post(
+                            e.base_url + "/chat/completions",
+                            content=body,
+                            headers=e.headers,
+                            timeout=timeout,
+                        )
+                    )
+
+                if flight is not None:
+                    r = flight.call(
+                        flight.key(
+                            url, {**json_payload, "stream": False}, self._credentials()
+                        ),
+                        send,
+                    )
+                else:
+                    r = send()
+
+                try:
+                    r.raise_for_status()
+                except httpx.HTTPStatusError as err:
+                    raise RuntimeError(f"\n\nResponse:\n{r.text}") from err
+
+                if key:
+                    cache.put(key, r.content)  # type: ignore
+
+                res = response(
+                    {},
+                    stream=False,
+                    pipe=None,
+                    json_mode=self._json_mode,
+                    raw=r.content,
+                )
+
+                if metrics_enabled():
+                    # decodes the body now, but only when someone's listening
+                    sp.set(usage=_usage(res.data))
+
+            return res
+
+    @overload
+    def __call__(
+        self,
+        payload: BasicLLMPayload,
+        *,
+        notools: Literal[True] = True,
+        tools: Optional[List[str]] = None,
+    ) -> OpenAIResponse: ...
+
+    @overload
+    def __call__(
+        self,
+        payload: BasicLLMPayload,
+        *,
+        notools: Literal[False] = False,
+        tools: Optional[List[str]] = None,
+    ) -> FunctionCallResponse: ...
+
+    def __call__(  # type: ignore
+        self,
+        payload: BasicLLMPayload,
+        *,
+        notools: bool = False,
+        tools: Optional[List[str]] = None,
+    ):
+        """Runs a call.
+
+        Returns `FunctionCallResponse` if applicable for a function call.
+
+        Args:
+            payload (BasicLLMPayload): The payload.
+            notools (bool): Skip function call detection?
+            tools (list[str], optional): Tool prompts to detect calls of, for
+                this call only. Defaults to the ones set.
+        """
+        tools = self._tools if tools is None else tools
+
+        if not notools and tools:
+            if self._speculative:
+                return self._speculate(payload, tools)
+
+            functions = self._detect(payload, tools)
+
+            if functions:
+                return FunctionCallResponse(functions=functions)
+
+        with stage("generation"):
+            return self.run(payload, stream=payload["stream"])
+
+    def _detect(self, payload: BasicLLMPayload, tools: List[str]):
+        try:
+            with stage("detection"):
+                return get_function_call(payload["messages"], tools=tools)
+        except DeadlineExceeded:
+            if not degrades("skip_detection"):
+                raise
+
+            skipped("detection")
+            return None
+
+    def _speculate(self, payload: BasicLLMPayload, tools: List[str]):
+        def generate() -> OpenAIResponse:
+            with stage("generation"):
+                res = self.run(payload, stream=payload["stream"])
+            res.start()  # a stream starts generating now, too
+            return res
+
+        # in a copy of the context, to see the deadline
+        future = _get_executor().submit(contextvars.copy_context().run, generate)
+
+        try:
+            functions = self._detect(payload, tools)
+        except BaseException:
+            _discard(future)
+            raise
+
+        if functions:
+            event("speculation.discard", functions=len(functions))
+            _discard(future)
+            return FunctionCallResponse(functions=functions)
+
+        event("speculation.used")
+        return future.result()
+
+    def set(self, **kwargs):
+        for k, v in kwargs.items():
+            if k == "tools":
+                self._tools = v
+                event("llm.set", llm=type(self).__name__, tools=len(v))
+            elif k == "api_key":
+                bases = dict.fromkeys(e.base_url for e in self._pool.endpoints)
+                self._use(list(bases), _as_list(v))
+            elif k == "base_url":
+                keys = dict.fromkeys(e.key for e in self._pool.endpoints)
+                self._use(_as_list(v), list(keys))
+            elif k == "speculative":
+                self._speculative = v
+            else:
+                self._payload[k] = v
+        return self
+
+    def warmup_plan(self):
+        if not self._tools:
+            return {"prompts": [], "urls": [self._api_base]}
+
+        return {"prompts": ["functions-v2"], "urls": [self._api_base, HF_BASE_URL]}
 
     def __repr__(self) -> str:
-        return "OpenAI(api_key='sk-***')"
+        model = self._payload.get("model")
+        return f"{type(self).__name__}(model={model!r}, base_url={self._api_base!r})"
+
+
+def _discard(future: "Future[OpenAIResponse]") -> None:
+    if future.cancel():
+        return
+
+    # already running; close the stream once it has started
+    future.add_done_callback(
+        lambda f: f.result().close() if not f.exception() else None
+    )
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=32, thread_name_prefix="leicht-speculative"
+                )
+
+    return _executor
 
 
 class OpenAI(OpenAILike):
-    def __init__(self):
-        super().__init__(
-            base_url="https://api.openai.com/v1/", api_key_path="OPENAI_API_KEY"
-        )
+    """Represents the OpenAI LLM.
+
+    Args:
+        model (str): The model name.
+        api_key (str, optional): API key. If not provided, uses env
+            ``OPENAI_API_KEY`` instead.
+        base_url (str, optional): API base URL. If not provided, uses env
+            ``OPENAI_BASE_URL``, or OpenAI's.
+        **kwargs: See :class:`OpenAILike`.
+    """
+
+    __slots__ = ()
+    API_BASE = "https://api.openai.com/v1"
+    API_KEY_ENV = "OPENAI_API_KEY"
+    BASE_URL_ENV = "OPENAI_BASE_URL"
+
+    def __init__(self, model: str = "gpt-3.5-turbo", **kwargs):
+        super().__init__(model, **kwargs)
+
+    def __repr__(self) -> str:
+        return "OpenAI(api_key='sk-***')"
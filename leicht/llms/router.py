@@ -0,0 +1,276 @@
+"""Routing turns to models by complexity.
+
+```python
+from leicht import Assistant
+from leicht.llms import Groq
+from leicht.llms.router import Router, Tier
+
+router = Router(
+    [
+        Tier(Groq("gemma-7b-it"), max_score=0.35, name="fast"),
+        Tier(Groq("mixtral-8x7b-32768"), name="large"),
+    ]
+)
+assistant = Assistant("basic", llm=router)
+print(router.stats())
+```
+
+Each turn is scored locally, from 0 (trivial) to 1 (hard), and sent to the
+first tier whose ``max_score`` it's within.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+)
+
+from .base import BaseLLM
+from ._pipeline import get_llm
+from ..logger import event
+from ..metrics import quantile
+from ..types import LLMType, Message
+
+Scorer = Callable[[List[Message], bool], float]
+
+# words that ask for reasoning, and ones that don't
+HARD_WORDS = re.compile(
+    r"\b(why|how come|explain|compare|contrast|analy[sz]e|reason|prove|derive|"
+    r"design|architect|implement|refactor|debug|optimi[sz]e|evaluate|"
+    r"trade-?offs?|step[- ]by[- ]step|pros and cons|in detail|critique)\b",
+    re.IGNORECASE,
+)
+EASY_WORDS = re.compile(
+    r"^\s*(hi|hello|hey|thanks|thank you|ok(ay)?|yes|no|sure|bye|good "
+    r"(morning|night))\b",
+    re.IGNORECASE,
+)
+CODE = re.compile(r"```|^( {4}|\t)\S", re.MULTILINE)
+LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s", re.MULTILINE)
+MATH = re.compile(r"[=∑∫√^]|\d\s*[-+*/]\s*\d")
+
+
+def score(messages: List[Message], tools: bool = False) -> float:
+    """Scores how hard a turn is, from 0 to 1, from its last user message
+    (length, keywords, structure), the history depth, and whether it follows
+    tool calls.
+
+    Args:
+        messages (list[Message]): The messages.
+        tools (bool): Does the turn answer from tool results?
+    """
+    text = ""
+    for message in reversed(messages):
+        if message["role"] == "user":
+            text = message["content"]
+            break
+
+    words = len(text.split())
+    value = 0.35 * min(words / 150, 1.0)
+    value += 0.15 * min(max(len(messages) - 2, 0) / 20, 1.0)
+
+    if tools:
+        value += 0.15
+
+    value += min(0.1 * len(HARD_WORDS.findall(text)), 0.25)
+    if words <= 6 and EASY_WORDS.match(text):
+        value -= 0.1
+
+    if CODE.search(text):
+        value += 0.15
+    if len(LIST_ITEM.findall(text)) >= 2 or text.count("?") >= 2:
+        value += 0.05
+    if MATH.search(text):
+        value += 0.05
+
+    return min(max(value, 0.0), 1.0)
+
+
+class Tier:
+    """Represents a tier of the router.
+
+    Args:
+        llm (LLMType): The LLM, e.g. ``Groq("gemma-7b-it")``.
+        max_score (float): Highest score this tier takes.
+        name (str, optional): Name, for stats. Defaults to the model name.
+    """
+
+    __slots__ = (
+        "llm",
+        "max_score",
+        "name",
+        "_latencies",
+        "_scores",
+        "_turns",
+        "_errors",
+    )
+    llm: BaseLLM
+    max_score: float
+    name: str
+    _latencies: Deque[float]
+    _scores: Deque[float]
+    _turns: int
+    _errors: int
+
+    def __init__(
+        self, llm: LLMType, max_score: float = 1.0, *, name: Optional[str] = None
+    ):
+        self.llm = get_llm(llm)
+        self.max_score = max_score
+        self.name = name or _model_of(self.llm) or type(self.llm).__name__
+        self._latencies = deque(maxlen=1000)
+        self._scores = deque(maxlen=1000)
+        self._turns = 0
+        self._errors = 0
+
+    def __repr__(self) -> str:
+        return f"Tier({self.name!r}, max_score={self.max_score})"
+
+
+class Router(BaseLLM):
+    """Routes each turn to a faster or larger model, by how hard it looks.
+
+    Works with any backend, and mixes them: a tier is any LLM. Tools and other
+    settings go to every tier.
+
+    Args:
+        tiers (Sequence[Tier]): The tiers, by ascending ``max_score``. Turns
+            scoring above every tier's go to the last one. Names must be
+            unique.
+        scorer (Scorer): Scores a turn, from its messages and whether it
+            follows tool calls. Defaults to :func:`score`.
+    """
+
+    __slots__ = ("tiers", "scorer", "_lock")
+    tiers: List[Tier]
+    scorer: Scorer
+    _lock: threading.Lock
+
+    def __init__(self, tiers: Sequence[Tier], *, scorer: Scorer = score):
+        if not tiers:
+            raise ValueError("\n\nPlease provide at least one tier.\n")
+
+        names = [tier.name for tier in tiers]
+        duplicates = sorted({n for n in names if names.count(n) > 1})
+        if duplicates:
+            raise ValueError(
+                f"\n\nTier names must be unique, for stats: {duplicates!r}. "
+                "Name them with Tier(..., name=...).\n"
+            )
+
+        self.tiers = sorted(tiers, key=lambda t: t.max_score)
+        self.scorer = scorer
+        self._lock = threading.Lock()
+
+    @classmethod
+    def by_model(
+        cls, llm: LLMType, models: Mapping[str, float], **kwargs: Any
+    ) -> "Router":
+        """Makes a router over models of the same backend.
+
+        ```python
+        Router.by_model("groq", {"gemma-7b-it": 0.35, "mixtral-8x7b-32768": 1.0})
+        ```
+
+        Args:
+            llm (LLMType): The backend, as a name or class.
+            models (Mapping[str, float]): Each model's ``max_score``.
+            **kwargs: Options for the backend.
+        """
+        return cls(
+            [
+                Tier(get_llm(llm, model=model, **kwargs), max_score, name=model)
+                for model, max_score in models.items()
+            ]
+        )
+
+    def route(self, payload: Any, *, notools: bool = False) -> Tier:
+        """Picks the tier for a turn.
+
+        Args:
+            payload: The payload.
+            notools (bool): Does the turn answer from tool results?
+        """
+        value = self.scorer(payload["messages"], notools)
+        tier = next((t for t in self.tiers if value <= t.max_score), self.tiers[-1])
+
+        with self._lock:
+            tier._scores.append(value)
+            tier._turns += 1
+
+        event("router.route", tier=tier.name, score=round(value, 3))
+        return tier
+
+    def __call__(self, payload: Any, **kwargs: Any) -> Any:
+        tier = self.route(payload, notools=kwargs.get("notools", False))
+        start = time.perf_counter()
+
+        try:
+            res = tier.llm(payload, **kwargs)
+        except BaseException:
+            with self._lock:
+                tier._errors += 1
+            raise
+
+        def done(*_) -> None:
+            with self._lock:
+                tier._latencies.append(time.perf_counter() - start)
+
+        if payload.get("stream") and hasattr(res, "add_done_callback"):
+            res.add_done_callback(done)  # once the stream is read
+        else:
+            done()
+
+        return res
+
+    def set(self, **kwargs):
+        for tier in self.tiers:
+            tier.llm.set(**kwargs)
+        return self
+
+    def warmup_plan(self) -> Dict[str, List[str]]:
+        prompts: Dict[str, None] = {}
+        urls: Dict[str, None] = {}
+
+        for tier in self.tiers:
+            plan = tier.llm.warmup_plan()
+            prompts.update(dict.fromkeys(plan["prompts"]))
+            urls.update(dict.fromkeys(plan["urls"]))
+
+        return {"prompts": list(prompts), "urls": list(urls)}
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Gets per-tier stats: ``turns``, ``errors``, ``p50`` and ``p95``
+        latency (seconds; streams count until fully read), and the mean
+        ``score`` routed to it."""
+        with self._lock:
+            out = {}
+            for tier in self.tiers:
+                latencies = sorted(tier._latencies)
+                scores = tier._scores
+                out[tier.name] = {
+                    "turns": tier._turns,
+                    "errors": tier._errors,
+                    "p50": quantile(latencies, 0.5),
+                    "p95": quantile(latencies, 0.95),
+                    "score": sum(scores) / len(scores) if scores else 0.0,
+                }
+
+            return out
+
+    def __repr__(self) -> str:
+        return f"Router({self.tiers!r})"
+
+
+def _model_of(llm: BaseLLM) -> Optional[str]:
+    payload = getattr(llm, "_payload", None)
+    return payload.get("model") if isinstance(payload, dict) else None
@@ -1,4 +1,155 @@
+"""Structured event tracing.
+
+Events carry raw field values. Nothing is formatted unless a sink is enabled,
+and with no sink and no ring buffer, :func:`event` returns right away.
+
+```python
+from leicht import logger
+
+logger.enable_logging()  # forward to the "leicht" logger
+logger.enable_ring_buffer(1024)  # keep the last 1024 events for post-mortems
+logger.set_sampling(0.01)  # sinks only see 1% of events (the buffer sees all)
+
+print(logger.dump_text())
+```
+"""
+
 import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
 
 logger = logging.getLogger("leicht")
-logger.setLevel(logging.DEBUG)
+
+Sink = Callable[["Event"], None]
+
+_sinks: List[Sink] = []
+_ring: Optional[Deque["Event"]] = None
+_sample_rate = 1.0
+_active = False
+
+
+class Event:
+    """Represents a traced event.
+
+    Args:
+        name (str): Event name, e.g. ``"assistant.run"``.
+        fields (dict): Raw field values.
+    """
+
+    __slots__ = ("name", "time", "thread", "fields")
+    name: str
+    time: float
+    thread: int
+    fields: Dict[str, Any]
+
+    def __init__(self, name: str, fields: Dict[str, Any]):
+        self.name = name
+        self.time = time.time()
+        self.thread = threading.get_ident()
+        self.fields = fields
+
+    def format(self) -> str:
+        return self.name + "".join(f" {k}={v!r}" for k, v in self.fields.items())
+
+    def __repr__(self) -> str:
+        return f"Event({self.format()})"
+
+
+def event(name: str, /, **fields: Any) -> None:
+    """Emits an event. Pass raw values; sinks format them if they need to.
+
+    Args:
+        name (str): Event name.
+        **fields: Fields.
+    """
+    if not _active:
+        return
+
+    ev = Event(name, fields)
+
+    if _ring is not None:
+        _ring.append(ev)
+
+    if _sinks and (_sample_rate >= 1.0 or random.random() < _sample_rate):
+        for sink in _sinks:
+            sink(ev)
+
+
+def add_sink(sink: Sink) -> None:
+    """Registers a sink that receives (sampled) events."""
+    _sinks.append(sink)
+    _update()
+
+
+def remove_sink(sink: Sink) -> None:
+    """Unregisters a sink."""
+    _sinks.remove(sink)
+    _update()
+
+
+def enable_logging(level: int = logging.DEBUG) -> Sink:
+    """Forwards events to the ``"leicht"`` logger.
+
+    Args:
+        level (int): Log level.
+
+    Returns:
+        Sink: The sink, for :func:`remove_sink`.
+    """
+
+    def sink(ev: Event) -> None:
+        if logger.isEnabledFor(level):
+            logger.log(level, "%s", ev.format())
+
+    add_sink(sink)
+    return sink
+
+
+def enable_ring_buffer(size: int = 1024) -> None:
+    """Keeps the last ``size`` events in memory, unsampled. See :func:`dump`.
+
+    Args:
+        size (int): Max events.
+    """
+    global _ring
+    _ring = deque(maxlen=size)
+    _update()
+
+
+def disable_ring_buffer() -> None:
+    global _ring
+    _ring = None
+    _update()
+
+
+def dump() -> List[Event]:
+    """Gets the events in the ring buffer, oldest first."""
+    return list(_ring) if _ring is not None else []
+
+
+def dump_text() -> str:
+    """Formats the events in the ring buffer, one per line."""
+    return "\n".join(
+        time.strftime("%H:%M:%S", time.localtime(ev.time))
+        + f".{int(ev.time % 1 * 1000):03d} [{ev.thread}] {ev.format()}"
+        for ev in dump()
+    )
+
+
+def set_sampling(rate: float) -> None:
+    """Only passes a fraction of events to the sinks. The ring buffer still
+    records every event.
+
+    Args:
+        rate (float): From ``0.0`` to ``1.0``.
+    """
+    global _sample_rate
+    _sample_rate = rate
+
+
+def _update() -> None:
+    global _active
+    _active = bool(_sinks) or _ring is not None
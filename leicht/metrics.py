@@ -0,0 +1,285 @@
+"""Per-stage latency instrumentation.
+
+```python
+from leicht.metrics import Metrics, add_hook
+
+metrics = Metrics()
+add_hook(metrics)
+
+assistant.run("hi")
+print(metrics.to_prometheus())
+```
+
+Stages: ``run``, ``conditionals``, ``detection``, ``tool``, ``generation``.
+Without any hook registered, spans are no-ops.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+Hook = Callable[["Span"], None]
+
+_hooks: List[Hook] = []
+
+
+class Span:
+    """Represents a timed stage.
+
+    Args:
+        name (str): Stage name.
+        **attrs: Attributes, e.g. ``model`` or backend ``usage``.
+    """
+
+    __slots__ = ("name", "attrs", "start", "duration")
+    name: str
+    attrs: Dict[str, Any]
+    start: float
+    duration: float
+
+    def __init__(self, name: str, /, **attrs: Any):
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> Span:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        emit(self)
+
+    def __repr__(self) -> str:
+        return f"Span({self.name!r}, {self.duration * 1000:.2f}ms, {self.attrs!r})"
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None: ...
+
+    def __enter__(self) -> _NullSpan:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None: ...
+
+
+_null_span = _NullSpan()
+
+
+def add_hook(hook: Hook) -> None:
+    """Registers a hook that receives every finished :class:`Span`."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    """Unregisters a hook."""
+    _hooks.remove(hook)
+
+
+def enabled() -> bool:
+    """Is any hook registered?"""
+    return bool(_hooks)
+
+
+def span(name: str, /, **attrs: Any):
+    """Times a stage.
+
+    ```python
+    with span("tool", name="weather") as sp:
+        ...
+        sp.set(result_size=3)
+    ```
+
+    Args:
+        name (str): Stage name.
+        **attrs: Attributes.
+    """
+    return Span(name, **attrs) if _hooks else _null_span
+
+
+def record(name: str, duration: float, /, **attrs: Any) -> None:
+    """Emits a span that was timed elsewhere (e.g. a finished stream).
+
+    Args:
+        name (str): Stage name.
+        duration (float): Seconds.
+        **attrs: Attributes.
+    """
+    if _hooks:
+        sp = Span(name, **attrs)
+        sp.start = time.perf_counter() - duration
+        sp.duration = duration
+        emit(sp)
+
+
+def emit(sp: Span) -> None:
+    for hook in _hooks:
+        hook(sp)
+
+
+class Metrics:
+    """Aggregates spans into per-stage latency and throughput stats. Register it
+    with :func:`add_hook`.
+
+    Args:
+        window (int): Samples kept per stage for percentiles.
+    """
+
+    __slots__ = (
+        "window",
+        "_durations",
+        "_tps",
+        "_usage",
+        "_counts",
+        "_sums",
+        "_errors",
+        "_lock",
+    )
+    window: int
+    _durations: Dict[str, Deque[float]]
+    _tps: Dict[str, Deque[float]]
+    _usage: Dict[str, Dict[str, Deque[float]]]
+    _counts: Dict[str, int]
+    _sums: Dict[str, float]  # since the start, like the counts
+    _errors: Dict[str, int]
+    _lock: threading.Lock
+
+    def __init__(self, window: int = 10_000):
+        self.window = window
+        self._durations = {}
+        self._tps = {}
+        self._usage = {}
+        self._counts = {}
+        self._sums = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, sp: Span) -> None:
+        usage: Optional[dict] = sp.attrs.get("usage")
+
+        with self._lock:
+            self._deque(self._durations, sp.name).append(sp.duration)
+            self._counts[sp.name] = self._counts.get(sp.name, 0) + 1
+            self._sums[sp.name] = self._sums.get(sp.name, 0.0) + sp.duration
+            if "error" in sp.attrs:
+                self._errors[sp.name] = self._errors.get(sp.name, 0) + 1
+
+            if usage:
+                timings = self._usage.setdefault(sp.name, {})
+                for k in ("queue_time", "prompt_time", "completion_time"):
+                    if usage.get(k) is not None:
+                        self._deque(timings, k).append(usage[k])
+
+                if usage.get("completion_tokens") and usage.get("completion_time"):
+                    self._deque(self._tps, sp.name).append(
+                        usage["completion_tokens"] / usage["completion_time"]
+                    )
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Stats per stage: ``count``, ``errors``, ``sum``, ``p50``, ``p95``,
+        ``p99`` (seconds), and when the backend reports usage,
+        ``tokens_per_sec`` (p50) and its timings (p50). ``count`` and ``sum``
+        cover every span since the start; the rest, the last ``window``."""
+        with self._lock:
+            out: Dict[str, Dict[str, Any]] = {}
+
+            for name, durations in self._durations.items():
+                values = sorted(durations)
+                stage: Dict[str, Any] = {
+                    "count": self._counts[name],
+                    "errors": self._errors.get(name, 0),
+                    "sum": self._sums[name],
+                    "p50": quantile(values, 0.5),
+                    "p95": quantile(values, 0.95),
+                    "p99": quantile(values, 0.99),
+                }
+                if name in self._tps:
+                    stage["tokens_per_sec"] = quantile(sorted(self._tps[name]), 0.5)
+                for k, v in self._usage.get(name, {}).items():
+                    stage[k] = quantile(sorted(v), 0.5)
+
+                out[name] = stage
+
+            return out
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary())
+
+    def to_prometheus(self, prefix: str = "leicht") -> str:
+        """Exports in the Prometheus text format."""
+        latency = [
+            f"# HELP {prefix}_stage_seconds Latency of each stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        errors = [f"# TYPE {prefix}_stage_errors_total counter"]
+        tps = [f"# TYPE {prefix}_tokens_per_second gauge"]
+        backend = [
+            f"# HELP {prefix}_backend_seconds Timings reported by the backend (p50).",
+            f"# TYPE {prefix}_backend_seconds gauge",
+        ]
+
+        for name, stage in self.summary().items():
+            label = f'stage="{name}"'
+
+            for q, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+                latency.append(
+                    f'{prefix}_stage_seconds{{{label},quantile="{q}"}} {stage[key]}'
+                )
+            latency.append(f"{prefix}_stage_seconds_sum{{{label}}} {stage['sum']}")
+            latency.append(f"{prefix}_stage_seconds_count{{{label}}} {stage['count']}")
+            errors.append(f"{prefix}_stage_errors_total{{{label}}} {stage['errors']}")
+
+            if "tokens_per_sec" in stage:
+                tps.append(
+                    f"{prefix}_tokens_per_second{{{label}}} {stage['tokens_per_sec']}"
+                )
+
+            for k in ("queue_time", "prompt_time", "completion_time"):
+                if k in stage:
+                    backend.append(
+                        f'{prefix}_backend_seconds{{{label},timing="{k}"}} {stage[k]}'
+                    )
+
+        return "\n".join(latency + errors + tps + backend) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._durations.clear()
+            self._tps.clear()
+            self._usage.clear()
+            self._counts.clear()
+            self._sums.clear()
+            self._errors.clear()
+
+    def _deque(self, d: Dict[str, Deque[float]], k: str) -> Deque[float]:
+        if k not in d:
+            d[k] = deque(maxlen=self.window)
+        return d[k]
+
+
+def quantile(values: List[float], q: float) -> float:
+    """Gets a quantile of sorted values, by the nearest-rank method.
+
+    Args:
+        values (list[float]): The values, sorted.
+        q (float): The quantile, from 0 to 1.
+
+    Returns:
+        float: The value, or ``0.0`` if there are none.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
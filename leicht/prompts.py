@@ -5,23 +5,118 @@ https://github.com/ramptix/preprompted-data
 
 import gzip
 import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
 import httpx
 
+from ._http import get_client
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+    import msvcrt
+
+_cache_dir: str = os.environ.get("LEICHT_PROMPT_CACHE", ".preprompt")
+
+PROMPT_BASE_URL = os.environ.get(
+    "LEICHT_PROMPT_BASE_URL",
+    "https://raw.githubusercontent.com/ramptix/preprompted-data/main/src",
+)
+
+
+def set_cache_dir(path: str) -> None:
+    """Sets the prompt cache location.
+
+    Point every worker to the same directory to share prompts across processes.
+    Defaults to env ``LEICHT_PROMPT_CACHE``, or ``.preprompt``.
+
+    Args:
+        path (str): The cache directory.
+    """
+    global _cache_dir
+    _cache_dir = path
+
+
+def get_cache_dir() -> str:
+    """Gets the prompt cache location."""
+    return _cache_dir
+
 
 def make_directory() -> None:
-    os.makedirs(".preprompt/", exist_ok=True)
+    os.makedirs(_cache_dir, exist_ok=True)
+    ignore = os.path.join(_cache_dir, ".gitignore")
 
-    if not os.path.exists(".preprompt/.gitignore"):
+    if not os.path.exists(ignore):
         # Add .gitignore so the cache doesn't go to the
         # user's git repository. We're responsible!
         # Damn!
-        with open(".preprompt/.gitignore", "wb") as f:
-            f.write(b"*")  # ignore all contents of this directory
+        save_file(ignore, b"*")  # ignore all contents of this directory
+
+
+def lock_path(path_name: str) -> str:
+    """Gets the lock file of a cached file: ``<path_name>.lock``, under the
+    cache directory's ``.locks/``.
+
+    Lock files are left behind, as removing one another process may be
+    waiting on would break the lock; :func:`clear_cache` removes them.
+    """
+    rel = os.path.relpath(path_name, _cache_dir)
+    if rel.startswith(os.pardir):  # not in the cache
+        return path_name + ".lock"
+
+    return os.path.join(_cache_dir, ".locks", rel + ".lock")
+
+
+@contextmanager
+def file_lock(path_name: str) -> Iterator[None]:
+    """Holds an exclusive lock on the lock file of ``path_name`` (see
+    :func:`lock_path`) across processes."""
+    lock_name = lock_path(path_name)
+    os.makedirs(os.path.dirname(lock_name) or ".", exist_ok=True)
+
+    with open(lock_name, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # type: ignore
+
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)  # type: ignore
+
+
+def save_file(path_name: str, data: bytes) -> None:
+    """Writes to a temp file, then renames it over ``path_name``.
+
+    Readers either see the old file or the complete new one, never a partial
+    write.
+    """
+    fd, tmp = tempfile.mkstemp(
+        dir=os.path.dirname(path_name) or ".", prefix=".tmp-", suffix=".part"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path_name)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            ...
+        raise
 
 
 def fetch_prompt(name: str) -> bytes:
-    client = httpx.Client()
+    client = get_client()
 
     if name.startswith("community"):
         r = client.get(
@@ -37,20 +132,17 @@ def fetch_prompt(name: str) -> bytes:
         r.raise_for_status()
         return r.json()["body"].encode("utf8")
 
-    r = client.get(
-        f"https://raw.githubusercontent.com/ramptix/preprompted-data/main/src/{name}.md"
-    )
+    r = client.get(f"{PROMPT_BASE_URL}/{name}.md")
     r.raise_for_status()
 
     return r.content.strip()
 
 
 def save_prompt(path_name: str, data: bytes):
-    if "/" in path_name:
-        os.makedirs("/".join(path_name.split("/")[:-1]), exist_ok=True)
+    if os.path.dirname(path_name):
+        os.makedirs(os.path.dirname(path_name), exist_ok=True)
 
-    with gzip.open(path_name, "wb") as file:
-        file.write(data)
+    save_file(path_name, gzip.compress(data))
 
 
 def read_prompt(path_name: str):
@@ -63,15 +155,22 @@ def get_cached_prompt_or_fetch(name: str, no_cache: bool = False) -> str:
         return fetch_prompt(name).decode("utf-8")
 
     make_directory()
-    path_name = ".preprompt/%s.prompt" % name
+    path_name = os.path.join(_cache_dir, "%s.prompt" % name)
+
+    if os.path.exists(path_name):
+        return read_prompt(path_name)
+
+    os.makedirs(os.path.dirname(path_name), exist_ok=True)
+
+    # single-flight: only the lock holder fetches; others wait, then read
+    with file_lock(path_name):
+        if os.path.exists(path_name):
+            return read_prompt(path_name)
 
-    if not os.path.exists(path_name):
         prompt_b: bytes = fetch_prompt(name)
         save_prompt(path_name, prompt_b)
 
-        return prompt_b.decode("utf-8")
-
-    return read_prompt(path_name)
+    return prompt_b.decode("utf-8")
 
 
 def get_prompt(name: str, *, no_cache: bool = False, **kwargs: str) -> str:
@@ -98,24 +197,27 @@ def get_prompt(name: str, *, no_cache: bool = False, **kwargs: str) -> str:
 
 
 def clear_cache():
-    """Clears all prompts in ``.preprompt/*``."""
+    """Clears all prompts in the cache directory (``.preprompt/*`` by default),
+    and their lock files."""
     import shutil  # noqa: F401
 
-    shutil.rmtree(".preprompt", ignore_errors=True)
+    shutil.rmtree(_cache_dir, ignore_errors=True)
 
 
-def update_all(_dir: str = ".preprompt"):
+def update_all(_dir: Optional[str] = None):
     """Update all prompts."""
     make_directory()
+    _dir = _dir or _cache_dir
     path = lambda p: p.replace("\\", "/")  # noqa: E731
 
     for file in os.listdir(_dir):
         if file.endswith(".prompt"):
-            path_name = path(os.path.join(_dir, file))
-            name = path_name[11:-7]  # len(".preprompt/") = 11, len(".prompt") = 7
+            path_name = os.path.join(_dir, file)
+            name = path(os.path.relpath(path_name, _cache_dir))[: -len(".prompt")]
 
             try:
-                save_prompt(path_name, fetch_prompt(name))
+                with file_lock(path_name):
+                    save_prompt(path_name, fetch_prompt(name))
             except httpx.HTTPStatusError as err:
                 if err.response.status_code == 404:
                     print(
@@ -123,5 +225,5 @@ def update_all(_dir: str = ".preprompt"):
                     )
                     os.remove(path_name)
 
-        elif os.path.isdir(os.path.join(_dir, file)):
-            update_all(".preprompt/%s" % file)
+        elif file != ".locks" and os.path.isdir(os.path.join(_dir, file)):
+            update_all(os.path.join(_dir, file))
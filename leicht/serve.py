@@ -0,0 +1,819 @@
+"""An OpenAI-compatible server for assistants.
+
+Serves assistants at ``/v1/chat/completions``, streamed (server-sent events) or
+not, with ``/v1/models``, ``/metrics`` (Prometheus) and ``/health``.
+
+```shell
+$ python -m leicht.serve myapp:assistant --port 8000
+$ python -m leicht.serve --llm groq --description basic
+```
+
+Requests with a session ID (the ``X-Session-Id`` header, or ``"session_id"``
+in the body) continue that session's conversation: the server keeps it, so
+only the new user messages need sending. Requests without one are one-off
+turns on the messages given. Idle sessions are evicted, least recently used
+first.
+
+Turns run on a thread pool, at most ``max_concurrency`` at once. Beyond that,
+up to ``max_queue`` requests wait, and the rest get a 429. Streams apply
+backpressure: a slow client slows down reading from the backend, instead of
+having the server buffer the whole answer.
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+from ._codec import dumps, loads
+from .assistant import Assistant, Pipeline
+from .conditional import ConditionalCheckError
+from .logger import event
+from .metrics import Metrics, add_hook, remove_hook
+from .types import Message
+
+Template = Union[Assistant, Pipeline]
+
+MAX_BODY = 4 * 1024 * 1024
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+}
+_DONE = object()
+
+
+class HTTPError(Exception):
+    """An error response, in OpenAI's format.
+
+    Args:
+        status (int): HTTP status.
+        message (str): The message.
+        type (str): Error type, e.g. ``"invalid_request_error"``.
+    """
+
+    def __init__(
+        self, status: int, message: str, type: str = "invalid_request_error"
+    ):
+        super().__init__(message)
+        self.status = status
+        self.type = type
+
+    def body(self) -> bytes:
+        return dumps({"error": {"message": str(self), "type": self.type}})
+
+
+class Session:
+    """A conversation kept by the server.
+
+    Args:
+        assistant (Assistant): The assistant holding the conversation.
+    """
+
+    __slots__ = ("assistant", "lock", "last_used")
+    assistant: Assistant
+    lock: asyncio.Lock  # one turn at a time
+    last_used: float
+
+    def __init__(self, assistant: Assistant):
+        self.assistant = assistant
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class Server:
+    """Serves assistants over an OpenAI-compatible API.
+
+    ```python
+    from leicht.serve import Server
+
+    server = Server({"support": support, "sales": sales}, port=8000)
+    server.run()
+    ```
+
+    Args:
+        assistants (Template | Mapping[str, Template]): The assistants (or
+            pipelines), by the model name clients ask for. A single one is
+            served whatever the model asked for.
+        host (str): Host to bind.
+        port (int): Port to bind. ``0`` picks a free one (see :attr:`port`).
+        max_sessions (int): Max sessions kept. The least recently used idle
+            one is evicted past it.
+        session_ttl (float): Seconds a session is kept idle.
+        max_concurrency (int): Max turns running at once.
+        max_queue (int): Max requests waiting for a turn. Past it, requests
+            get a 429.
+        stream_buffer (int): Chunks buffered per stream, ahead of the client.
+    """
+
+    __slots__ = (
+        "templates",
+        "host",
+        "port",
+        "max_sessions",
+        "session_ttl",
+        "max_concurrency",
+        "max_queue",
+        "stream_buffer",
+        "metrics",
+        "stats",
+        "_sessions",
+        "_slots",
+        "_queued",
+        "_active",
+        "_executor",
+        "_server",
+        "_sweeper",
+    )
+    templates: Dict[str, Template]
+    host: str
+    port: int
+    max_sessions: int
+    session_ttl: float
+    max_concurrency: int
+    max_queue: int
+    stream_buffer: int
+    metrics: Metrics
+    stats: Dict[str, int]
+    _sessions: "OrderedDict[Tuple[str, str], Session]"
+    _slots: Optional[asyncio.Semaphore]
+    _queued: int
+    _active: int
+    _executor: Optional[ThreadPoolExecutor]
+    _server: Optional[asyncio.AbstractServer]
+    _sweeper: Optional["asyncio.Task[None]"]
+
+    def __init__(
+        self,
+        assistants: Union[Template, Mapping[str, Template]],
+        *,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        max_sessions: int = 1024,
+        session_ttl: float = 900.0,
+        max_concurrency: int = 64,
+        max_queue: int = 256,
+        stream_buffer: int = 64,
+    ):
+        if isinstance(assistants, (Assistant, Pipeline)):
+            assistants = {"default": assistants}
+
+        if not assistants:
+            raise ValueError("\n\nPlease provide at least one assistant to serve.\n")
+
+        self.templates = dict(assistants)
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.stream_buffer = stream_buffer
+        self.metrics = Metrics()
+        self.stats = {"requests": 0, "rejected": 0, "errors": 0, "evicted": 0}
+        self._sessions = OrderedDict()
+        self._slots = None
+        self._queued = 0
+        self._active = 0
+        self._executor = None
+        self._server = None
+        self._sweeper = None
+
+    async def start(self) -> None:
+        """Starts listening."""
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(
+            self.max_concurrency, thread_name_prefix="leicht-serve"
+        )
+        add_hook(self.metrics)
+
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._sweeper = asyncio.create_task(self._sweep())
+        event("serve.start", host=self.host, port=self.port)
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+
+        try:
+            await self._server.serve_forever()  # type: ignore
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """Stops listening, and waits for running turns."""
+        if self._server is None:
+            return
+
+        server, self._server = self._server, None
+        server.close()
+        await server.wait_closed()
+
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+        remove_hook(self.metrics)
+
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, executor.shutdown
+            )
+
+    def run(self) -> None:
+        """Serves until interrupted."""
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            pass
+
+    # HTTP
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as err:
+                    await _respond(writer, err.status, err.body(), keep_alive=False)
+                    break
+
+                if request is None:
+                    break
+
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                try:
+                    keep_alive = await self._route(
+                        writer, method, path, headers, body, keep_alive
+                    )
+                except HTTPError as err:
+                    if err.status == 429:
+                        self.stats["rejected"] += 1
+                    else:
+                        self.stats["errors"] += 1
+                    await _respond(
+                        writer,
+                        err.status,
+                        err.body(),
+                        keep_alive=keep_alive,
+                        headers={"Retry-After": "1"} if err.status == 429 else None,
+                    )
+
+                if not keep_alive:
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        body: bytes,
+        keep_alive: bool,
+    ) -> bool:
+        path = path.split("?", 1)[0].rstrip("/")
+
+        if path in ("/v1/chat/completions", "/chat/completions"):
+            if method != "POST":
+                raise HTTPError(405, "Use POST.")
+
+            self.stats["requests"] += 1
+            return await self._chat(writer, headers, body, keep_alive)
+
+        if method != "GET":
+            raise HTTPError(405, "Use GET.")
+
+        if path in ("/v1/models", "/models"):
+            data = [
+                {"id": name, "object": "model", "owned_by": "leicht"}
+                for name in self.templates
+            ]
+            content = dumps({"object": "list", "data": data})
+            await _respond(writer, 200, content, keep_alive=keep_alive)
+        elif path == "/metrics":
+            await _respond(
+                writer,
+                200,
+                self.to_prometheus().encode("utf-8"),
+                content_type="text/plain; version=0.0.4",
+                keep_alive=keep_alive,
+            )
+        elif path == "/health":
+            await _respond(writer, 200, b'{"status":"ok"}', keep_alive=keep_alive)
+        else:
+            raise HTTPError(404, f"No route for {path!r}.")
+
+        return keep_alive
+
+    # completions
+
+    async def _chat(
+        self,
+        writer: asyncio.StreamWriter,
+        headers: Dict[str, str],
+        body: bytes,
+        keep_alive: bool,
+    ) -> bool:
+        try:
+            request = loads(body)
+            assert isinstance(request, dict)
+        except Exception:
+            raise HTTPError(400, "The body is not a JSON object.") from None
+
+        name = request.get("model")
+        if len(self.templates) == 1:
+            name, template = next(iter(self.templates.items()))
+        elif name in self.templates:
+            template = self.templates[name]
+        else:
+            raise HTTPError(
+                404, f"The model {name!r} does not exist.", "model_not_found"
+            )
+
+        messages = [
+            m
+            for m in request.get("messages") or []
+            if isinstance(m, dict) and m.get("role") != "system"
+        ]
+        if not messages or messages[-1].get("role") != "user":
+            raise HTTPError(400, "The last message should be sent by 'user'.")
+        for m in messages:
+            if m.get("role") not in ("user", "assistant"):
+                raise HTTPError(400, f"Unsupported role: {m.get('role')!r}.")
+            if not isinstance(m.get("content"), str):
+                raise HTTPError(400, "Message content should be a string.")
+
+        stream = bool(request.get("stream"))
+        params = _params(request)
+        session_id = headers.get("x-session-id") or request.get("session_id")
+        if session_id is not None:
+            session_id = str(session_id)
+            if len(session_id) > 256 or not session_id.isprintable():
+                raise HTTPError(400, "Invalid session ID.")
+
+        if self._queued >= self.max_queue:
+            raise HTTPError(429, "Too many requests; try again.", "rate_limit_error")
+
+        session: Optional[Session] = None
+        locked = False
+        self._queued += 1
+        try:
+            if session_id:
+                session = self._session(name, session_id, template)
+                await session.lock.acquire()
+                locked = True
+            await self._slots.acquire()  # type: ignore
+        except BaseException:
+            if locked:
+                session.lock.release()  # type: ignore
+            raise
+        finally:
+            self._queued -= 1
+
+        self._active += 1
+        try:
+            if session is not None:
+                # the session keeps the conversation: only the new messages
+                start = len(messages)
+                while start and messages[start - 1].get("role") == "user":
+                    start -= 1
+                messages = messages[start:]
+
+            run = _Turn(template, session, messages, params, stream, name)
+            if stream:
+                # errors before the stream starts get a status code
+                res = await self._call(run.run)
+                await self._stream(writer, run, res, session_id)
+                return False
+
+            content = await self._call(run.complete)
+            await _respond(
+                writer,
+                200,
+                content,
+                keep_alive=keep_alive,
+                headers={"X-Session-Id": session_id} if session_id else None,
+            )
+            return keep_alive
+
+        finally:
+            self._active -= 1
+            self._slots.release()  # type: ignore
+            if session is not None:
+                session.last_used = time.monotonic()
+                session.lock.release()
+
+    async def _stream(
+        self,
+        writer: asyncio.StreamWriter,
+        run: "_Turn",
+        res: Any,
+        session_id: Optional[str],
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Any]" = asyncio.Queue(self.stream_buffer)
+        cancelled = threading.Event()
+
+        def push(item: Any) -> None:
+            # blocks while the buffer is full: backpressure on the backend
+            if not cancelled.is_set():
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        future = loop.run_in_executor(
+            self._executor, run.stream, res, push, cancelled
+        )
+        head = (
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/event-stream\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            + (f"X-Session-Id: {session_id}\r\n" if session_id else "")
+            + "Connection: close\r\n\r\n"
+        )
+
+        try:
+            writer.write(head.encode("latin-1"))
+
+            while True:
+                item = await queue.get()
+                if item is _DONE:
+                    break
+
+                data = b"data: " + item + b"\n\n"
+                writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                await writer.drain()
+
+            data = b"data: [DONE]\n\n"
+            writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(data), data))
+            await writer.drain()
+
+        finally:
+            cancelled.set()
+            while not future.done():
+                while not queue.empty():  # unblock the producer
+                    queue.get_nowait()
+                await asyncio.wait([future], timeout=0.05)
+
+    async def _call(self, fn, *args) -> Any:
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, fn, *args
+            )
+        except ConditionalCheckError as err:
+            raise HTTPError(400, str(err), "conditional_check_error") from None
+        except Exception as err:
+            # requests are validated before; anything else is the server's fault
+            event("serve.error", error=repr(err))
+            raise HTTPError(500, "The assistant failed.", "server_error") from None
+
+    # sessions
+
+    def _session(self, name: str, session_id: str, template: Template) -> Session:
+        key = (name, session_id)
+        session = self._sessions.get(key)
+
+        if session is not None:
+            self._sessions.move_to_end(key)
+            return session
+
+        assistant = (
+            template.assistant() if isinstance(template, Pipeline) else template.fork()
+        )
+        session = self._sessions[key] = Session(assistant)
+
+        if len(self._sessions) > self.max_sessions:
+            for k, s in self._sessions.items():
+                if not s.lock.locked() and k != key:
+                    self._evict(k, "lru")
+                    break
+
+        return session
+
+    def _evict(self, key: Tuple[str, str], reason: str) -> None:
+        del self._sessions[key]
+        self.stats["evicted"] += 1
+        event("serve.evict", model=key[0], session=key[1], reason=reason)
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, min(self.session_ttl / 2, 60.0)))
+
+            deadline = time.monotonic() - self.session_ttl
+            for k, s in list(self._sessions.items()):
+                if s.last_used < deadline and not s.lock.locked():
+                    self._evict(k, "idle")
+
+    def to_prometheus(self, prefix: str = "leicht") -> str:
+        """Exports server and per-stage stats in the Prometheus text format."""
+        lines = [
+            f"# TYPE {prefix}_serve_sessions gauge",
+            f"{prefix}_serve_sessions {len(self._sessions)}",
+            f"# TYPE {prefix}_serve_active gauge",
+            f"{prefix}_serve_active {self._active}",
+            f"# TYPE {prefix}_serve_queued gauge",
+            f"{prefix}_serve_queued {self._queued}",
+        ]
+        for k, v in self.stats.items():
+            lines.append(f"# TYPE {prefix}_serve_{k}_total counter")
+            lines.append(f"{prefix}_serve_{k}_total {v}")
+
+        return "\n".join(lines) + "\n" + self.metrics.to_prometheus(prefix)
+
+    def __repr__(self) -> str:
+        return (
+            f"Server({list(self.templates)!r}, host={self.host!r}, "
+            f"port={self.port}, sessions={len(self._sessions)})"
+        )
+
+
+class _Turn:
+    # one turn, run on a worker thread
+
+    __slots__ = ("template", "session", "messages", "params", "streaming", "model")
+
+    def __init__(
+        self,
+        template: Template,
+        session: Optional[Session],
+        messages: List[Message],
+        params: Dict[str, Any],
+        stream: bool,
+        model: str,
+    ):
+        self.template = template
+        self.session = session
+        self.messages = messages
+        self.params = params
+        self.streaming = stream
+        self.model = model
+
+    def run(self):
+        if self.session is not None:
+            run = self.session.assistant.run
+        elif isinstance(self.template, Pipeline):
+            run = self.template.run
+        else:
+            run = self.template.pipeline
+
+        return run(self.messages, stream=self.streaming, **self.params)
+
+    def complete(self) -> bytes:
+        res = self.run()
+        data = res if isinstance(res, dict) else res.data
+        content = data["choices"][0]["message"].get("content") or ""
+        self._remember(content)
+
+        return dumps(
+            {
+                "id": "chatcmpl-" + uuid.uuid4().hex,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": self.model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": data.get("x_groq", {}).get("usage") or data.get("usage"),
+            }
+        )
+
+    def stream(self, res: Any, push, cancelled: threading.Event) -> None:
+        base = {
+            "id": "chatcmpl-" + uuid.uuid4().hex,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": self.model,
+        }
+
+        def chunk(delta: dict, finish_reason: Optional[str] = None) -> bytes:
+            return dumps(
+                {
+                    **base,
+                    "choices": [
+                        {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                    ],
+                }
+            )
+
+        try:
+            push(chunk({"role": "assistant", "content": ""}))
+            text = ""
+
+            if isinstance(res, dict):  # backends that don't stream
+                text = res["choices"][0]["message"].get("content") or ""
+                push(chunk({"content": text}))
+            else:
+                try:
+                    for d in res:
+                        if cancelled.is_set():
+                            return  # closes the backend stream
+                        if d.get("choices"):
+                            piece = d["choices"][0]["delta"].get("content")
+                            if piece:
+                                text += piece
+                                push(chunk({"content": piece}))
+                except Exception as err:
+                    push(_error_chunk(err))
+                    return
+
+            push(chunk({}, "stop"))
+            self._remember(text)
+
+        finally:
+            if not cancelled.is_set():
+                push(_DONE)
+
+    def _remember(self, content: str) -> None:
+        # assistants don't save their replies; sessions need them for context
+        if self.session is not None:
+            self.session.assistant.messages.append(
+                {"role": "assistant", "content": content}
+            )
+
+
+def _error_chunk(err: Exception) -> bytes:
+    event("serve.error", error=repr(err))
+    return HTTPError(500, "The assistant failed.", "server_error").body()
+
+
+async def _read_request(
+    reader: asyncio.StreamReader,
+) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    line = await _readline(reader)
+    if not line.strip():
+        return None
+
+    try:
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line.") from None
+
+    headers: Dict[str, str] = {}
+    while True:
+        line = await _readline(reader)
+        if line in (b"\r\n", b"\n", b""):
+            break
+
+        k, _, v = line.decode("latin-1").partition(":")
+        headers[k.strip().lower()] = v.strip()
+
+    if "transfer-encoding" in headers:
+        # chunked bodies aren't decoded; the connection can't be reused
+        raise HTTPError(411, "Send the body with a Content-Length instead.")
+
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length.")
+    if length > MAX_BODY:
+        raise HTTPError(413, f"The body exceeds {MAX_BODY} bytes.")
+
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def _params(request: Dict[str, Any]) -> Dict[str, Any]:
+    # sampling parameters, checked here so that errors from the turn itself
+    # are the server's
+    params = {}
+
+    for k, types in (
+        ("max_tokens", int),
+        ("temperature", (int, float)),
+        ("top_p", (int, float)),
+        ("stop", str),
+        ("seed", int),
+    ):
+        value = request.get(k)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, types):
+            raise HTTPError(400, f"Invalid {k!r}: {value!r}.")
+        params[k] = value
+
+    if params.get("max_tokens", 1) < 1:
+        raise HTTPError(400, "'max_tokens' should be at least 1.")
+
+    return params
+
+
+async def _readline(reader: asyncio.StreamReader) -> bytes:
+    try:
+        return await reader.readline()
+    except (asyncio.LimitOverrunError, ValueError):
+        # a line past the reader's limit
+        raise HTTPError(400, "The request line or a header is too long.") from None
+
+
+async def _respond(
+    writer: asyncio.StreamWriter,
+    status: int,
+    body: bytes,
+    *,
+    content_type: str = "application/json",
+    keep_alive: bool = True,
+    headers: Optional[Dict[str, str]] = None,
+) -> None:
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        + "".join(f"{k}: {v}\r\n" for k, v in (headers or {}).items())
+        + ("" if keep_alive else "Connection: close\r\n")
+        + "\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+def load(target: str) -> Union[Template, Mapping[str, Template]]:
+    """Loads the assistants to serve from ``"module:attr"``: an assistant, a
+    pipeline, a mapping of them, or a function returning either.
+
+    Args:
+        target (str): Where to find them.
+    """
+    module, _, attr = target.partition(":")
+    value = getattr(import_module(module), attr or "assistant")
+
+    if callable(value) and not isinstance(value, (Assistant, Pipeline)):
+        value = value()
+
+    return value
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m leicht.serve",
+        description="Serves assistants over an OpenAI-compatible API.",
+    )
+    parser.add_argument(
+        "target",
+        nargs="?",
+        help='assistants to serve, as "module:attr"',
+    )
+    parser.add_argument("--llm", help="serve a pipeline on this LLM instead")
+    parser.add_argument("--description", default="basic")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-sessions", type=int, default=1024)
+    parser.add_argument("--session-ttl", type=float, default=900.0)
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--max-queue", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    if args.target:
+        assistants = load(args.target)
+    elif args.llm:
+        assistants = Pipeline(args.description, llm=args.llm)
+    else:
+        parser.error('provide "module:attr", or --llm')
+
+    server = Server(
+        assistants,
+        host=args.host,
+        port=args.port,
+        max_sessions=args.max_sessions,
+        session_ttl=args.session_ttl,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+    )
+
+    async def serve() -> None:
+        await server.start()
+        print(f"leicht serving on http://{server.host}:{server.port}", flush=True)
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
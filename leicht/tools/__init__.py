@@ -1,3 +1,38 @@
-from .base import BaseTool, tool
+from typing import TYPE_CHECKING, Any
 
-__all__ = ("BaseTool", "tool")
+from ._index import ToolIndex
+from .base import BaseTool, ProcessTool, tool
+
+if TYPE_CHECKING:
+    from ._process import (
+        ProcessPool,
+        ToolError,
+        ToolTimeoutError,
+        set_process_pool,
+    )
+
+# imported on first access, so `multiprocessing` is only imported when needed
+_lazy = ("ProcessPool", "ToolError", "ToolTimeoutError", "set_process_pool")
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from . import _process
+
+    value = getattr(_process, name)
+    globals()[name] = value
+    return value
+
+
+__all__ = (
+    "BaseTool",
+    "ProcessTool",
+    "tool",
+    "ToolIndex",
+    "ProcessPool",
+    "ToolError",
+    "ToolTimeoutError",
+    "set_process_pool",
+)
@@ -0,0 +1,351 @@
+"""Relevance-ranked tool selection, for large tool sets."""
+
+import math
+import re
+import threading
+import zlib
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from ..logger import event
+from .base import BaseTool
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+_CAMEL = re.compile(r"([a-z])([A-Z])")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do for from get gets how i in is it its me "
+    "my of on or please the this to was what when where which who with you "
+    "your".split()
+)
+
+
+def _tokens(text: str) -> List[str]:
+    # words, plus their 5-letter prefixes so "forecasting" meets "forecast"
+    words = _WORD.findall(_CAMEL.sub(r"\1 \2", text).lower().replace("_", " "))
+    tokens = []
+
+    for word in words:
+        if word in _STOPWORDS:
+            continue
+        tokens.append(word)
+        if len(word) > 5:
+            tokens.append(word[:5] + "~")
+
+    return tokens
+
+
+class ToolIndex:
+    """Offers each turn only the tools relevant to it.
+
+    Tools are indexed by name, description and parameter docs as TF-IDF
+    vectors (hashed into ``dim`` buckets), and ranked against the user's
+    message with one matrix-vector product. The system prompt and the
+    function call detection prompt then list the top ``k`` tools, plus the
+    ``always`` ones, instead of every tool.
+
+    Requires ``numpy``.
+
+    ```python
+    from leicht import Assistant
+    from leicht.tools import ToolIndex
+
+    assistant = Assistant(
+        "basic",
+        llm="groq",
+        tools=tools,  # 100+
+        tool_index=ToolIndex(k=5, always=["search"]),
+    )
+    print(assistant.tool_index.diagnostics())
+    ```
+
+    Args:
+        k (int): Tools offered per turn, besides the always-on ones.
+        always (Iterable[str]): Names of tools offered on every turn.
+        min_score (float): Minimum similarity for a tool to be offered.
+        dim (int): Vector size. Tokens are hashed into this many buckets.
+    """
+
+    __slots__ = (
+        "k",
+        "always",
+        "min_score",
+        "dim",
+        "_np",
+        "_state",
+        "_lock",
+        "_turns",
+        "_offered",
+        "_calls",
+        "_misses",
+        "_edge",
+    )
+    k: int
+    always: frozenset
+    min_score: float
+    dim: int
+    _np: Any
+    # the tools, their (tools, dim) matrix of unit rows, and the IDF weights;
+    # swapped as one, so readers never see the tools of one fit with the
+    # matrix of another
+    _state: Tuple[List[BaseTool], "np.ndarray", "np.ndarray"]
+    _lock: threading.Lock
+    _turns: int
+    _offered: int
+    _calls: int
+    _misses: Dict[str, int]  # calls to tools that weren't offered, by name
+    _edge: int  # calls to the lowest-ranked tool offered
+
+    def __init__(
+        self,
+        k: int = 5,
+        *,
+        always: Iterable[str] = (),
+        min_score: float = 0.0,
+        dim: int = 4096,
+    ):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError(
+                "\n\nPlease install the `numpy` package to use "
+                "\x1b[38;2;229;192;123mToolIndex\x1b[0m.\n"
+                "  \x1b[38;2;97;175;239m$ \x1b[38;2;229;192;123mpip\x1b[0m install numpy\n"
+            ) from None
+
+        self.k = k
+        self.always = frozenset(always)
+        self.min_score = min_score
+        self.dim = dim
+        self._np = numpy
+        self._state = (
+            [],
+            numpy.zeros((0, dim), dtype=numpy.float32),
+            numpy.ones(dim, dtype=numpy.float32),
+        )
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def tools(self) -> List[BaseTool]:
+        """The tools indexed."""
+        return self._state[0]
+
+    def fit(self, tools: Sequence[BaseTool]) -> "ToolIndex":
+        """Indexes tools. An index serves one tool set: fitting it again with
+        other tools raises, rather than changing what another assistant using
+        it is offered.
+
+        Args:
+            tools (Sequence[BaseTool]): The tools.
+
+        Raises:
+            ValueError: If it already indexes other tools.
+        """
+        with self._lock:
+            indexed = self._state[0]
+            if indexed:
+                if [t.name for t in indexed] != [t.name for t in tools]:
+                    raise ValueError(
+                        "\n\nThis ToolIndex already indexes other tools. Give "
+                        "each tool set an index of its own.\n"
+                    )
+                return self
+
+            self._state = self._fit(tools)
+
+        return self
+
+    def _fit(
+        self, tools: Sequence[BaseTool]
+    ) -> Tuple[List[BaseTool], "np.ndarray", "np.ndarray"]:
+        np = self._np
+        counts = np.zeros((len(tools), self.dim), dtype=np.float32)
+
+        for i, tool in enumerate(tools):
+            # the name counts twice: it's the most specific part
+            text = " ".join(
+                [
+                    tool.name,
+                    tool.name,
+                    tool.description,
+                    tool.caps,
+                    *(p.name for p in tool.params),
+                    *tool.docstring["args"],
+                ]
+            )
+            counts[i] = self._count(text)
+
+        df = (counts > 0).sum(axis=0)
+        idf = np.log((1 + len(tools)) / (1 + df)).astype(np.float32) + 1
+        matrix = counts * idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+
+        return list(tools), matrix / norms, idf
+
+    def embed(self, text: str, idf: Optional["np.ndarray"] = None) -> "np.ndarray":
+        """Embeds text as a unit TF-IDF vector."""
+        vector = self._count(text) * (self._state[2] if idf is None else idf)
+        norm = self._np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def search(
+        self, text: str, k: Optional[int] = None
+    ) -> List[Tuple[BaseTool, float]]:
+        """Ranks the tools against a text.
+
+        Args:
+            text (str): The text.
+            k (int, optional): Max results. Defaults to all.
+
+        Returns:
+            list[tuple[BaseTool, float]]: Tools and their similarity, best
+            first.
+        """
+        tools, matrix, idf = self._state
+        scores = matrix @ self.embed(text, idf)
+        order = self._np.argsort(-scores, kind="stable")[:k]
+        return [(tools[i], float(scores[i])) for i in order]
+
+    def select(self, text: str) -> List[BaseTool]:
+        """Gets the tools to offer for a message: the always-on ones, then the
+        top ``k`` by relevance.
+
+        Args:
+            text (str): The message.
+        """
+        tools, matrix, idf = self._state
+        always = [t for t in tools if t.name in self.always]
+
+        if len(tools) <= self.k + len(always):
+            return always + [t for t in tools if t.name not in self.always]
+
+        np = self._np
+        scores = matrix @ self.embed(text, idf)
+        for i, tool in enumerate(tools):
+            if tool.name in self.always:
+                scores[i] = -np.inf
+
+        k = self.k
+        top = np.argpartition(-scores, k)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        picked = [tools[i] for i in top if scores[i] >= self.min_score]
+
+        event(
+            "tool_index.select",
+            offered=len(always) + len(picked),
+            top=[t.name for t in picked[:3]],
+        )
+        return always + picked
+
+    def observe(self, offered: Sequence[BaseTool], called: Sequence[str]) -> None:
+        """Records the tools a turn was offered and the ones it called, for
+        :meth:`diagnostics`.
+
+        Args:
+            offered (Sequence[BaseTool]): The tools offered, as selected.
+            called (Sequence[str]): Names of the tools called.
+        """
+        names = [t.name for t in offered]
+        ranked = [n for n in names if n not in self.always]
+
+        with self._lock:
+            self._turns += 1
+            self._offered += len(names)
+            self._calls += len(called)
+
+            for name in called:
+                if name not in names:
+                    self._misses[name] = self._misses.get(name, 0) + 1
+                elif len(ranked) >= self.k and ranked[-1] == name:
+                    self._edge += 1
+
+        for name in called:
+            if name not in names:
+                event("tool_index.miss", name=name, offered=len(names))
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """Gets recall diagnostics of the turns observed:
+
+        - ``turns``, ``calls``: turns seen, and tool calls in them;
+        - ``offered``: mean tools offered per turn;
+        - ``recall``: share of calls to tools that were offered;
+        - ``misses``: calls to tools that weren't offered, by name;
+        - ``edge``: share of calls to the lowest-ranked tool offered. When
+          high, relevant tools are likely cut off: raise ``k``.
+        """
+        with self._lock:
+            calls = self._calls
+            missed = sum(self._misses.values())
+
+            return {
+                "turns": self._turns,
+                "calls": calls,
+                "offered": self._offered / self._turns if self._turns else 0.0,
+                "recall": (calls - missed) / calls if calls else 1.0,
+                "misses": dict(self._misses),
+                "edge": self._edge / calls if calls else 0.0,
+            }
+
+    def evaluate(self, examples: Iterable[Tuple[str, str]]) -> Dict[str, Any]:
+        """Measures recall on labeled examples: the share of messages whose
+        expected tool would be offered.
+
+        ```python
+        index.evaluate([("will it rain in Oslo?", "weather"), ...])
+        ```
+
+        Args:
+            examples (Iterable[tuple[str, str]]): Messages, and the name of
+                the tool each should call.
+
+        Returns:
+            dict: ``recall``, and ``misses`` as ``(message, tool, rank)``,
+            ``rank`` being the tool's 1-based rank.
+        """
+        hits = 0
+        total = 0
+        misses: List[Tuple[str, str, int]] = []
+
+        for text, name in examples:
+            total += 1
+            if any(t.name == name for t in self.select(text)):
+                hits += 1
+                continue
+
+            ranking = [t.name for t, _ in self.search(text)]
+            rank = ranking.index(name) + 1 if name in ranking else math.inf
+            misses.append((text, name, rank))  # type: ignore
+
+        return {"recall": hits / total if total else 1.0, "misses": misses}
+
+    def reset(self) -> None:
+        """Resets the diagnostics."""
+        with self._lock:
+            self._turns = 0
+            self._offered = 0
+            self._calls = 0
+            self._misses = {}
+            self._edge = 0
+
+    def _count(self, text: str) -> "np.ndarray":
+        dim = self.dim
+        buckets = [zlib.crc32(t.encode("utf-8")) % dim for t in _tokens(text)]
+        return self._np.bincount(buckets, minlength=dim).astype(self._np.float32)
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    def __repr__(self) -> str:
+        return f"ToolIndex(k={self.k}, tools={len(self.tools)})"
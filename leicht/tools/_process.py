@@ -0,0 +1,374 @@
+"""Running tools in worker processes.
+
+Tools marked ``@tool(executor="process")`` run in a shared pool of worker
+processes, so CPU-heavy tools use every core and don't hold the GIL, and a
+hung tool can be killed.
+
+```python
+from leicht.tools import ProcessPool, set_process_pool
+
+set_process_pool(ProcessPool(max_workers=4, memory_limit=512 * 2**20))
+```
+"""
+
+import atexit
+import multiprocessing
+import os
+import pickle
+import threading
+from importlib import import_module
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from ..logger import event
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore
+
+
+class ToolError(Exception):
+    """A tool failed in its worker process: it died, or its result was too
+    large."""
+
+
+class ToolTimeoutError(ToolError, TimeoutError):
+    """A tool ran past its timeout. Its worker was killed."""
+
+
+# (module, qualname, args, kwargs, memory limit, max result size)
+Task = Tuple[
+    str, str, Sequence[Any], Mapping[str, Any], Optional[int], Optional[int]
+]
+
+
+def _resolve(module: str, qualname: str) -> Any:
+    target: Any = import_module(module)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+
+    # the decorated name holds the tool; the function is its handler
+    return getattr(target, "handler", target)
+
+
+def _set_memory_limit(limit: Optional[int]) -> None:
+    if resource is not None:
+        hard = resource.getrlimit(resource.RLIMIT_AS)[1]
+        resource.setrlimit(resource.RLIMIT_AS, (limit or hard, hard))
+
+
+def _work(conn: Connection) -> None:
+    # the worker's loop: runs tasks until told to stop (None)
+    handlers: Dict[Tuple[str, str], Any] = {}
+
+    while True:
+        try:
+            task: Optional[Task] = conn.recv()
+        except EOFError:
+            return
+
+        if task is None:
+            return
+
+        module, qualname, args, kwargs, memory_limit, max_result_size = task
+
+        try:
+            key = (module, qualname)
+            if key not in handlers:
+                handlers[key] = _resolve(module, qualname)
+
+            _set_memory_limit(memory_limit)
+            try:
+                result = handlers[key](*args, **kwargs)
+            finally:
+                _set_memory_limit(None)
+
+            data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+            if max_result_size is not None and len(data) > max_result_size:
+                raise ToolError(
+                    f"The result of {qualname} is {len(data)} bytes, over the "
+                    f"limit of {max_result_size}."
+                )
+
+            reply: Tuple[str, Any, bool] = ("ok", data, False)
+
+        except BaseException as err:
+            # after a MemoryError the heap may be fragmented; start fresh
+            retiring = isinstance(err, MemoryError)
+            try:
+                data = pickle.dumps(err, pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                data = pickle.dumps(ToolError(repr(err)))
+
+            reply = ("error", data, retiring)
+            if retiring:
+                conn.send(reply)
+                return
+
+        conn.send(reply)
+
+
+class _Worker:
+    __slots__ = ("process", "conn", "tasks")
+    process: Any
+    conn: Connection
+    tasks: int
+
+    def __init__(self, context: Any):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_work, args=(child,), name="leicht-tool", daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.tasks = 0
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(1.0)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ProcessPool:
+    """A pool of worker processes for tools.
+
+    Workers start on first use and are reused. A worker is killed when its
+    task times out, and replaced after ``max_tasks_per_worker`` tasks, so leaks
+    in tools don't build up.
+
+    Args:
+        max_workers (int, optional): Max workers. Defaults to the CPU count.
+        max_tasks_per_worker (int, optional): Tasks a worker runs before it's
+            replaced. ``None`` keeps workers for good.
+        memory_limit (int, optional): Default address space limit of a task, in
+            bytes. Past it, the tool gets a ``MemoryError``. Unix only.
+        start_method (str): How workers start: ``"spawn"``, ``"forkserver"``
+            or ``"fork"``. Forking a process with threads running can
+            deadlock, hence ``"spawn"``.
+    """
+
+    __slots__ = (
+        "max_workers",
+        "max_tasks_per_worker",
+        "memory_limit",
+        "_context",
+        "_idle",
+        "_slots",
+        "_lock",
+        "_closed",
+    )
+    max_workers: int
+    max_tasks_per_worker: Optional[int]
+    memory_limit: Optional[int]
+    _context: Any
+    _idle: List[_Worker]
+    _slots: threading.Semaphore
+    _lock: threading.Lock
+    _closed: bool
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        *,
+        max_tasks_per_worker: Optional[int] = 100,
+        memory_limit: Optional[int] = None,
+        start_method: str = "spawn",
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.memory_limit = memory_limit
+        self._context = multiprocessing.get_context(start_method)
+        self._idle = []
+        self._slots = threading.Semaphore(self.max_workers)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def run(
+        self,
+        fn: Any,
+        args: Sequence[Any] = (),
+        kwargs: Optional[Mapping[str, Any]] = None,
+        *,
+        timeout: Optional[float] = None,
+        memory_limit: Optional[int] = None,
+        max_result_size: Optional[int] = None,
+    ) -> Any:
+        """Runs a function in a worker, and waits for its result.
+
+        Args:
+            fn: The function, or a tool. Must be importable by name from its
+                module (defined at the top level).
+            args (Sequence): Positional arguments.
+            kwargs (Mapping, optional): Keyword arguments.
+            timeout (float, optional): Seconds before the worker is killed.
+            memory_limit (int, optional): Address space limit, in bytes.
+                Defaults to the pool's.
+            max_result_size (int, optional): Max size of the pickled result, in
+                bytes.
+
+        Raises:
+            ToolTimeoutError: If it timed out.
+            ToolError: If the worker died, or the result was too large.
+        """
+        handler = getattr(fn, "handler", fn)
+        name = handler.__qualname__
+        task: Task = (
+            handler.__module__,
+            name,
+            tuple(args),
+            dict(kwargs or {}),
+            memory_limit or self.memory_limit,
+            max_result_size,
+        )
+
+        self._slots.acquire()
+        try:
+            worker = self._acquire()
+            try:
+                worker.conn.send(task)
+            except BaseException:
+                worker.stop()
+                raise
+
+            if not worker.conn.poll(timeout):
+                worker.kill()
+                event("tool.timeout", name=name, timeout=timeout)
+                raise ToolTimeoutError(f"{name} timed out after {timeout}s.")
+
+            try:
+                status, data, retiring = worker.conn.recv()
+            except (EOFError, OSError):
+                worker.kill()
+                raise ToolError(
+                    f"The worker running {name} died "
+                    f"(exit code {worker.process.exitcode})."
+                ) from None
+
+            if retiring:
+                event("tool.recycle", tasks=worker.tasks + 1)
+                worker.stop()
+            else:
+                self._release(worker)
+
+        finally:
+            self._slots.release()
+
+        if status == "error":
+            raise pickle.loads(data)
+
+        return pickle.loads(data)
+
+    def start(self, workers: int = 1) -> None:
+        """Starts idle workers ahead of the first task, so it doesn't wait for
+        a process to spawn.
+
+        Args:
+            workers (int): How many to have idle, up to ``max_workers``.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            missing = min(workers, self.max_workers) - len(self._idle)
+
+        started = [_Worker(self._context) for _ in range(max(missing, 0))]
+        for worker in started:
+            # a first task waits until the worker has booted
+            worker.conn.send(("builtins", "len", ((),), {}, None, None))
+        for worker in started:
+            worker.conn.recv()
+
+        with self._lock:
+            if not self._closed:
+                self._idle.extend(started)
+                return
+
+        for worker in started:
+            worker.stop()
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The process pool is shut down.")
+
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.kill()
+
+        return _Worker(self._context)
+
+    def _release(self, worker: _Worker) -> None:
+        worker.tasks += 1
+        limit = self.max_tasks_per_worker
+
+        if not worker.process.is_alive() or (limit and worker.tasks >= limit):
+            event("tool.recycle", tasks=worker.tasks)
+            worker.stop()
+            return
+
+        with self._lock:
+            if not self._closed:
+                self._idle.append(worker)
+                return
+
+        worker.stop()
+
+    def shutdown(self) -> None:
+        """Stops the idle workers. Busy ones stop when their task ends."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+
+        for worker in idle:
+            worker.stop()
+
+    def __repr__(self) -> str:
+        return f"ProcessPool(max_workers={self.max_workers}, idle={len(self._idle)})"
+
+
+_pool: Optional[ProcessPool] = None
+_pool_lock = threading.Lock()
+
+
+def set_process_pool(pool: Optional[ProcessPool]) -> None:
+    """Sets the pool process tools run in. The previous one is shut down.
+
+    Args:
+        pool (ProcessPool, optional): The pool. ``None`` makes a default one
+            on next use.
+    """
+    global _pool
+
+    with _pool_lock:
+        previous, _pool = _pool, pool
+
+    if previous is not None and previous is not pool:
+        previous.shutdown()
+
+
+def get_process_pool() -> ProcessPool:
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPool()
+
+    return _pool
+
+
+@atexit.register
+def _shutdown() -> None:
+    if _pool is not None:
+        _pool.shutdown()
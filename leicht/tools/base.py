@@ -8,10 +8,12 @@ from typing import (
     List,
     Literal,
     Mapping,
+    Optional,
     ParamSpec,
     Tuple,
     TypeVar,
     Union,
+    overload,
 )
 from typing_extensions import TypedDict
 
@@ -48,13 +50,22 @@ class BaseTool(Generic[P, T]):
         description (str): Tool description.
     """
 
-    __slots__ = ("name", "handler", "description", "params", "docstring", "caps")
+    __slots__ = (
+        "name",
+        "handler",
+        "description",
+        "params",
+        "docstring",
+        "caps",
+        "_prompt",
+    )
     name: str
     description: str
     params: List[inspect.Parameter]
     docstring: DocstringResult
     handler: Callable[P, T]
     caps: str
+    _prompt: Optional[str]
 
     def __init__(self, name: str, handler: Callable[P, T]):
         if not re.match(REGEX_name, name):
@@ -68,10 +79,16 @@ class BaseTool(Generic[P, T]):
         self.docstring = BaseTool.parse_docstrings(self.handler.__doc__ or "")
         self.description = self.docstring["description"]
         self.caps = self.docstring["capabilities"]
+        self._prompt = None
 
     @property
     def prompt(self) -> str:
-        return BaseTool.mix_make_prompt(self.name, self.params, self.docstring)
+        if self._prompt is None:
+            self._prompt = BaseTool.mix_make_prompt(
+                self.name, self.params, self.docstring
+            )
+
+        return self._prompt
 
     def __call__(self, *args: P.args, **kwargs: P.kwargs) -> T: ...
 
@@ -189,7 +206,87 @@ class BaseTool(Generic[P, T]):
         return f"Tool(name={self.name!r}, fn={self.handler.__name__!r})"
 
 
-def tool(fn: Callable[P, T]) -> BaseTool[P, T]:
+class ProcessTool(BaseTool[P, T]):
+    """Represents a tool that runs in a worker process (see
+    :class:`~leicht.tools.ProcessPool`).
+
+    Args:
+        name (str): Name of the tool.
+        handler (Handler): The function. Must be defined at the top level of
+            its module, so workers can import it.
+        timeout (float, optional): Seconds before the worker is killed.
+        memory_limit (int, optional): Address space limit, in bytes.
+        max_result_size (int, optional): Max size of the pickled result, in
+            bytes.
+    """
+
+    __slots__ = ("timeout", "memory_limit", "max_result_size")
+    timeout: Optional[float]
+    memory_limit: Optional[int]
+    max_result_size: Optional[int]
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[P, T],
+        *,
+        timeout: Optional[float] = None,
+        memory_limit: Optional[int] = None,
+        max_result_size: Optional[int] = None,
+    ):
+        super().__init__(name, handler)
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.max_result_size = max_result_size
+
+    def __call__(self, *args: P.args, **kwargs: P.kwargs) -> T:
+        from ..deadline import DeadlineExceeded, remaining
+        from ._process import ToolTimeoutError, get_process_pool
+
+        # a deadline in effect may leave less time than the tool's own timeout
+        left = remaining()
+        timeout = self.timeout
+        clamped = left is not None and (timeout is None or left < timeout)
+        if clamped:
+            timeout = left
+
+        try:
+            return get_process_pool().run(
+                self.handler,
+                args,
+                kwargs,
+                timeout=timeout,
+                memory_limit=self.memory_limit,
+                max_result_size=self.max_result_size,
+            )
+        except ToolTimeoutError:
+            if clamped:
+                raise DeadlineExceeded("tool") from None
+            raise
+
+
+@overload
+def tool(fn: Callable[P, T]) -> BaseTool[P, T]: ...
+
+
+@overload
+def tool(
+    *,
+    executor: Literal["inline", "process"] = "inline",
+    timeout: Optional[float] = None,
+    memory_limit: Optional[int] = None,
+    max_result_size: Optional[int] = None,
+) -> Callable[[Callable[P, T]], BaseTool[P, T]]: ...
+
+
+def tool(
+    fn: Optional[Callable[P, T]] = None,
+    *,
+    executor: Literal["inline", "process"] = "inline",
+    timeout: Optional[float] = None,
+    memory_limit: Optional[int] = None,
+    max_result_size: Optional[int] = None,
+):
     """A decorator that makes wraps a function into a tool.
 
     Example:
@@ -202,11 +299,45 @@ def tool(fn: Callable[P, T]) -> BaseTool[P, T]:
                 location (str): The location.
             \"\"\"
             return { "weather": "nice" }
+
+        @tool(executor="process", timeout=10)
+        def factorize(n: int):
+            ...
         ```
 
     Args:
         fn (Handler): Function.
+        executor (str): Run the tool in the calling thread (``"inline"``), or
+            in a worker process (``"process"``), for CPU-heavy tools. The
+            options below apply to the latter.
+        timeout (float, optional): Seconds before the worker is killed, and
+            ``ToolTimeoutError`` raised.
+        memory_limit (int, optional): Address space limit, in bytes.
+        max_result_size (int, optional): Max size of the pickled result, in
+            bytes.
     """
+    if executor not in ("inline", "process"):
+        raise ValueError(
+            f"Invalid executor {executor!r}. (Expected 'inline' or 'process')"
+        )
+
+    if fn is None:
+        return lambda fn: tool(
+            fn,
+            executor=executor,
+            timeout=timeout,
+            memory_limit=memory_limit,
+            max_result_size=max_result_size,
+        )
+
+    if executor == "process":
+        return ProcessTool(
+            fn.__name__,
+            handler=fn,
+            timeout=timeout,
+            memory_limit=memory_limit,
+            max_result_size=max_result_size,
+        )
 
     class _ToolFactory(BaseTool):
         def __call__(self, *args: P.args, **kwargs: P.kwargs) -> T: